@@ -0,0 +1,377 @@
+"""
+Routing of AI requests across several backends
+Each request goes to the fastest healthy provider. When that provider is slower
+than the latency SLO the next one is started as a hedge and the first answer
+wins; when it fails the next one takes over right away.
+"""
+
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from chatbot_ai import (AIProvider, AIError, AIAuthError, AIBadRequestError, AICircuitOpenError, AITimeoutError,
+                        CircuitBreaker, ConversationMemory)
+from metrics import percentile
+import gemini_api
+import perplexity_api
+
+# Backends that can be listed in ai_api.fallback_providers
+FALLBACK_PROVIDERS = {
+    "gemini": gemini_api.ChatSession,
+    "perplexity": perplexity_api.ChatSession
+}
+
+class ProviderState:
+    """Rolling latency and error statistics of one provider, plus its circuit breaker"""
+
+    def __init__(self, provider: AIProvider, window: int = 100,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.provider = provider
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        self.latencies: Deque[float] = deque(maxlen=window)  # of successful requests
+        self.outcomes: Deque[bool] = deque(maxlen=window)  # True = success
+
+        # Statistics
+        self.requests = 0
+        self.wins = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def latency(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        return percentile(sorted(self.latencies), pct)
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "breaker": self.breaker.state,
+            "requests": self.requests,
+            "wins": self.wins,
+            "error_rate": self.error_rate(),
+            "latency_p50": self.latency(50),
+            "latency_p95": self.latency(95)
+        }
+
+class AIRouter(AIProvider):
+    """
+    Sends each request to the fastest healthy provider, hedging or failing over
+    to the others. Providers are tried in the given order until they have latency
+    samples, so the first one is the primary.
+    """
+    name = "router"
+    uses_limiter = True
+
+    def __init__(self, providers: List[AIProvider], latency_slo: float = 8.0, hedge: bool = True,
+                 deadline: float = 20.0, window: int = 100,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        if not providers:
+            raise ValueError("AIRouter needs at least one provider")
+        self.providers = [ProviderState(provider, window, failure_threshold, reset_timeout)
+                          for provider in providers]
+        self.latency_slo = latency_slo
+        self.hedge = hedge
+        self.deadline = deadline
+
+        # Statistics
+        self.requests = 0
+        self.hedged = 0
+        self.failovers = 0
+
+    @property
+    def memory(self) -> ConversationMemory:
+        """Memory of the primary provider (every provider remembers every answered turn)"""
+        return self.providers[0].provider.memory
+
+    def ranked(self) -> List[ProviderState]:
+        """Healthy providers from the fastest (median latency) to the slowest"""
+        healthy = [state for state in self.providers if state.healthy]
+        # A provider without samples counts as exactly at the SLO, ties keep the configured order
+        return sorted(healthy, key=lambda state: self.latency_slo if state.latency(50) is None else state.latency(50))
+
+    @staticmethod
+    def _timed(options: Dict[str, Any], call: Dict[str, Optional[float]]) -> Dict[str, Any]:
+        """
+        Options whose limiter notes in call["upstream"] when the request leaves the queue.
+        Without a limiter the request goes upstream right away.
+        """
+        limiter = options.get("limiter")
+        if limiter is None:
+            call["upstream"] = time.monotonic()
+            return options
+
+        @asynccontextmanager
+        async def timed_limiter():
+            async with limiter():
+                call["upstream"] = time.monotonic()
+                yield
+
+        return dict(options, limiter=timed_limiter)
+
+    @staticmethod
+    def _record_error(state: ProviderState, error: AIError):
+        if isinstance(error, AICircuitOpenError):
+            # The provider's own breaker turned the request away, it already counted the failures
+            return
+        # A rejected key or prompt means the provider is up, every other failure counts against it
+        if isinstance(error, (AIAuthError, AIBadRequestError)):
+            state.outcomes.append(True)
+            state.breaker.record_success()
+        else:
+            state.outcomes.append(False)
+            state.breaker.record_failure()
+
+    @staticmethod
+    def _record_success(state: ProviderState, call: Dict[str, Optional[float]]):
+        # Latency is the upstream time only, a cached or coalesced answer (never sent) has none
+        if call["upstream"] is not None:
+            state.latencies.append(time.monotonic() - call["upstream"])
+        state.outcomes.append(True)
+        state.breaker.record_success()
+
+    async def _generate(self, state: ProviderState, prompt: str, conversation: Any, budget: float,
+                        options: Dict[str, Any], call: Dict[str, Optional[float]]) -> str:
+        limiter = options.get("limiter")
+        if limiter is None or state.provider.uses_limiter:
+            return await state.provider.generate(prompt, conversation=conversation, budget=budget,
+                                                 **self._timed(options, call))
+        # The backend ignores the limiter, so the slot is held here: the request still counts
+        # towards the concurrency cap and its latency starts once it leaves the queue
+        deadline = time.monotonic() + budget
+        async with limiter():
+            call["upstream"] = time.monotonic()
+            return await state.provider.generate(prompt, conversation=conversation,
+                                                 budget=deadline - call["upstream"],
+                                                 **{key: value for key, value in options.items() if key != "limiter"})
+
+    async def _call(self, state: ProviderState, prompt: str, conversation: Any, budget: float,
+                    options: Dict[str, Any], call: Dict[str, Optional[float]]) -> str:
+        state.requests += 1
+        try:
+            response = await self._generate(state, prompt, conversation, budget, options, call)
+        except AIError as e:
+            self._record_error(state, e)
+            raise
+        except asyncio.CancelledError:
+            # Lost the race, this says nothing about the provider's health
+            state.breaker.abandon_trial()
+            raise
+        self._record_success(state, call)
+        return response
+
+    async def _first_piece(self, state: ProviderState, pieces: AsyncIterator[str]) -> str:
+        """The first piece of a stream ("" if it is empty), errors count like in _call"""
+        try:
+            return await pieces.__anext__()
+        except StopAsyncIteration:
+            return ""
+        except AIError as e:
+            self._record_error(state, e)
+            raise
+        except asyncio.CancelledError:
+            state.breaker.abandon_trial()
+            raise
+
+    def _hedge_wait(self, call: Dict[str, Optional[float]]) -> Optional[float]:
+        """Seconds until the newest request is over the SLO upstream, None while it still waits in the queue"""
+        if call["upstream"] is None:
+            return None
+        return max(0.0, call["upstream"] + self.latency_slo - time.monotonic())
+
+    async def generate(self, prompt: str, conversation: Any = None, budget: Optional[float] = None,
+                       **options) -> str:
+        """
+        Get a response from whichever provider answers first. The options are passed
+        on to the providers (which ignore those they don't support). Raises the last
+        provider's AIError if none of them could answer.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (budget if budget is not None else self.deadline)
+        self.requests += 1
+        _, response, remembered = await self._race(prompt, conversation, deadline, options, deque(self.ranked()))
+        self._remember(conversation, prompt, response, remembered)
+        return response
+
+    async def stream(self, prompt: str, conversation: Any = None, budget: Optional[float] = None,
+                     **options) -> AsyncIterator[str]:
+        """
+        Yield the response in pieces. The fastest healthy provider streams it if it can,
+        otherwise the answer comes whole from generate(). Until the first piece arrives
+        the stream races like generate(): it is hedged when it is over the SLO and the
+        other providers take over when it fails, all within budget seconds. An error
+        after the first piece is raised to the caller.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (budget if budget is not None else self.deadline)
+        ranked = self.ranked()
+        if not ranked or not hasattr(ranked[0].provider, "stream") or not ranked[0].breaker.allow_request():
+            yield await self.generate(prompt, conversation=conversation, budget=deadline - loop.time(), **options)
+            return
+
+        self.requests += 1
+        state = ranked[0]
+        state.requests += 1
+        call: Dict[str, Optional[float]] = {"upstream": None}
+        pieces = state.provider.stream(prompt, conversation=conversation, budget=deadline - loop.time(),
+                                       **self._timed(options, call))
+        first = asyncio.create_task(self._first_piece(state, pieces))
+        try:
+            winner, piece, remembered = await self._race(prompt, conversation, deadline, options,
+                                                         deque(ranked[1:]), (first, state, call))
+            if winner is not state:
+                # Another provider answered first, its answer comes whole
+                self._remember(conversation, prompt, piece, remembered)
+                yield piece
+                return
+
+            parts = [piece]
+            yield piece
+            try:
+                async for piece in pieces:
+                    parts.append(piece)
+                    yield piece
+            except AIError as e:
+                self._record_error(state, e)
+                raise
+            except (asyncio.CancelledError, GeneratorExit):
+                # Cancelled, or the caller stopped reading early
+                state.breaker.abandon_trial()
+                raise
+            self._record_success(state, call)
+            state.wins += 1
+            self._remember(conversation, prompt, "".join(parts), remembered)
+        finally:
+            # A stream that lost the race is still being cancelled, it can only be closed after that
+            if not first.done():
+                first.cancel()
+            await asyncio.gather(first, return_exceptions=True)
+            await pieces.aclose()
+
+    async def _race(self, prompt: str, conversation: Any, deadline: float, options: Dict[str, Any],
+                    candidates: Deque[ProviderState],
+                    streaming: Optional[Tuple[asyncio.Task, ProviderState, Dict[str, Optional[float]]]] = None
+                    ) -> Tuple[ProviderState, str, set]:
+        """
+        Run the candidates until one answers, hedging and failing over between them.
+        streaming is the already started task for the first piece of a stream, which
+        takes part as the first request. Returns the winner, its answer (the first piece
+        for the stream) and the providers that remember the turn already.
+        """
+        loop = asyncio.get_running_loop()
+        pending: Dict[asyncio.Task, ProviderState] = {}
+        newest: Dict[str, Optional[float]] = {"upstream": None}
+        stream_task = None
+        if streaming is not None:
+            stream_task, state, newest = streaming
+            pending[stream_task] = state
+        last_error: Optional[AIError] = None
+
+        def start_next() -> bool:
+            nonlocal newest
+            while candidates:
+                state = candidates.popleft()
+                if not state.breaker.allow_request():
+                    continue
+                remaining = deadline - loop.time()
+                newest = {"upstream": None}
+                task = asyncio.create_task(self._call(state, prompt, conversation, remaining, options, newest))
+                pending[task] = state
+                return True
+            return False
+
+        try:
+            while True:
+                if not pending:
+                    if not start_next():
+                        break
+                    if last_error is not None:
+                        self.failovers += 1
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise AITimeoutError("No AI provider answered in time")
+                timeout = remaining
+                if self.hedge and candidates:
+                    # The SLO counts from when the request left the scheduler queue, look again by then
+                    hedge_wait = self._hedge_wait(newest)
+                    timeout = min(remaining, self.latency_slo if hedge_wait is None else hedge_wait)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # The newest request is over the SLO upstream, race it against the next provider
+                    if self._hedge_wait(newest) == 0.0 and loop.time() < deadline and start_next():
+                        self.hedged += 1
+                    continue
+
+                answered = []
+                for task in done:
+                    state = pending.pop(task)
+                    try:
+                        answered.append((state, task.result(), task is stream_task))
+                    except AIError as e:
+                        last_error = e
+                if answered:
+                    # A stream that got its first piece wins a tie, its answer is already arriving
+                    answered.sort(key=lambda answer: not answer[2])
+                    winner, response, streamed = answered[0]
+                    if not streamed:
+                        winner.wins += 1
+                    # The stream only remembers the turn once it has finished
+                    remembered = {state.provider for state, _, is_stream in answered
+                                  if not is_stream or state is winner}
+                    return winner, response, remembered
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_error is not None:
+            raise last_error
+        raise AICircuitOpenError("All AI providers are unavailable")
+
+    def _remember(self, conversation: Any, prompt: str, response: str, remembered: set):
+        """Keep the conversation going whichever provider answers next time"""
+        if conversation is None:
+            return
+        for state in self.providers:
+            if state.provider not in remembered:
+                state.provider.memory.add(conversation, prompt, response)
+
+    def seed_history(self, conversation: Any, turns: List[Tuple[str, str]]):
+        for state in self.providers:
+            state.provider.seed_history(conversation, turns)
+
+    def clear_history(self, conversation: Any = None):
+        for state in self.providers:
+            state.provider.clear_history(conversation)
+
+    async def close(self):
+        for state in self.providers:
+            await state.provider.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "failovers": self.failovers,
+            "latency_slo": self.latency_slo,
+            "providers": {state.provider.name: state.get_stats() for state in self.providers}
+        }
+
+def create_providers(primary: AIProvider, fallback_names: List[str]) -> List[AIProvider]:
+    """The primary provider followed by the named fallback backends"""
+    providers = [primary]
+    for name in fallback_names:
+        provider_class = FALLBACK_PROVIDERS.get(name)
+        if provider_class is None:
+            print(f"Unknown AI provider '{name}', expected one of: {', '.join(FALLBACK_PROVIDERS)}")
+            continue
+        providers.append(provider_class())
+    return providers
@@ -0,0 +1,122 @@
+"""
+Fair scheduling for AI requests
+Caps how many AI requests run at once and hands free slots out round-robin,
+first across guilds and then across users within a guild, so a burst in one
+place can't starve everyone else
+"""
+
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Deque
+from metrics import percentile
+
+class QueueTimeout(Exception):
+    """Raised when a request waited longer than max_wait for a free slot"""
+    pass
+
+class AIRequestScheduler:
+    """
+    Global concurrency limiter with per-guild and per-user fair queuing.
+    Usage:
+        async with scheduler.slot(guild_id, user_id):
+            response = await chatbot_api.send_message(...)
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_wait: float = 15.0, wait_samples: int = 1000):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.active = 0
+        # guild -> user -> waiting futures, both levels rotated round-robin
+        self._queues: "OrderedDict[Optional[int], OrderedDict[int, Deque[asyncio.Future]]]" = OrderedDict()
+
+        # Statistics
+        self.requests = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.wait_times: Deque[float] = deque(maxlen=wait_samples)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(waiters) for users in self._queues.values() for waiters in users.values())
+
+    @asynccontextmanager
+    async def slot(self, guild_id: Optional[int], user_id: int):
+        """Hold one of the concurrent AI slots, raises QueueTimeout if none frees up within max_wait"""
+        await self.acquire(guild_id, user_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, guild_id: Optional[int], user_id: int):
+        self.requests += 1
+        if self.active < self.max_concurrent and not self._queues:
+            self.active += 1
+            self.wait_times.append(0.0)
+            return
+
+        self.queued += 1
+        enqueued_at = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        users = self._queues.setdefault(guild_id, OrderedDict())
+        users.setdefault(user_id, deque()).append(future)
+        try:
+            # The slot is handed over by release(), active already counts it
+            await asyncio.wait_for(future, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._remove(guild_id, user_id, future)
+            # A slot handed over in the same tick as the timeout must not leak
+            if future.done() and not future.cancelled():
+                self.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timeouts += 1
+            raise QueueTimeout(f"no AI slot free within {self.max_wait:.0f}s")
+        self.wait_times.append(time.monotonic() - enqueued_at)
+
+    def release(self):
+        """Give the slot to the next waiter in round-robin order, or free it"""
+        while self._queues:
+            guild_id, users = self._queues.popitem(last=False)
+            user_id, waiters = users.popitem(last=False)
+            future = waiters.popleft()
+            # Rotate: this user and guild go to the back of their queues
+            if waiters:
+                users[user_id] = waiters
+            if users:
+                self._queues[guild_id] = users
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def _remove(self, guild_id: Optional[int], user_id: int, future: asyncio.Future):
+        users = self._queues.get(guild_id)
+        if users is None or user_id not in users:
+            return
+        waiters = users[user_id]
+        try:
+            waiters.remove(future)
+        except ValueError:
+            return
+        if not waiters:
+            del users[user_id]
+        if not users:
+            del self._queues[guild_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Concurrency, queue and queue-time statistics"""
+        samples = sorted(self.wait_times)
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.queue_depth,
+            "requests": self.requests,
+            "queued": self.queued,
+            "timeouts": self.timeouts,
+            "wait_p50": percentile(samples, 50),
+            "wait_p95": percentile(samples, 95),
+            "wait_max": samples[-1] if samples else 0.0
+        }
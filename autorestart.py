@@ -3,7 +3,6 @@ import time
 import os
 import asyncio
 import discord
-from childe import sync_commands, bot
 
 async def main():
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -64,9 +63,7 @@ async def main():
             process = subprocess.run(command, cwd=script_dir)
             print(f"Bot exited with code: {process.returncode}. Restarting in 5 seconds...")
             time.sleep(5)
-
-            # Ensure commands are force-loaded after restart
-            await sync_commands(bot)
+            # The restarted bot syncs its slash commands itself, and only if they changed
 
         except KeyboardInterrupt:
             print("Auto-restart terminated by user.")
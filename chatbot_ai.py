@@ -5,24 +5,450 @@ Uses the sidet.eu AI API with personalized tokens and conversation memory
 
 import aiohttp
 import json
+import codecs
+import time
+import random
 import asyncio
-from typing import Optional, Dict, Any, List
+from abc import ABC, abstractmethod
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict, deque
+from contextlib import AsyncExitStack
+from typing import Optional, Dict, Any, List, Tuple, Callable, AsyncContextManager, AsyncIterator
 from datetime import datetime
 
-class ChatbotAPI:
+class AIError(Exception):
+    """Base class for AI API failures. retryable tells whether trying again may help."""
+    retryable = False
+    
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retry_after: Optional[float] = None, retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        if retryable is not None:
+            self.retryable = retryable
+
+class AIAuthError(AIError):
+    """The API rejected the token (HTTP 401)"""
+
+class AIBadRequestError(AIError):
+    """The API rejected the request (HTTP 400)"""
+
+class AIResponseError(AIError):
+    """The API answered but reported an error or sent something unreadable"""
+
+class AIUnavailableError(AIError):
+    """Rate limited or server side failure (HTTP 408, 429, 5xx)"""
+    retryable = True
+
+class AINetworkError(AIError):
+    """The request didn't get an HTTP response"""
+    retryable = True
+
+class AITimeoutError(AINetworkError):
+    """The request or the whole retry budget ran out of time"""
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+async def raise_for_status(response: aiohttp.ClientResponse):
+    """Raise the typed AIError for a non-200 response (shared by every HTTP backend)"""
+    if response.status == 200:
+        return
+    
+    if response.status == 401:
+        raise AIAuthError("Authentication failed - invalid token", status=401)
+    
+    elif response.status == 400:
+        raise AIBadRequestError("Bad request - check your message format", status=400)
+    
+    elif response.status == 429 or response.status == 408 or response.status >= 500:
+        error_text = await response.text()
+        print(f"HTTP {response.status}: {error_text}")
+        raise AIUnavailableError(
+            f"Service temporarily unavailable (HTTP {response.status})",
+            status=response.status,
+            retry_after=parse_retry_after(response.headers.get("Retry-After"))
+        )
+    
+    else:
+        error_text = await response.text()
+        print(f"HTTP {response.status}: {error_text}")
+        raise AIError(f"Unexpected response (HTTP {response.status})", status=response.status)
+
+class RetryPolicy:
+    """Exponential backoff with full jitter; a Retry-After from the server takes precedence"""
+    
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def delay_for(self, attempt: int, error: Optional[AIError] = None) -> float:
+        """Delay before retry number attempt (1 = first retry)"""
+        if error is not None and error.retry_after is not None:
+            return error.retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+class AICircuitOpenError(AIError):
+    """The circuit breaker is open, the request wasn't sent"""
+
+class CircuitBreaker:
+    """
+    Stops calling a failing backend.
+    Opens after failure_threshold consecutive transient failures and rejects requests
+    for reset_timeout seconds. Then it lets half_open_max_calls trial requests through:
+    a success closes it again, a failure reopens it.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self.consecutive_failures = 0
+        
+        # Statistics
+        self.times_opened = 0
+        self.rejected = 0
+    
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_calls = 0
+        return self._state
+    
+    def retry_in(self) -> float:
+        """Seconds until an open breaker allows a trial request"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+    
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._trial_calls < self.half_open_max_calls:
+            self._trial_calls += 1
+            return True
+        self.rejected += 1
+        return False
+    
+    def abandon_trial(self):
+        """A request let through was cancelled before it had an outcome"""
+        if self._state == self.HALF_OPEN and self._trial_calls > 0:
+            self._trial_calls -= 1
+    
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._state = self.CLOSED
+    
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+                print(f"AI circuit breaker opened after {self.consecutive_failures} consecutive failures")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in": self.retry_in()
+        }
+
+class SSEParser:
+    """Incremental parser for text/event-stream bodies"""
+    
+    def __init__(self):
+        self._buffer = ""
+        self._data: List[str] = []
+    
+    def feed(self, text: str) -> List[str]:
+        """Feed decoded text, returns the data of every event it completed"""
+        self._buffer += text
+        events = []
+        while True:
+            newline = self._buffer.find("\n")
+            if newline < 0:
+                break
+            line = self._buffer[:newline].rstrip("\r")
+            self._buffer = self._buffer[newline + 1:]
+            
+            if not line:
+                # A blank line ends the event
+                if self._data:
+                    events.append("\n".join(self._data))
+                    self._data = []
+            elif not line.startswith(":"):
+                field, _, value = line.partition(":")
+                if field == "data":
+                    self._data.append(value[1:] if value.startswith(" ") else value)
+        return events
+
+def stream_event_text(data: str) -> str:
+    """Text carried by one streamed event (JSON with a text field, or plain text)"""
+    try:
+        event = json.loads(data)
+    except json.JSONDecodeError:
+        return data
+    if not isinstance(event, dict):
+        return str(event)
+    if event.get("success") is False:
+        raise AIResponseError(f"API Error: {event.get('error', 'Unknown error')}")
+    for field in ("delta", "text", "content", "response"):
+        if isinstance(event.get(field), str):
+            return event[field]
+    return ""
+
+class ResponseCache:
+    """LRU cache of AI responses whose entries expire ttl seconds after being stored"""
+    
+    def __init__(self, max_size: int = 256, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, ...], Tuple[float, str]]" = OrderedDict()
+        
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Tuple[str, ...]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, key: Tuple[str, ...], response: str):
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token"""
+    return len(text) // 4 + 1
+
+class ConversationMemory:
+    """
+    Recent turns of each conversation (a channel, or a user in DMs).
+    A conversation is a ring buffer of its newest max_turns turns, trimmed further
+    to what fits in max_tokens.
+    Conversations idle for idle_timeout seconds expire, and beyond max_conversations
+    the least recently used one is evicted, so memory stays flat however long the bot runs.
+    """
+
+    def __init__(self, max_conversations: int = 500, max_tokens: int = 1000, idle_timeout: float = 3600.0,
+                 max_turns: int = 20):
+        self.max_conversations = max_conversations
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.idle_timeout = idle_timeout
+        # key -> [last used, tokens held, turns], least recently used first
+        self._conversations: "OrderedDict[Any, list]" = OrderedDict()
+
+        # Statistics
+        self.evicted = 0
+        self.expired = 0
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._conversations:
+            key, conversation = next(iter(self._conversations.items()))
+            if now - conversation[0] <= self.idle_timeout:
+                break
+            del self._conversations[key]
+            self.expired += 1
+
+    def has(self, key: Any) -> bool:
+        self._expire()
+        return key in self._conversations
+
+    def add(self, key: Any, prompt: str, response: str):
+        """Remember one exchange, dropping the oldest turns that no longer fit the budget"""
+        self._expire()
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            conversation = self._conversations[key] = [0.0, 0, deque()]
+        self._conversations.move_to_end(key)
+        conversation[0] = time.monotonic()
+
+        turn = {
+            "timestamp": datetime.now().isoformat(),
+            "prompt": prompt,
+            "response": response,
+            "tokens": estimate_tokens(prompt) + estimate_tokens(response)
+        }
+        conversation[2].append(turn)
+        conversation[1] += turn["tokens"]
+        while (conversation[1] > self.max_tokens or len(conversation[2]) > self.max_turns) and conversation[2]:
+            conversation[1] -= conversation[2].popleft()["tokens"]
+
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+            self.evicted += 1
+
+    def seed(self, key: Any, turns: List[Tuple[str, str]]):
+        """Load earlier (prompt, response) pairs, oldest first, into a conversation not in memory yet"""
+        if self.has(key):
+            return
+        for prompt, response in turns:
+            self.add(key, prompt, response)
+
+    def turns(self, key: Any) -> List[Dict[str, Any]]:
+        self._expire()
+        conversation = self._conversations.get(key)
+        return list(conversation[2]) if conversation else []
+
+    def render(self, key: Any) -> str:
+        """The conversation so far as prompt text, empty if there is none"""
+        turns = self.turns(key)
+        if not turns:
+            return ""
+        lines = ["[Conversation so far]"]
+        for turn in turns:
+            lines.append(f"User: {turn['prompt']}")
+            lines.append(f"Assistant: {turn['response']}")
+        return "\n".join(lines) + "\n[End of conversation]\n"
+
+    def clear(self, key: Any = None):
+        """Forget one conversation, or all of them"""
+        if key is None:
+            self._conversations.clear()
+        else:
+            self._conversations.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._expire()
+        return {
+            "conversations": len(self._conversations),
+            "max_conversations": self.max_conversations,
+            "turns": sum(len(c[2]) for c in self._conversations.values()),
+            "tokens": sum(c[1] for c in self._conversations.values()),
+            "max_tokens": self.max_tokens,
+            "evicted": self.evicted,
+            "expired": self.expired
+        }
+
+class AIProvider(ABC):
+    """
+    Interface shared by the AI backends (ChatbotAPI, gemini_api, perplexity_api, ai_router).
+    generate() returns the answer or raises an AIError subclass. With a conversation
+    key the backend sends that conversation's remembered turns (kept in self.memory)
+    along and adds the new one. A backend missing generate() or clear_history()
+    can't be instantiated.
+    """
+    name = "provider"
+    memory: ConversationMemory
+    max_history = 10  # Turns ChatSession keeps for compatibility
+    uses_limiter = False  # generate() enters the limiter option itself (the router holds it otherwise)
+    
+    @abstractmethod
+    async def generate(self, prompt: str, conversation: Any = None, **options) -> str:
+        """The answer to the prompt, raises an AIError subclass on failure"""
+    
+    async def send_message(self, prompt: str, conversation: Any = None, **options) -> str:
+        """Like generate(), but returns the error text instead of raising"""
+        try:
+            return await self.generate(prompt, conversation=conversation, **options)
+        except AIError as e:
+            return str(e)
+    
+    def seed_history(self, conversation: Any, turns: List[Tuple[str, str]]):
+        """Load earlier (prompt, response) pairs into a conversation not in memory yet"""
+        self.memory.seed(conversation, turns)
+    
+    @abstractmethod
+    def clear_history(self, conversation: Any = None):
+        """Forget one conversation, or all of them"""
+    
+    async def close(self):
+        """Release network resources"""
+
+DEFAULT_API_URL = "https://api.sidet.eu/ai_api.php"
+
+class ChatbotAPI(AIProvider):
     """
     AI Chatbot API client that integrates with sidet.eu API
     Maintains conversation history and provides personalized AI responses
     """
+    name = "sidet"
+    uses_limiter = True
     
     def __init__(self, config_path: str = "config.json"):
         """Initialize the chatbot API client"""
-        self.api_url = "https://api.sidet.eu/ai_api.php"
+        self.api_url = DEFAULT_API_URL
         self.config_path = config_path
         self.token = None
         self.model = "gemini-2.5-flash"  # Default model
-        self.history = []  # Local conversation history for context
-        self.max_history = 10  # Keep last 10 conversations for context
+        # Recent turns per conversation, prepended to prompts as context
+        self.memory = ConversationMemory()
+        
+        # Shared HTTP session, opened by start() and reused for every request
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.connection_limit = 20
+        self.connections_per_host = 10
+        
+        # Retries of transient failures, bounded by a total deadline per request
+        self.retry_policy = RetryPolicy()
+        self.deadline = 20.0
+        self.retries = 0
+        self.circuit_breaker = CircuitBreaker()
+        
+        # Optional cache of responses to identical prompts (None when disabled)
+        self.cache: Optional[ResponseCache] = ResponseCache()
+        # Upstream requests in progress, keyed like the cache, and how many requests joined one
+        self._in_flight: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self.coalesced = 0
+        
+        # Stream replies piece by piece (needs an API that supports "stream": true)
+        self.streaming = False
+        
+        # Connection statistics
+        self.requests_sent = 0
+        self.connections_created = 0
+        self.connections_reused = 0
         
         # Load configuration
         self._load_config()
@@ -34,14 +460,107 @@ class ChatbotAPI:
                 config = json.load(file)
                 # Get AI API token from config
                 self.token = config.get("ai_api", {}).get("token", "test123")  # Default to test123
+                # ai_api.url points the client elsewhere, e.g. at a local stub server in tests
+                self.api_url = config.get("ai_api", {}).get("url", DEFAULT_API_URL)
                 self.model = config.get("ai_api", {}).get("default_model", "gemini-2.5-flash")
+                self.connection_limit = config.get("ai_api", {}).get("connection_limit", 20)
+                self.connections_per_host = config.get("ai_api", {}).get("connections_per_host", 10)
+                self.deadline = config.get("ai_api", {}).get("deadline", 20.0)
+                self.retry_policy = RetryPolicy(
+                    max_attempts=config.get("ai_api", {}).get("max_attempts", 3),
+                    base_delay=config.get("ai_api", {}).get("retry_base_delay", 0.5),
+                    max_delay=config.get("ai_api", {}).get("retry_max_delay", 8.0)
+                )
+                self.circuit_breaker = CircuitBreaker(
+                    failure_threshold=config.get("ai_api", {}).get("breaker_failure_threshold", 5),
+                    reset_timeout=config.get("ai_api", {}).get("breaker_reset_timeout", 30.0)
+                )
+                self.streaming = config.get("ai_api", {}).get("streaming", False)
+                self.memory = ConversationMemory(
+                    max_conversations=config.get("ai_api", {}).get("memory_conversations", 500),
+                    max_tokens=config.get("ai_api", {}).get("memory_max_tokens", 1000),
+                    idle_timeout=config.get("ai_api", {}).get("memory_idle_timeout", 3600.0),
+                    max_turns=config.get("ai_api", {}).get("memory_max_turns", 20)
+                )
+                if config.get("ai_api", {}).get("cache_enabled", True):
+                    self.cache = ResponseCache(
+                        max_size=config.get("ai_api", {}).get("cache_size", 256),
+                        ttl=config.get("ai_api", {}).get("cache_ttl", 600.0)
+                    )
+                else:
+                    self.cache = None
         except Exception as e:
             print(f"Error loading config: {e}")
             # Use default values
             self.token = "test123"
             self.model = "gemini-2.5-flash"
     
-    async def send_message(self, prompt: str, model: Optional[str] = None, user_context: Optional[Dict] = None) -> str:
+    async def start(self):
+        """Open the shared HTTP session (keep-alive connections, cached DNS)"""
+        if self.session and not self.session.closed:
+            return
+        
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            limit_per_host=self.connections_per_host,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        self.session = aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Opened lazily when used outside the bot (e.g. test_chatbot)
+        if not self.session or self.session.closed:
+            await self.start()
+        return self.session
+    
+    async def _on_request_start(self, session, context, params):
+        self.requests_sent += 1
+    
+    async def _on_connection_create_end(self, session, context, params):
+        self.connections_created += 1
+    
+    async def _on_connection_reuseconn(self, session, context, params):
+        self.connections_reused += 1
+    
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """Get shared session connection reuse statistics"""
+        connections = self.connections_created + self.connections_reused
+        return {
+            "requests": self.requests_sent,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": self.connections_reused / connections if connections else 0.0,
+            "open": bool(self.session and not self.session.closed)
+        }
+    
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"sideteu {self.token}"
+        }
+    
+    async def ping(self, timeout: float = 5) -> int:
+        """Send a test prompt over the shared session and return the HTTP status"""
+        session = await self._get_session()
+        payload = {"prompt": "Hello", "model": "gemini-2.5-flash"}
+        async with session.post(self.api_url, json=payload, headers=self._headers(),
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            return response.status
+    
+    async def send_message(self, prompt: str, model: Optional[str] = None, user_context: Optional[Dict] = None,
+                           conversation: Any = None) -> str:
         """
         Send a message to the AI API and get a response
         
@@ -49,74 +568,321 @@ class ChatbotAPI:
             prompt: The user's message/question
             model: Optional model override
             user_context: Optional user context for personalization
+            conversation: Optional conversation key whose recent turns are sent as context
             
         Returns:
-            AI response string
+            AI response string, or a description of the error
         """
         if not prompt.strip():
             return "I need a message to respond to!"
         
-        # Use provided model or default
-        selected_model = model or self.model
+        try:
+            return await self.generate(prompt, model, user_context, conversation=conversation)
+        except AIError as e:
+            return str(e)
+    
+    def _cache_key(self, prompt: str, model: Optional[str], user_context: Optional[Dict]) -> Tuple[str, ...]:
+        """
+        Responses are shared between prompts that differ only in case and whitespace.
+        Prompts with conversation history are never looked up, see _uses_cache.
+        """
+        normalized = " ".join(prompt.casefold().split())
+        context = json.dumps(user_context, sort_keys=True) if user_context else ""
+        return (normalized, model or self.model, self.token, context)
+    
+    def _uses_cache(self, use_cache: bool, conversation: Any) -> bool:
+        """
+        A conversation with earlier turns bypasses the cache (and coalescing): its prompt embeds
+        the history, which changes every turn, so the entry would (almost) never be hit again and
+        only push shareable answers out. The first message of a conversation is cached as usual.
+        """
+        return use_cache and not (conversation is not None and self.memory.turns(conversation))
+    
+    async def generate(self, prompt: str, model: Optional[str] = None, user_context: Optional[Dict] = None,
+                       budget: Optional[float] = None, use_cache: bool = True,
+                       limiter: Optional[Callable[[], AsyncContextManager]] = None,
+                       conversation: Any = None) -> str:
+        """
+        Get a response, retrying transient failures per self.retry_policy.
+        With a conversation key the recent turns of that conversation are sent along
+        and the new exchange is remembered in it.
+        All attempts together finish within budget seconds (default ai_api.deadline).
+        limiter, if given, is entered around the upstream call only (e.g. a scheduler slot),
+        so cached and coalesced answers never wait for it. With use_cache=False, or a conversation
+        that already has turns, the request neither uses nor fills the cache and isn't shared
+        with identical requests.
+        Raises an AIError subclass if no response could be produced.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (budget if budget is not None else self.deadline)
         
-        # Add user context to prompt if provided
-        contextualized_prompt = self._add_context_to_prompt(prompt, user_context)
+        return await self._generate_shared(self._with_conversation(prompt, conversation), model,
+                                           user_context, deadline, self._uses_cache(use_cache, conversation),
+                                           limiter, conversation, prompt)
+    
+    async def _generate_shared(self, prompt: str, model: Optional[str], user_context: Optional[Dict],
+                               deadline: float, use_cache: bool,
+                               limiter: Optional[Callable[[], AsyncContextManager]],
+                               conversation: Any = None, turn_prompt: str = "") -> str:
+        """The answer to prompt, remembered as (turn_prompt, answer) in the conversation if one is given"""
+        cache_key = self._cache_key(prompt, model, user_context)
+        if use_cache and self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._remember(conversation, turn_prompt, cached)
+                return cached
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"sideteu {self.token}"
-        }
+        if not use_cache:
+            response = await self._generate_limited(prompt, model, user_context, deadline, limiter)
+            self._remember(conversation, turn_prompt, response)
+            return response
+        
+        # Identical prompts already on their way upstream share that request's answer. The request
+        # runs in its own task, so a caller that gives up (e.g. a lost hedge) doesn't fail the others
+        shared = self._in_flight.get(cache_key)
+        if shared is None or shared["abandoned"]:
+            task = asyncio.create_task(self._generate_limited(prompt, model, user_context, deadline, limiter))
+            shared = self._in_flight[cache_key] = {"task": task, "waiters": 0, "abandoned": False,
+                                                   "remembered": set()}
+            task.add_done_callback(lambda done, shared=shared: self._finish_shared(cache_key, shared))
+        else:
+            self.coalesced += 1
         
-        payload = {
-            "prompt": contextualized_prompt,
-            "model": selected_model
+        shared["waiters"] += 1
+        try:
+            response = await asyncio.shield(shared["task"])
+        except asyncio.CancelledError:
+            # The last caller to leave stops the request, nobody wants its answer any more
+            if shared["waiters"] == 1 and not shared["task"].done():
+                shared["abandoned"] = True
+                shared["task"].cancel()
+            raise
+        finally:
+            shared["waiters"] -= 1
+        # Callers coalesced from the same conversation asked once, so the turn is stored once
+        if conversation is not None and conversation not in shared["remembered"]:
+            shared["remembered"].add(conversation)
+            self._remember(conversation, turn_prompt, response)
+        return response
+    
+    def _remember(self, conversation: Any, prompt: str, response: str):
+        if conversation is not None:
+            self.memory.add(conversation, prompt, response)
+    
+    def _finish_shared(self, cache_key: Tuple[str, ...], shared: Dict[str, Any]):
+        """Done callback of a shared request: cache its answer and stop sharing it"""
+        if self._in_flight.get(cache_key) is shared:
+            del self._in_flight[cache_key]
+        task = shared["task"]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # Retrieved, so a request whose callers all left doesn't log a warning
+            return
+        if self.cache is not None:
+            self.cache.set(cache_key, task.result())
+    
+    async def _generate_limited(self, prompt: str, model: Optional[str], user_context: Optional[Dict],
+                                deadline: float, limiter: Optional[Callable[[], AsyncContextManager]]) -> str:
+        if limiter is None:
+            return await self._generate_with_retry(prompt, model, user_context, deadline)
+        async with limiter():
+            return await self._generate_with_retry(prompt, model, user_context, deadline)
+    
+    async def _generate_with_retry(self, prompt: str, model: Optional[str], user_context: Optional[Dict],
+                                   deadline: float) -> str:
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise AITimeoutError("Deadline exceeded before the request could be sent")
+            # While the backend is known to be down, fail instantly instead of waiting on it
+            if not self.circuit_breaker.allow_request():
+                raise AICircuitOpenError(
+                    f"AI backend unavailable, circuit open for another {self.circuit_breaker.retry_in():.0f}s")
+            try:
+                response = await self._request(prompt, model, user_context, timeout=remaining)
+                self.circuit_breaker.record_success()
+                return response
+            except asyncio.CancelledError:
+                self.circuit_breaker.abandon_trial()
+                raise
+            except AIError as e:
+                # Only transient failures count against the backend, a rejected token means it is up
+                if e.retryable:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                attempt += 1
+                if not e.retryable or attempt >= self.retry_policy.max_attempts:
+                    raise
+                delay = self.retry_policy.delay_for(attempt, e)
+                # Don't sleep towards a retry that couldn't finish in time anyway
+                if loop.time() + delay >= deadline:
+                    raise
+                print(f"AI attempt {attempt} failed ({e}), retrying in {delay:.2f}s")
+                self.retries += 1
+                await asyncio.sleep(delay)
+    
+    def _payload(self, prompt: str, model: Optional[str], user_context: Optional[Dict]) -> Dict[str, Any]:
+        # Use provided model or default, add user context to prompt if provided
+        return {
+            "prompt": self._add_context_to_prompt(prompt, user_context),
+            "model": model or self.model
         }
+    
+    async def _raise_for_status(self, response: aiohttp.ClientResponse):
+        """Raise the typed AIError for a non-200 response"""
+        await raise_for_status(response)
+    
+    @staticmethod
+    def _response_text(data: Dict[str, Any]) -> str:
+        """Response text from a complete JSON reply"""
+        if data.get("success"):
+            return data["response"]
+        error_msg = data.get("error", "Unknown error")
+        print(f"API Error: {error_msg}")
+        raise AIResponseError(f"API Error: {error_msg}")
+    
+    async def _request(self, prompt: str, model: Optional[str], user_context: Optional[Dict],
+                       timeout: float) -> str:
+        """Send one request to the API, raising a typed AIError on failure"""
+        payload = self._payload(prompt, model, user_context)
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, json=payload, headers=headers) as response:
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        if data.get("success"):
-                            ai_response = data["response"]
-                            
-                            # Add to local history
-                            self._add_to_history(prompt, ai_response)
-                            
-                            return ai_response
-                        else:
-                            error_msg = data.get("error", "Unknown error")
-                            print(f"API Error: {error_msg}")
-                            return f"API Error: {error_msg}"
-                    
-                    elif response.status == 401:
-                        return "Authentication failed - invalid token"
-                    
-                    elif response.status == 400:
-                        return "Bad request - check your message format"
-                    
-                    else:
-                        error_text = await response.text()
-                        print(f"HTTP {response.status}: {error_text}")
-                        return f"Service temporarily unavailable (HTTP {response.status})"
+            session = await self._get_session()
+            async with session.post(self.api_url, json=payload, headers=self._headers(),
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                await self._raise_for_status(response)
+                return self._response_text(await response.json(content_type=None))
+        
+        except AIError:
+            raise
+        
+        except asyncio.TimeoutError:
+            raise AITimeoutError("Request timed out")
         
         except aiohttp.ClientError as e:
             print(f"Network error: {e}")
-            return "Network error - please try again later"
+            raise AINetworkError("Network error - please try again later")
         
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
             print(f"JSON decode error: {e}")
-            return "Invalid response format from API"
+            raise AIResponseError("Invalid response format from API", retryable=True)
+    
+    async def stream(self, prompt: str, model: Optional[str] = None, user_context: Optional[Dict] = None,
+                     use_cache: bool = True,
+                     limiter: Optional[Callable[[], AsyncContextManager]] = None,
+                     conversation: Any = None, budget: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield the response in pieces as the API produces them.
+        Server-sent events and plain chunked bodies are read incrementally; a server
+        that answers with one JSON document yields it as a single piece. There are no
+        retries once streaming has started, but the circuit breaker, the cache and
+        limiter and conversation apply like in generate(), so a conversation with earlier
+        turns isn't cached either. Connecting and each wait for
+        a piece take at most budget seconds (default ai_api.deadline).
+        """
+        turn_prompt = prompt
+        use_cache = self._uses_cache(use_cache, conversation)
+        prompt = self._with_conversation(prompt, conversation)
+        cache_key = self._cache_key(prompt, model, user_context)
+        if use_cache and self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if conversation is not None:
+                    self.memory.add(conversation, turn_prompt, cached)
+                yield cached
+                return
         
-        except Exception as e:
-            print(f"Unexpected error: {e}")
-            return "An unexpected error occurred"
+        if not self.circuit_breaker.allow_request():
+            raise AICircuitOpenError(
+                f"AI backend unavailable, circuit open for another {self.circuit_breaker.retry_in():.0f}s")
+        
+        payload = self._payload(prompt, model, user_context)
+        payload["stream"] = True
+        headers = self._headers()
+        headers["Accept"] = "text/event-stream, application/json"
+        # The deadline limits the wait for each piece, not the whole (possibly long) answer
+        wait = self.deadline if budget is None else min(self.deadline, budget)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=wait, sock_read=wait)
+        
+        pieces = []
+        try:
+            async with AsyncExitStack() as stack:
+                if limiter is not None:
+                    await stack.enter_async_context(limiter())
+                session = await self._get_session()
+                response = await stack.enter_async_context(
+                    session.post(self.api_url, json=payload, headers=headers, timeout=timeout))
+                await self._raise_for_status(response)
+                
+                content_type = response.headers.get("Content-Type", "")
+                if content_type.startswith("application/json"):
+                    pieces.append(self._response_text(await response.json(content_type=None)))
+                    yield pieces[-1]
+                else:
+                    is_sse = content_type.startswith("text/event-stream")
+                    parser = SSEParser()
+                    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                    done = False
+                    async for raw in response.content.iter_any():
+                        text = decoder.decode(raw)
+                        for piece in (parser.feed(text) if is_sse else [text]):
+                            if is_sse:
+                                if piece == "[DONE]":
+                                    done = True
+                                    break
+                                piece = stream_event_text(piece)
+                            if piece:
+                                pieces.append(piece)
+                                yield piece
+                        if done:
+                            break
+        
+        except AIError as e:
+            if e.retryable:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            raise
+        
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled, or the caller stopped reading early
+            self.circuit_breaker.abandon_trial()
+            raise
+        
+        except asyncio.TimeoutError:
+            self.circuit_breaker.record_failure()
+            raise AITimeoutError("Stream stalled")
+        
+        except aiohttp.ClientError as e:
+            print(f"Network error: {e}")
+            self.circuit_breaker.record_failure()
+            raise AINetworkError("Network error - please try again later")
+        
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+            print(f"JSON decode error: {e}")
+            self.circuit_breaker.record_failure()
+            raise AIResponseError("Invalid response format from API", retryable=True)
+        
+        self.circuit_breaker.record_success()
+        ai_response = "".join(pieces)
+        if conversation is not None:
+            self.memory.add(conversation, turn_prompt, ai_response)
+        if use_cache and self.cache is not None and ai_response:
+            self.cache.set(cache_key, ai_response)
+    
+    def _with_conversation(self, prompt: str, conversation: Any) -> str:
+        """Prepend the recent turns of the conversation to the prompt"""
+        if conversation is None:
+            return prompt
+        return self.memory.render(conversation) + prompt
     
     def _add_context_to_prompt(self, prompt: str, user_context: Optional[Dict] = None) -> str:
         """
-        Add conversation history and user context to the prompt
+        Add user context to the prompt, conversation history is added by _with_conversation
         """
         contextualized_prompt = prompt
         
@@ -134,29 +900,15 @@ class ChatbotAPI:
                 context_str = " | ".join(context_info)
                 contextualized_prompt = f"[Context: {context_str}]\n{prompt}"
         
-        # The API handles conversation history automatically per token,
-        # but we keep local history for potential fallback or additional context
         return contextualized_prompt
     
-    def _add_to_history(self, prompt: str, response: str):
-        """Add interaction to local history"""
-        self.history.append({
-            "timestamp": datetime.now().isoformat(),
-            "prompt": prompt,
-            "response": response
-        })
-        
-        # Keep only last N interactions
-        if len(self.history) > self.max_history:
-            self.history = self.history[-self.max_history:]
+    def get_history(self, conversation: Any) -> List[Dict[str, Any]]:
+        """Get the remembered turns of a conversation"""
+        return self.memory.turns(conversation)
     
-    def get_history(self) -> List[Dict[str, Any]]:
-        """Get conversation history"""
-        return self.history.copy()
-    
-    def clear_history(self):
-        """Clear local conversation history"""
-        self.history = []
+    def clear_history(self, conversation: Any = None):
+        """Forget one conversation, or all of them"""
+        self.memory.clear(conversation)
     
     def set_model(self, model: str):
         """Change the AI model"""
@@ -232,16 +984,16 @@ class ChatbotAPI:
 class ChatSession:
     """
     Legacy compatibility class for existing code
-    Wraps the new ChatbotAPI for backward compatibility
+    Wraps the new ChatbotAPI (or any AIProvider, e.g. an AIRouter) for backward compatibility
     """
     
-    def __init__(self):
-        self.api = ChatbotAPI()
-        self.history = []  # Keep for compatibility
+    def __init__(self, api: Optional[AIProvider] = None):
+        self.api = api or ChatbotAPI()
+        self.history = deque(maxlen=self.api.max_history * 2)  # Keep for compatibility
     
-    async def send_message(self, query: str) -> str:
+    async def send_message(self, query: str, conversation: Any = None) -> str:
         """Send message using the new API (compatibility method)"""
-        response = await self.api.send_message(query)
+        response = await self.api.send_message(query, conversation=conversation)
         
         # Keep local history for compatibility
         self.history.append({"role": "user", "text": query})
@@ -249,9 +1001,21 @@ class ChatSession:
         
         return response
     
+    async def generate(self, query: str, budget: Optional[float] = None, use_cache: bool = True,
+                       limiter: Optional[Callable[[], AsyncContextManager]] = None,
+                       conversation: Any = None) -> str:
+        """Like send_message, but raises AIError instead of returning error text"""
+        response = await self.api.generate(query, budget=budget, use_cache=use_cache, limiter=limiter,
+                                           conversation=conversation)
+        
+        self.history.append({"role": "user", "text": query})
+        self.history.append({"role": "assistant", "text": response})
+        
+        return response
+    
     def clear_history(self):
         """Clear history (compatibility method)"""
-        self.history = []
+        self.history.clear()
         self.api.clear_history()
 
 
@@ -288,6 +1052,9 @@ async def test_chatbot():
     
     response = await chatbot.send_message("Explain quantum physics briefly")
     print(f"AI (Pro model): {response}")
+    print(f"Connections: {chatbot.get_connection_stats()}")
+    
+    await chatbot.close()
 
 
 if __name__ == "__main__":
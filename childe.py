@@ -5,6 +5,7 @@ import random
 import json
 import os
 import asyncio
+import time
 from discord.ui import Button, View
 from discord import app_commands
 from discord.ext.commands import MissingPermissions
@@ -12,10 +13,16 @@ import aiofiles
 import requests
 import subprocess
 from datetime import datetime
-from chatbot_ai import ChatSession, ChatbotAPI
+from chatbot_ai import ChatSession, ChatbotAPI, AIError
+from ai_scheduler import AIRequestScheduler, QueueTimeout
+from ai_router import AIRouter, create_providers
 from config import config
 from db_helpers import db_helpers
 from database import db
+from log_writer import JsonlLogWriter
+from neko_pool import neko_pool
+from command_sync import CommandSyncer
+from extension_loader import ExtensionLoader
 DEFAULT_PREFIX = config.get("bot.default_prefix", "*")
 PREFIX_FILE = "prefixes.json"
 WARNINGS_FILE = "warnings.json"
@@ -37,9 +44,8 @@ async def determine_prefix(bot, message):
     if not message.guild:
         return DEFAULT_PREFIX
 
-    guild_id = str(message.guild.id)
-    # Get prefix from database  
-    prefix = await db_helpers.get_server_setting(guild_id, "prefix")
+    # Get prefix from the write-through cache (warmed from the database in on_ready)
+    prefix = await db_helpers.get_prefix(message.guild.id)
     return prefix or DEFAULT_PREFIX
 
 intents = discord.Intents.default()
@@ -49,6 +55,9 @@ intents.members = True
 
 # Load configuration values
 GUILD_ID = config.get("bot.guild_id", 535890114258141184)
+STREAM_EDIT_INTERVAL = config.get("ai_api.stream_edit_interval", 1.5)  # Seconds between edits of a streamed reply
+STREAM_PREVIEW_LIMIT = 1900  # Discord messages are capped at 2000 characters
+AI_MEMORY_SEED_TURNS = config.get("ai_api.memory_seed_turns", 0)  # Turns loaded from ai_chat_history after a restart (0 = off)
 TWITCH_CHANNEL = config.get("api.twitch.channel", "bluecat201")
 ANNOUNCEMENT_CHANNEL_ID = config.get("bot.announcement_channel_id", 592348081362829312)
 CLIENT_ID = config.get("api.twitch.client_id", "")
@@ -64,57 +73,66 @@ class CustomBot(commands.Bot):
             command_prefix=determine_prefix,
             intents=intents
         )
+        self.extension_loader = ExtensionLoader(self)
 
     async def setup_hook(self):
         print("Setting up the bot...")
-        # Load all extensions from the cogs folder
-        for filename in os.listdir("./cogs"):
-            if filename.endswith(".py"):
-                try:
-                    await self.load_extension(f"cogs.{filename[:-3]}")
-                    print(f"Loaded extension: {filename}")
-                except Exception as e:
-                    print(f"Failed to load extension {filename}: {e}")
-
-        # Sync commands globally
-        try:
-            synced_commands = await self.tree.sync()
-            print(f"Synced {len(synced_commands)} commands globally!")
-        except Exception as e:
-            print(f"Error syncing global commands: {e}")
-
-        # Additionally sync commands to each guild for immediate updates
-        for guild in self.guilds:
-            try:
-                synced_commands = await self.tree.sync(guild=discord.Object(id=guild.id))
-                print(f"Synced {len(synced_commands)} commands to guild: {guild.name}")
-            except Exception as e:
-                print(f"Error syncing commands to {guild.name}: {e}")
-
-# Initialize AI chatbot before bot creation
-chat_session = ChatSession()
+        started = time.perf_counter()
+        # One pooled HTTP session for every AI request, opened while the cogs load.
+        # The extensions load concurrently so one cog's setup doesn't hold up the rest
+        await asyncio.gather(self.chatbot_api.start(), self.extension_loader.load_all())
+        self.extension_loader.report()
+
+        # Sync slash commands, only the scopes whose commands changed since the last sync
+        sync_started = time.perf_counter()
+        await sync_commands(self)
+        print(f"Command sync took {time.perf_counter() - sync_started:.2f}s, "
+              f"setup took {time.perf_counter() - started:.2f}s")
+
+    async def add_cog(self, cog, /, **kwargs):
+        # The extension adding its cog has finished importing, the rest is its setup
+        self.extension_loader.setup_started(type(cog).__module__)
+        await super().add_cog(cog, **kwargs)
+
+    async def close(self):
+        # Cogs are unloaded first so they can still drain buffered writes to the pool
+        await super().close()
+        await self.ai_router.close()
+        await neko_pool.close()
+        await ai_log_writer.flush()
+        await db.disconnect()
+
+# Initialize AI chatbot before bot creation (the mention handler and /ai commands share one client)
 chatbot_api = ChatbotAPI()
+# Mentions go through the router: the sidet API first, then any ai_api.fallback_providers
+ai_router = AIRouter(
+    create_providers(chatbot_api, config.get("ai_api.fallback_providers", [])),
+    latency_slo=config.get("ai_api.latency_slo", 8.0),
+    hedge=config.get("ai_api.hedge", True),
+    deadline=chatbot_api.deadline
+)
+chat_session = ChatSession(ai_router)
+ai_scheduler = AIRequestScheduler(
+    max_concurrent=config.get("ai_api.max_concurrent", 4),
+    max_wait=config.get("ai_api.max_queue_wait", 15)
+)
 
 bot = CustomBot()
 # Make chatbot API accessible to cogs
 bot.chatbot_api = chatbot_api
-
-async def sync_commands(bot_instance):
-    """Sync commands globally and to all guilds"""
+bot.ai_router = ai_router
+bot.ai_scheduler = ai_scheduler
+
+async def sync_commands(bot_instance, guild_ids=(), force=False):
+    """
+    Sync commands globally and to guilds with guild commands, skipping every scope
+    whose commands are unchanged since the last sync unless force is set
+    """
     try:
-        # Sync commands globally
-        synced_commands = await bot_instance.tree.sync()
-        print(f"Synced {len(synced_commands)} commands globally!")
-        
-        # Additionally sync commands to each guild for immediate updates
-        for guild in bot_instance.guilds:
-            try:
-                synced_commands = await bot_instance.tree.sync(guild=discord.Object(id=guild.id))
-                print(f"Synced {len(synced_commands)} commands to guild: {guild.name}")
-            except Exception as e:
-                print(f"Error syncing commands to {guild.name}: {e}")
+        return await CommandSyncer(bot_instance).sync(guild_ids, force=force)
     except Exception as e:
-        print(f"Error syncing global commands: {e}")
+        print(f"Error syncing commands: {e}")
+        return None
 
 # --- SLASH COMMANDS ---
 @bot.tree.command(name="rps", description="Play rock, paper, scissors")
@@ -180,10 +198,18 @@ async def twitch(ctx):
 
 # --- AI Chatbot ---
 
-async def log_ai_interaction(user, guild, channel, prompt, response, session_id):
-    """Log AI chatbot interactions to a file"""
-    log_data = {
+# Daily append-only AI interaction log (logs/ai_interactions_<date>.jsonl)
+ai_log_writer = JsonlLogWriter(
+    "logs", "ai_interactions", date_format="%Y-%m-%d",
+    compress_closed=config.get("logging.compress_ai_logs", False)
+)
+bot.ai_log_writer = ai_log_writer
+
+def log_ai_interaction(session_id, user, guild, channel, message_id, prompt, response):
+    """Log AI chatbot interactions to a file (same fields as ai_chat_history)"""
+    ai_log_writer.write({
         "timestamp": datetime.now().isoformat(),
+        "session_id": session_id,
         "user_id": user.id,
         "username": str(user),
         "user_display_name": user.display_name,
@@ -191,35 +217,53 @@ async def log_ai_interaction(user, guild, channel, prompt, response, session_id)
         "guild_name": str(guild) if guild else "DM",
         "channel_id": channel.id,
         "channel_name": str(channel),
+        "message_id": message_id,
         "prompt": prompt,
-        "response": response,
-        "session_id": session_id
-    }
-    
-    # Ensure logs directory exists
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
-    
-    # Write to daily log file
-    log_filename = f"logs/ai_interactions_{datetime.now().strftime('%Y-%m-%d')}.json"
-    
+        "response": response
+    })
+
+def ai_conversation_key(message):
+    """Mentions share AI memory per channel in servers and per user in DMs"""
+    if message.guild:
+        return ("channel", message.channel.id)
+    return ("user", message.author.id)
+
+async def seed_ai_memory(conversation, channel_id):
+    """Load the last turns of a conversation the AI doesn't remember (e.g. after a restart) from ai_chat_history"""
+    if not AI_MEMORY_SEED_TURNS or ai_router.memory.has(conversation):
+        return
+    rows = await db_helpers.get_recent_ai_chat_history(limit=AI_MEMORY_SEED_TURNS, channel_id=channel_id)
+    ai_router.seed_history(conversation, [(row['prompt'], row['response']) for row in reversed(rows)])
+
+async def stream_ai_reply(message, query, use_cache, limiter, conversation):
+    """
+    Reply with the AI answer while it streams in. The reply is posted with the first
+    piece and then edited at most every STREAM_EDIT_INTERVAL seconds.
+    Returns (reply message or None, text). AIError is raised only if nothing was posted.
+    """
+    loop = asyncio.get_running_loop()
+    text = ""
+    reply_message = None
+    last_edit = 0.0
     try:
-        # Read existing logs if file exists
-        if os.path.exists(log_filename):
-            with open(log_filename, "r", encoding="utf-8") as f:
-                logs = json.load(f)
-        else:
-            logs = []
-        
-        # Append new log entry
-        logs.append(log_data)
-        
-        # Write back to file
-        with open(log_filename, "w", encoding="utf-8") as f:
-            json.dump(logs, f, indent=2, ensure_ascii=False)
-            
-    except Exception as e:
-        print(f"Error logging AI interaction: {e}")
+        # Through the router, so a stream that fails before its first piece fails over to the other providers
+        async for piece in ai_router.stream(query, use_cache=use_cache, limiter=limiter,
+                                            conversation=conversation):
+            text += piece
+            if not text.strip():
+                continue
+            if reply_message is None:
+                reply_message = await message.reply(text[:STREAM_PREVIEW_LIMIT])
+                last_edit = loop.time()
+            elif loop.time() - last_edit >= STREAM_EDIT_INTERVAL:
+                await reply_message.edit(content=f"{text[:STREAM_PREVIEW_LIMIT]} …")
+                last_edit = loop.time()
+    except AIError as e:
+        if reply_message is None:
+            raise
+        # Keep what the user already sees rather than replacing it with the fallback
+        print(f"AI stream broke off ({type(e).__name__}): {e}")
+    return reply_message, text
 
 @bot.event
 async def on_message(message):
@@ -247,31 +291,33 @@ async def on_message(message):
                 "channel_name": message.channel.name if hasattr(message.channel, 'name') else str(message.channel)
             }
             
-            # Try up to 2 times to get a response
             response = None
-            max_attempts = 2
+            reply_message = None
+            guild_id = message.guild.id if message.guild else None
+            # Guilds can opt out of answers from the response cache
+            use_cache = await db_helpers.is_ai_cache_enabled(guild_id) if guild_id else True
             
-            for attempt in range(max_attempts):
-                try:
+            limiter = lambda: ai_scheduler.slot(guild_id, message.author.id)
+            conversation = ai_conversation_key(message)
+            
+            try:
+                await seed_ai_memory(conversation, message.channel.id)
+                # Queueing for a fair share of the concurrent AI slots, every retry and the failover
+                # to other providers share one deadline budget per mention
+                if chatbot_api.streaming:
+                    # A stream that fails before its first piece is taken over by regular requests
+                    reply_message, response = await stream_ai_reply(message, query, use_cache, limiter, conversation)
+                else:
                     # Use the ChatSession which wraps the new API
-                    response = await chat_session.send_message(query)
-                    
-                    # Check if response indicates an error from the API
-                    if response and not any(error_indicator in response.lower() for error_indicator in 
-                                          ["api error", "authentication failed", "network error", "service temporarily unavailable"]):
-                        break  # Got a valid response
-                    elif response:
-                        print(f"AI API returned error: {response}")
-                except Exception as e:
-                    print(f"AI attempt {attempt + 1} failed: {e}")
-                
-                # Wait before retry if not the last attempt
-                if attempt < max_attempts - 1:
-                    await asyncio.sleep(1)
+                    response = await chat_session.generate(query, use_cache=use_cache, limiter=limiter,
+                                                           conversation=conversation)
+            except QueueTimeout as e:
+                print(f"AI request from {message.author} not started: {e}")
+            except AIError as e:
+                print(f"AI request failed ({type(e).__name__}): {e}")
             
-            # If no response after all attempts, use fallback
-            if not response or any(error_indicator in response.lower() for error_indicator in 
-                                 ["api error", "authentication failed", "network error", "service temporarily unavailable"]):
+            # If no response, use fallback
+            if not response:
                 response = "Mám krámy. (AI service is currently unavailable)"
                 print("AI failed after all attempts, using fallback message")
         
@@ -279,8 +325,11 @@ async def on_message(message):
         random_chars = ''.join(random.choices('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=8))
         response_with_footer = f"{response}\n-# Generated on sidet.eu API v1.3.2 | #{random_chars}"
         
-        # Send reply and get message object
-        reply_message = await message.reply(response_with_footer)
+        # Send reply and get message object (a streamed reply already exists, it gets its final text)
+        if reply_message:
+            await reply_message.edit(content=response_with_footer)
+        else:
+            reply_message = await message.reply(response_with_footer)
         
         # Save to database with message ID
         from db_helpers import db_helpers
@@ -299,13 +348,14 @@ async def on_message(message):
         )
         
         # Also log to file for backup
-        await log_ai_interaction(
+        log_ai_interaction(
+            session_id=random_chars,
             user=message.author,
             guild=message.guild,
             channel=message.channel,
+            message_id=reply_message.id,
             prompt=query,
-            response=response,
-            session_id=random_chars
+            response=response
         )
     await bot.process_commands(message)
 
@@ -326,23 +376,12 @@ async def sync(ctx):
     
     await ctx.send("🔄 Syncing slash commands...")
     
-    try:
-        # Sync globally
-        synced_global = await bot.tree.sync()
-        print(f"Synced {len(synced_global)} commands globally")
-        
-        # Sync to current guild for immediate availability
-        if ctx.guild:
-            synced_guild = await bot.tree.sync(guild=discord.Object(id=ctx.guild.id))
-            print(f"Synced {len(synced_guild)} commands to guild {ctx.guild.name}")
-            
-            await ctx.send(f"✅ Successfully synced {len(synced_global)} global commands and {len(synced_guild)} guild commands!")
-        else:
-            await ctx.send(f"✅ Successfully synced {len(synced_global)} global commands!")
-            
-    except Exception as e:
-        await ctx.send(f"❌ Error syncing commands: {e}")
-        print(f"Error syncing commands: {e}")
+    # Forced, so the commands are re-uploaded even if the local fingerprints match
+    result = await sync_commands(bot, guild_ids=[ctx.guild.id] if ctx.guild else [], force=True)
+    if result is None:
+        await ctx.send("❌ Error syncing commands, see the console for details")
+    else:
+        await ctx.send(f"✅ Successfully synced {result['synced']} command scope(s)!")
 
 @bot.command(aliases=['State', 'STATUS', 'status'])
 async def state(ctx):
@@ -397,10 +436,18 @@ async def database_status(ctx):
         embed.add_field(name="MySQL Available", value="✅ Yes" if DATABASE_AVAILABLE else "❌ No", inline=False)
         
         if DATABASE_AVAILABLE:
-            connection_status = "✅ Connected" if (db.connection and db.connection.is_connected()) else "❌ Disconnected"
+            connection_status = "✅ Connected" if db.is_connected else "❌ Disconnected"
             embed.add_field(name="Connection Status", value=connection_status, inline=False)
             
-            if db.connection and db.connection.is_connected():
+            if db.is_connected:
+                pool_stats = db.pool.stats()
+                embed.add_field(
+                    name="Connection Pool",
+                    value=f"In use: {pool_stats['in_use']}/{pool_stats['size']} | Idle: {pool_stats['idle']}\n"
+                          f"Opened: {pool_stats['opened']} | Discarded: {pool_stats['discarded']} | Timeouts: {pool_stats['timeouts']}",
+                    inline=False
+                )
+                
                 # Test a simple query
                 try:
                     wallet, bank = await db_helpers.get_user_balance(ctx.author)
@@ -424,6 +471,8 @@ async def on_ready():
         await db.connect()
         await db.create_tables()
         print("✅ Database connected and tables created successfully!")
+        cached_prefixes = await db_helpers.warm_prefix_cache()
+        print(f"Cached prefixes for {cached_prefixes} guilds")
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
         print("Bot will continue with limited functionality.")
@@ -2,8 +2,13 @@ import discord
 import random
 import json
 import os
-from discord.ext import commands
-from db_helpers import db_helpers
+from discord.ext import commands, tasks
+from db_helpers import db_helpers, xp_accumulator
+from config import config
+
+# XP is buffered in memory and flushed in batches unless write-behind is disabled
+XP_WRITE_BEHIND = config.get("leveling.write_behind", True)
+XP_FLUSH_INTERVAL = config.get("leveling.xp_flush_interval", 30)
 
 # Helper functions for settings management
 async def get_guild_settings(guild_id):
@@ -14,74 +19,22 @@ async def get_guild_settings(guild_id):
 
 async def is_leveling_enabled(guild_id):
     """Check if leveling is enabled for a guild"""
-    from database import db
-    if not db.connection or not db.connection.is_connected():
-        return True  # Default to enabled if database not available
-        
-    cursor = db.connection.cursor()
-    try:
-        cursor.execute("SELECT enabled FROM leveling_enabled WHERE guild_id = %s", (guild_id,))
-        result = cursor.fetchone()
-        return result[0] if result else True  # Default to enabled
-    except Exception as e:
-        print(f"Error checking leveling enabled: {e}")
-        return True
-    finally:
-        cursor.close()
+    guild_config = await db_helpers.get_leveling_config(guild_id)
+    return guild_config['enabled']
 
 async def is_channel_ignored(guild_id, channel_id):
     """Check if a channel is in the ignored list"""
-    from database import db
-    if not db.connection or not db.connection.is_connected():
-        return False  # Default to not ignored if database not available
-        
-    cursor = db.connection.cursor()
-    try:
-        cursor.execute("SELECT 1 FROM ignored_channels WHERE guild_id = %s AND channel_id = %s", (guild_id, channel_id))
-        return cursor.fetchone() is not None
-    except Exception as e:
-        print(f"Error checking ignored channel: {e}")
-        return False
-    finally:
-        cursor.close()
+    guild_config = await db_helpers.get_leveling_config(guild_id)
+    return int(channel_id) in guild_config['ignored_channels']
 
 async def get_level_up_channel(guild_id):
     """Get the level up channel ID for a guild"""
-    from database import db
-    if not db.connection or not db.connection.is_connected():
-        return None  # Default to no level up channel if database not available
-        
-    cursor = db.connection.cursor()
-    try:
-        cursor.execute("SELECT channel_id FROM level_up_channels WHERE guild_id = %s", (guild_id,))
-        result = cursor.fetchone()
-        return result[0] if result else None
-    except Exception as e:
-        print(f"Error getting level up channel: {e}")
-        return None
-    finally:
-        cursor.close()
+    guild_config = await db_helpers.get_leveling_config(guild_id)
+    return guild_config['level_up_channel']
 
 async def get_mention_preference(user_id):
     """Get user's mention preference for level up messages"""
-    from database import db
-    if not db.connection or not db.connection.is_connected():
-        return True  # Default to mentioning if database not available
-        
-    cursor = db.connection.cursor()
-    try:
-        cursor.execute("SELECT preferences FROM mention_prefs WHERE user_id = %s", (user_id,))
-        result = cursor.fetchone()
-        if result:
-            import json
-            prefs = json.loads(result[0]) if result[0] else {}
-            return prefs.get("mention_on_levelup", True)
-        return True  # Default to True
-    except Exception as e:
-        print(f"Error getting mention preference: {e}")
-        return True
-    finally:
-        cursor.close()
+    return await db_helpers.get_mention_preference(user_id)
 
 # Function to save settings
 async def save_settings():
@@ -96,9 +49,29 @@ async def save_leveling_data():
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        if XP_WRITE_BEHIND:
+            self.flush_xp.start()
+
+    async def cog_unload(self):
+        # Drain buffered XP so nothing is lost on shutdown or reload
+        self.flush_xp.cancel()
+        await xp_accumulator.flush()
+
+    @tasks.loop(seconds=XP_FLUSH_INTERVAL)
+    async def flush_xp(self):
+        try:
+            await xp_accumulator.flush()
+        except Exception as e:
+            print(f"Error in XP flush loop: {e}")
 
     async def add_xp(self, user_id, guild_id, xp_to_add):
-        return await db_helpers.update_user_xp(guild_id, user_id, xp_to_add, 1)
+        """Add XP and return the new level if the user leveled up, otherwise None"""
+        if XP_WRITE_BEHIND:
+            return await xp_accumulator.add_xp(guild_id, user_id, xp_to_add, 1)
+        levels = await db_helpers.upsert_user_xp(guild_id, user_id, xp_to_add, 1)
+        if levels and levels[1] > levels[0]:
+            return levels[1]
+        return None
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -107,21 +80,23 @@ class Leveling(commands.Cog):
 
         guild_id = message.guild.id
         channel_id = message.channel.id
+        # Cached per guild, so the common path costs no config queries
+        guild_config = await db_helpers.get_leveling_config(guild_id)
 
         # Check if leveling is enabled
-        if not await is_leveling_enabled(guild_id):
+        if not guild_config['enabled']:
             return
 
         # Check if channel is ignored
-        if await is_channel_ignored(guild_id, channel_id):
+        if channel_id in guild_config['ignored_channels']:
             return
 
         # Add XP and check level up
-        leveled_up = await self.add_xp(message.author.id, message.guild.id, random.randint(5, 10))
+        new_level = await self.add_xp(message.author.id, message.guild.id, random.randint(5, 10))
 
-        if leveled_up:
+        if new_level:
             # Get level up channel ID
-            level_up_channel_id = await get_level_up_channel(guild_id)
+            level_up_channel_id = guild_config['level_up_channel']
             
             # Default to current channel if no level up channel set
             channel_to_use = self.bot.get_channel(int(level_up_channel_id)) if level_up_channel_id else message.channel
@@ -130,22 +105,8 @@ class Leveling(commands.Cog):
                 mention_user = await get_mention_preference(message.author.id)
                 mention_text = message.author.mention if mention_user else message.author.name
 
-                # Get user's current level from database
-                from database import db
-                current_level = 1  # Default level
-                if db.connection and db.connection.is_connected():
-                    cursor = db.connection.cursor()
-                    try:
-                        cursor.execute("SELECT level FROM leveling WHERE guild_id = %s AND user_id = %s", (guild_id, message.author.id))
-                        result = cursor.fetchone()
-                        current_level = result[0] if result else 1
-                    except Exception as e:
-                        print(f"Error getting current level: {e}")
-                    finally:
-                        cursor.close()
-
                 await channel_to_use.send(
-                    f"Congratulation, {mention_text}! Reached level {current_level}!"
+                    f"Congratulation, {mention_text}! Reached level {new_level}!"
                 )
 
     @commands.command()
@@ -155,12 +116,7 @@ class Leveling(commands.Cog):
         channel_id = channel.id
         
         if not await is_channel_ignored(guild_id, channel_id):
-            from database import db
-            cursor = db.connection.cursor()
-            try:
-                cursor.execute("INSERT IGNORE INTO ignored_channels (guild_id, channel_id) VALUES (%s, %s)", (guild_id, channel_id))
-            finally:
-                cursor.close()
+            await db_helpers.add_ignored_channel(guild_id, channel_id)
             await ctx.send(f"Channel {channel.mention} was added to list of ignored channels.")
         else:
             await ctx.send("This channel is already ignored.")
@@ -172,12 +128,7 @@ class Leveling(commands.Cog):
         channel_id = channel.id
         
         if await is_channel_ignored(guild_id, channel_id):
-            from database import db
-            cursor = db.connection.cursor()
-            try:
-                cursor.execute("DELETE FROM ignored_channels WHERE guild_id = %s AND channel_id = %s", (guild_id, channel_id))
-            finally:
-                cursor.close()
+            await db_helpers.remove_ignored_channel(guild_id, channel_id)
             await ctx.send(f"Channel {channel.mention} was deleted from list of ignored channels.")
         else:
             await ctx.send("This channel isn't ignored.")
@@ -187,16 +138,7 @@ class Leveling(commands.Cog):
     async def set_level_up_channel(self, ctx, channel: discord.TextChannel):
         guild_id = ctx.guild.id
         
-        from database import db
-        cursor = db.connection.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO level_up_channels (guild_id, channel_id) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE channel_id = VALUES(channel_id)
-            """, (guild_id, channel.id))
-        finally:
-            cursor.close()
+        await db_helpers.set_level_up_channel(guild_id, channel.id)
         await ctx.send(f"Channel {channel.mention} was set for announcement of level up.")
 
     @commands.command()
@@ -206,12 +148,7 @@ class Leveling(commands.Cog):
         
         level_up_channel_id = await get_level_up_channel(guild_id)
         if level_up_channel_id:
-            from database import db
-            cursor = db.connection.cursor()
-            try:
-                cursor.execute("DELETE FROM level_up_channels WHERE guild_id = %s", (guild_id,))
-            finally:
-                cursor.close()
+            await db_helpers.set_level_up_channel(guild_id, None)
             await ctx.send("Channel for announcement of level up was reset.")
         else:
             await ctx.send("Channel for announcement of level up wasn't set up.")
@@ -224,16 +161,7 @@ class Leveling(commands.Cog):
         current_state = await is_leveling_enabled(guild_id)
         new_state = not current_state
         
-        from database import db
-        cursor = db.connection.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO leveling_enabled (guild_id, enabled) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE enabled = VALUES(enabled)
-            """, (guild_id, new_state))
-        finally:
-            cursor.close()
+        await db_helpers.update_leveling_settings(guild_id, new_state)
         
         state_message = "on" if new_state else "off"
         await ctx.send(f"Level system is now {state_message}.")
@@ -245,17 +173,7 @@ class Leveling(commands.Cog):
         current_pref = await get_mention_preference(user_id)
         new_pref = not current_pref
         
-        from database import db
-        cursor = db.connection.cursor()
-        try:
-            import json
-            cursor.execute("""
-                INSERT INTO mention_prefs (user_id, preferences) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE preferences = VALUES(preferences)
-            """, (user_id, json.dumps({"mention_on_levelup": new_pref})))
-        finally:
-            cursor.close()
+        await db_helpers.set_user_preference(user_id, "mention_on_levelup", new_pref)
         
         state_message = "on" if new_pref else "off"
         await ctx.send(f"Mention at level up is now {state_message}.")
@@ -264,6 +182,7 @@ class Leveling(commands.Cog):
     async def leaderboard(self, ctx):
         guild_id = ctx.guild.id
 
+        await xp_accumulator.flush()
         leaderboard_data = await db_helpers.get_guild_leaderboard(guild_id, 10)
         
         if not leaderboard_data:
@@ -287,19 +206,14 @@ class Leveling(commands.Cog):
         guild_id = ctx.guild.id
         user_id = member.id
 
-        from database import db
-        cursor = db.connection.cursor()
-        try:
-            cursor.execute("SELECT level, total_xp, messages FROM leveling WHERE guild_id = %s AND user_id = %s", (guild_id, user_id))
-            result = cursor.fetchone()
-            
-            if result:
-                level, total_xp, messages = result
-                await ctx.send(f"{member.mention} has level {level}, {total_xp} total XP and sent {messages} messages.")
-            else:
-                await ctx.send(f"{member.mention} doesn't have any level and XP.")
-        finally:
-            cursor.close()
+        await xp_accumulator.flush()
+        result = await db_helpers.get_user_level_data(user_id, guild_id)
+        
+        if result:
+            level, total_xp, messages = result
+            await ctx.send(f"{member.mention} has level {level}, {total_xp} total XP and sent {messages} messages.")
+        else:
+            await ctx.send(f"{member.mention} doesn't have any level and XP.")
 
 async def setup(bot):
     await bot.add_cog(Leveling(bot))
@@ -1,6 +1,7 @@
 import discord
 import json
 import os
+import asyncio
 from discord.ext import commands
 from discord.ext.commands import MissingPermissions
 from datetime import datetime
@@ -10,14 +11,14 @@ from db_helpers import db_helpers
 SETTINGS_FILE = "server_settings.json"
 LOGS_DIRECTORY = "logs"  # Main logs directory
 
-# Create logs directory if it doesn't exist
-if not os.path.exists(LOGS_DIRECTORY):
-    os.makedirs(LOGS_DIRECTORY)
-
 class Logger(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        # Create logs directory if it doesn't exist, off the event loop while the other cogs load
+        await asyncio.to_thread(os.makedirs, LOGS_DIRECTORY, exist_ok=True)
+
     async def get_log_channel(self, guild_id):
         """Get log channel ID from database"""
         return await db_helpers.get_server_setting(str(guild_id), "log_channel")
@@ -1,19 +1,21 @@
 import discord
 from discord.ext import commands, tasks
 import json
+import asyncio
 import os
 from datetime import datetime, timedelta
 from discord import ButtonStyle
 from discord.ui import View, Button
 from db_helpers import db_helpers
 
-# Load settings data
+# Settings data, read when the cog loads
 SETTINGS_FILE = "mental_health_config.json"
 settings_data = {}
 
-if os.path.exists(SETTINGS_FILE):
-    with open(SETTINGS_FILE, "r") as f:
-        settings_data = json.load(f)
+def load_settings():
+    if os.path.exists(SETTINGS_FILE):
+        with open(SETTINGS_FILE, "r") as f:
+            settings_data.update(json.load(f))
 
 # Helper function for mental health settings
 def get_mental_health_settings():
@@ -81,28 +83,8 @@ class MoodResponseView(discord.ui.View):
             # Update user mood in database
             await db_helpers.update_user_mood(user_id, mood)
             
-            # Update server mood in database (we'll store this separately)
-            from database import db
-            cursor = db.connection.cursor()
-            try:
-                cursor.execute("SELECT mood_data FROM server_moods WHERE guild_id = %s", (guild_id,))
-                result = cursor.fetchone()
-                
-                if result:
-                    mood_data = json.loads(result[0]) if result[0] else {m: 0 for m in valid_moods}
-                else:
-                    mood_data = {m: 0 for m in valid_moods}
-                
-                mood_data[mood] = mood_data.get(mood, 0) + 1
-                
-                cursor.execute("""
-                    INSERT INTO server_moods (guild_id, mood_data) 
-                    VALUES (%s, %s)
-                    ON DUPLICATE KEY UPDATE mood_data = VALUES(mood_data)
-                """, (guild_id, json.dumps(mood_data)))
-                
-            finally:
-                cursor.close()
+            # Update server mood in database
+            await db_helpers.increment_guild_mood(guild_id, mood, default_moods=valid_moods)
         else:
             await interaction.followup.send("Please reply with a brief description of your mood.", ephemeral=True)
             
@@ -123,30 +105,7 @@ class MoodResponseView(discord.ui.View):
                 await db_helpers.update_user_mood(user_id, "others", mood_description)
                 
                 # Update server mood data
-                from database import db
-                cursor = db.connection.cursor()
-                try:
-                    cursor.execute("SELECT mood_data FROM server_moods WHERE guild_id = %s", (guild_id,))
-                    result = cursor.fetchone()
-                    
-                    if result:
-                        mood_data = json.loads(result[0]) if result[0] else {}
-                    else:
-                        mood_data = {}
-                    
-                    if "others" not in mood_data:
-                        mood_data["others"] = {}
-                    
-                    mood_data["others"][mood_description] = mood_data["others"].get(mood_description, 0) + 1
-                    
-                    cursor.execute("""
-                        INSERT INTO server_moods (guild_id, mood_data) 
-                        VALUES (%s, %s)
-                        ON DUPLICATE KEY UPDATE mood_data = VALUES(mood_data)
-                    """, (guild_id, json.dumps(mood_data)))
-                    
-                finally:
-                    cursor.close()
+                await db_helpers.increment_guild_mood(guild_id, "others", custom_mood=mood_description)
                 
                 await dm_channel.send("Thank you for your response. Your mood has been recorded.")
                 
@@ -166,7 +125,11 @@ class MoodResponseView(discord.ui.View):
 class MentalHealthCheck(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        
+
+    async def cog_load(self):
+        # Read the settings file off the event loop so the other cogs keep loading
+        await asyncio.to_thread(load_settings)
+
         # Get settings from centralized file
         mental_health_settings = get_mental_health_settings()
         self.check_enabled = mental_health_settings.get("check_enabled", False)
@@ -301,20 +264,10 @@ class MentalHealthCheck(commands.Cog):
         guild_id = str(ctx.guild.id)
         
         # Get server mood data from database
-        from database import db
-        cursor = db.connection.cursor()
-        try:
-            cursor.execute("SELECT mood_data FROM server_moods WHERE guild_id = %s", (guild_id,))
-            result = cursor.fetchone()
-            
-            if not result or not result[0]:
-                await ctx.send("No data available for this server.")
-                return
-            
-            guild_stats = json.loads(result[0])
-            
-        finally:
-            cursor.close()
+        guild_stats = await db_helpers.get_guild_mood_data(guild_id)
+        if not guild_stats:
+            await ctx.send("No data available for this server.")
+            return
         
         response = f"Mental Health Check Stats:\n"
         for mood, count in guild_stats.items():
@@ -408,27 +361,7 @@ class MentalHealthCheck(commands.Cog):
             await db_helpers.update_user_mood(user_id, mood)
             
             # Update server mood in database
-            from database import db
-            cursor = db.connection.cursor()
-            try:
-                cursor.execute("SELECT mood_data FROM server_moods WHERE guild_id = %s", (guild_id,))
-                result = cursor.fetchone()
-                
-                if result:
-                    mood_data = json.loads(result[0]) if result[0] else {m: 0 for m in valid_moods}
-                else:
-                    mood_data = {m: 0 for m in valid_moods}
-                
-                mood_data[mood] = mood_data.get(mood, 0) + 1
-                
-                cursor.execute("""
-                    INSERT INTO server_moods (guild_id, mood_data) 
-                    VALUES (%s, %s)
-                    ON DUPLICATE KEY UPDATE mood_data = VALUES(mood_data)
-                """, (guild_id, json.dumps(mood_data)))
-                
-            finally:
-                cursor.close()
+            await db_helpers.increment_guild_mood(guild_id, mood, default_moods=valid_moods)
         else:
             await self.handle_others(ctx, guild_id, user_id)
 
@@ -450,30 +383,7 @@ class MentalHealthCheck(commands.Cog):
             await db_helpers.update_user_mood(user_id, "others", mood_description)
             
             # Update server mood data
-            from database import db
-            cursor = db.connection.cursor()
-            try:
-                cursor.execute("SELECT mood_data FROM server_moods WHERE guild_id = %s", (guild_id,))
-                result = cursor.fetchone()
-                
-                if result:
-                    mood_data = json.loads(result[0]) if result[0] else {}
-                else:
-                    mood_data = {}
-                
-                if "others" not in mood_data:
-                    mood_data["others"] = {}
-                
-                mood_data["others"][mood_description] = mood_data["others"].get(mood_description, 0) + 1
-                
-                cursor.execute("""
-                    INSERT INTO server_moods (guild_id, mood_data) 
-                    VALUES (%s, %s)
-                    ON DUPLICATE KEY UPDATE mood_data = VALUES(mood_data)
-                """, (guild_id, json.dumps(mood_data)))
-                
-            finally:
-                cursor.close()
+            await db_helpers.increment_guild_mood(guild_id, "others", custom_mood=mood_description)
 
         except:
             await ctx.send("No response received, mood not recorded.")
@@ -6,9 +6,61 @@ This cog is bulletproof and uses multiple redundancy layers to ensure NO message
 import discord
 from discord.ext import commands
 import asyncio
+import os
+import glob
 import json
-from typing import Optional, List
-from db_helpers import DatabaseHelpers
+import time
+from collections import deque
+from typing import Optional, List, Dict, Tuple
+from config import config
+from db_helpers import DatabaseHelpers, fallback_log_writer
+from metrics import percentile
+
+# Queue tuning (config.json "message_logger" section)
+QUEUE_SIZE = config.get("message_logger.queue_size", 10000)
+BATCH_SIZE = config.get("message_logger.batch_size", 50)
+LINGER_SECONDS = config.get("message_logger.linger_seconds", 0.5)
+LATENCY_SAMPLES = 1000
+RECOVERY_BATCH_SIZE = config.get("message_logger.recovery_batch_size", 1000)
+RECOVERY_CHECKPOINT = "fallback_logs/recovery_checkpoint.json"
+MESSAGE_FIELDS = ('user_id', 'message_id', 'server_id', 'channel_id', 'parent_channel_id',
+                  'username', 'message_text', 'attachments')
+
+def read_fallback_chunk(path: str, offset: int, max_messages: int) -> Tuple[List[dict], int]:
+    """
+    Read up to max_messages from a JSONL fallback file starting at byte offset.
+    Returns the messages and the offset just past the last line read.
+    """
+    messages = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while len(messages) < max_messages:
+            line = f.readline()
+            if not line:
+                break
+            offset = f.tell()
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                messages.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A crash mid-append can leave a truncated last line
+                print(f"Skipping malformed line ending at byte {offset} in {path}")
+    return messages, offset
+
+def load_recovery_checkpoint() -> Dict[str, int]:
+    try:
+        with open(RECOVERY_CHECKPOINT, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_recovery_checkpoint(checkpoint: Dict[str, int]):
+    # Write then rename so an interruption never leaves a half-written checkpoint
+    with open(f"{RECOVERY_CHECKPOINT}.tmp", 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(f"{RECOVERY_CHECKPOINT}.tmp", RECOVERY_CHECKPOINT)
 
 class MessageLogger(commands.Cog):
     """
@@ -18,7 +70,7 @@ class MessageLogger(commands.Cog):
     - Triple redundancy system (Database -> Backup DB -> File fallback)
     - Logs all message data including attachments
     - Thread channel support
-    - Rate limiting protection
+    - Bounded queue with batched inserts, overflow spills to the fallback file
     - Automatic error recovery
     """
     
@@ -26,43 +78,87 @@ class MessageLogger(commands.Cog):
         self.bot = bot
         self.db_helpers = DatabaseHelpers()
         
-        # Rate limiting to prevent database overflow
-        self.message_queue = []
-        self.processing = False
+        # Bounded queue of (enqueued_at, message_data) drained by one consumer task
+        self.message_queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.consumer_task: Optional[asyncio.Task] = None
+        self.recovery_task: Optional[asyncio.Task] = None
         
         # Statistics
         self.messages_logged = 0
         self.failed_logs = 0
+        self.spilled_logs = 0  # queue full, written to the fallback file
+        self.dropped_logs = 0  # queue full and the fallback file failed too
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # enqueue -> commit seconds
         
         print("🔍 Message Logger initialized - Now monitoring ALL messages")
     
-    async def process_message_queue(self):
-        """Process queued messages in batches to prevent database overflow"""
-        if self.processing or not self.message_queue:
-            return
-            
-        self.processing = True
-        batch = self.message_queue[:50]  # Process 50 messages at a time
-        self.message_queue = self.message_queue[50:]
-        
-        for message_data in batch:
+    async def cog_load(self):
+        self.consumer_task = asyncio.create_task(self.consume_message_queue())
+    
+    async def cog_unload(self):
+        # An interrupted recovery resumes from its checkpoint next time
+        if self.recovery_task:
+            self.recovery_task.cancel()
+        # Stop the consumer, then write out whatever is still queued
+        if self.consumer_task:
+            self.consumer_task.cancel()
             try:
-                success = await self.db_helpers.log_message(**message_data)
-                if success:
-                    self.messages_logged += 1
-                else:
-                    self.failed_logs += 1
-            except Exception as e:
-                print(f"Error processing message from queue: {e}")
-                self.failed_logs += 1
-        
-        self.processing = False
+                await self.consumer_task
+            except asyncio.CancelledError:
+                pass
+        while not self.message_queue.empty():
+            batch = [self.message_queue.get_nowait()
+                     for _ in range(min(BATCH_SIZE, self.message_queue.qsize()))]
+            await self.write_batch(batch)
+        await fallback_log_writer.flush()
+    
+    def enqueue_message(self, message_data: dict):
+        """Queue a message for logging, spill it to the fallback file if the queue is full"""
+        try:
+            self.message_queue.put_nowait((time.monotonic(), message_data))
+        except asyncio.QueueFull:
+            if self.db_helpers.log_message_to_file(**message_data):
+                self.spilled_logs += 1
+            else:
+                self.dropped_logs += 1
+    
+    async def consume_message_queue(self):
+        """Long-lived consumer: collect up to BATCH_SIZE messages, waiting at most LINGER_SECONDS"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.message_queue.get()]
+            deadline = loop.time() + LINGER_SECONDS
+            try:
+                while len(batch) < BATCH_SIZE:
+                    if not self.message_queue.empty():
+                        batch.append(self.message_queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.message_queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            finally:
+                # Shielded so unloading the cog never loses a batch already taken off the queue
+                await asyncio.shield(self.write_batch(batch))
+    
+    async def write_batch(self, batch: List[tuple]):
+        """Write a batch of queued messages and record their enqueue -> commit latency"""
+        # One multi-row insert per batch, failed rows are retried one by one
+        try:
+            logged = await self.db_helpers.log_messages([message_data for _, message_data in batch])
+        except Exception as e:
+            print(f"Error processing message batch from queue: {e}")
+            logged = 0
+        self.messages_logged += logged
+        self.failed_logs += len(batch) - logged
         
-        # Continue processing if there are more messages
-        if self.message_queue:
-            # Small delay to prevent overwhelming the database
-            await asyncio.sleep(0.1)
-            asyncio.create_task(self.process_message_queue())
+        committed_at = time.monotonic()
+        self.latencies.extend(committed_at - enqueued_at for enqueued_at, _ in batch)
+        for _ in batch:
+            self.message_queue.task_done()
     
     def extract_attachments(self, message: discord.Message) -> List[dict]:
         """Extract attachment information from message"""
@@ -154,11 +250,7 @@ class MessageLogger(commands.Cog):
             }
             
             # Add to queue for batch processing
-            self.message_queue.append(message_data)
-            
-            # Start processing if not already running
-            if not self.processing:
-                asyncio.create_task(self.process_message_queue())
+            self.enqueue_message(message_data)
             
         except Exception as e:
             # Even if logging fails, we try to log the failure itself
@@ -229,10 +321,7 @@ class MessageLogger(commands.Cog):
             }
             
             # Add to queue
-            self.message_queue.append(message_data)
-            
-            if not self.processing:
-                asyncio.create_task(self.process_message_queue())
+            self.enqueue_message(message_data)
                 
         except Exception as e:
             print(f"Failed to log message edit: {e}")
@@ -264,14 +353,30 @@ class MessageLogger(commands.Cog):
         )
         
         embed.add_field(
-            name="📋 Queue Size",
-            value=f"`{len(self.message_queue):,}`",
+            name="📋 Queue Depth",
+            value=f"`{self.message_queue.qsize():,}/{QUEUE_SIZE:,}`",
+            inline=True
+        )
+        
+        consumer_running = self.consumer_task is not None and not self.consumer_task.done()
+        embed.add_field(
+            name="🔄 Consumer",
+            value="✅ Running" if consumer_running else "⏸️ Stopped",
+            inline=True
+        )
+        
+        embed.add_field(
+            name="📁 Spilled / 🗑️ Dropped",
+            value=f"`{self.spilled_logs:,}` / `{self.dropped_logs:,}`",
             inline=True
         )
         
+        samples = sorted(self.latencies)
         embed.add_field(
-            name="🔄 Processing",
-            value="✅ Active" if self.processing else "⏸️ Idle",
+            name="⏱️ Enqueue → Commit",
+            value=f"p50 `{percentile(samples, 50) * 1000:.0f} ms` · "
+                  f"p95 `{percentile(samples, 95) * 1000:.0f} ms` · "
+                  f"p99 `{percentile(samples, 99) * 1000:.0f} ms`",
             inline=True
         )
         
@@ -313,11 +418,27 @@ class MessageLogger(commands.Cog):
             await ctx.send("❌ This command is restricted to bot owners only.")
             return
         
+        if self.recovery_task and not self.recovery_task.done():
+            await ctx.send("⏳ A recovery is already running.")
+            return
+        
+        # Replay runs in the background so live message logging keeps going
+        self.recovery_task = asyncio.create_task(self.run_recovery(ctx))
+    
+    async def run_recovery(self, ctx: commands.Context):
+        """Stream fallback files into the database in large batches, checkpointing after each batch"""
         try:
-            import os
-            import glob
+            if not await self.db_helpers.ensure_connection():
+                await ctx.send("❌ Database is not available, recovery postponed.")
+                return
+            
+            # Everything still buffered for the fallback file goes to disk first
+            await fallback_log_writer.flush()
             
-            fallback_files = glob.glob("fallback_logs/messages_*.json")
+            # Files left by an interrupted recovery resume first
+            fallback_files = (sorted(glob.glob("fallback_logs/messages_*.recovering"))
+                              + sorted(glob.glob("fallback_logs/messages_*.json")
+                                       + glob.glob("fallback_logs/messages_*.jsonl")))
             
             if not fallback_files:
                 await ctx.send("✅ No fallback log files found - all messages were logged successfully!")
@@ -325,42 +446,62 @@ class MessageLogger(commands.Cog):
             
             processing_msg = await ctx.send("🔄 Processing fallback log files...")
             
+            loop = asyncio.get_running_loop()
+            checkpoint = load_recovery_checkpoint()
+            started_at = time.monotonic()
+            last_report = started_at
             total_recovered = 0
             total_failed = 0
             
             for fallback_file in fallback_files:
                 try:
-                    with open(fallback_file, 'r') as f:
-                        messages = json.load(f)
+                    if fallback_file.endswith(".json"):
+                        # Old JSON array file: convert it to JSONL once, then stream it like the others
+                        claimed = f"{fallback_file}.{time.time_ns()}.recovering"
+                        await loop.run_in_executor(None, self.convert_legacy_file, fallback_file, claimed)
+                        fallback_file = claimed
+                    elif fallback_file.endswith(".jsonl"):
+                        # Move the file aside so new fallback lines start a fresh file
+                        claimed = f"{fallback_file}.{time.time_ns()}.recovering"
+                        async with fallback_log_writer.lock:
+                            os.rename(fallback_file, claimed)
+                        fallback_file = claimed
                     
-                    for msg_data in messages:
-                        try:
-                            success = await self.db_helpers._log_message_to_db(
-                                user_id=msg_data.get('user_id'),
-                                message_id=msg_data.get('message_id'),
-                                server_id=msg_data.get('server_id'),
-                                channel_id=msg_data.get('channel_id'),
-                                parent_channel_id=msg_data.get('parent_channel_id'),
-                                username=msg_data.get('username'),
-                                message_text=msg_data.get('message_text'),
-                                attachments=msg_data.get('attachments')
-                            )
-                            
-                            if success:
-                                total_recovered += 1
-                            else:
-                                total_failed += 1
-                                
-                        except Exception as e:
-                            print(f"Failed to recover individual message: {e}")
-                            total_failed += 1
+                    offset = checkpoint.get(fallback_file, 0)
+                    while True:
+                        messages, next_offset = await loop.run_in_executor(
+                            None, read_fallback_chunk, fallback_file, offset, RECOVERY_BATCH_SIZE)
+                        if not messages and next_offset == offset:
+                            break
+                        
+                        if not await self.db_helpers.ensure_connection():
+                            raise ConnectionError("database connection lost, progress is checkpointed")
+                        recovered = await self.recover_batch(messages)
+                        total_recovered += recovered
+                        total_failed += len(messages) - recovered
+                        
+                        offset = next_offset
+                        checkpoint[fallback_file] = offset
+                        await loop.run_in_executor(None, save_recovery_checkpoint, dict(checkpoint))
+                        
+                        if time.monotonic() - last_report >= 5:
+                            last_report = time.monotonic()
+                            rate = total_recovered / max(last_report - started_at, 0.001)
+                            await processing_msg.edit(
+                                content=f"🔄 Recovering `{os.path.basename(fallback_file)}`: "
+                                        f"`{total_recovered:,}` messages so far ({rate:,.0f} msg/s)")
                     
                     # Archive the processed file
-                    os.rename(fallback_file, f"{fallback_file}.recovered")
+                    os.rename(fallback_file, fallback_file[:-len(".recovering")] + ".recovered")
+                    checkpoint.pop(fallback_file, None)
+                    await loop.run_in_executor(None, save_recovery_checkpoint, dict(checkpoint))
                     
+                except ConnectionError:
+                    raise
                 except Exception as e:
                     await ctx.send(f"❌ Error processing {fallback_file}: {e}")
             
+            elapsed = time.monotonic() - started_at
             embed = discord.Embed(
                 title="📁 Fallback Log Recovery Complete",
                 color=0x00d4aa
@@ -384,12 +525,48 @@ class MessageLogger(commands.Cog):
                 inline=True
             )
             
+            embed.add_field(
+                name="⚡ Throughput",
+                value=f"`{total_recovered / max(elapsed, 0.001):,.0f} msg/s` in `{elapsed:.1f}s`",
+                inline=True
+            )
+            
             embed.set_footer(text="Fallback files have been renamed to .recovered")
             
             await processing_msg.edit(content="", embed=embed)
             
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             await ctx.send(f"❌ Error during recovery process: {e}")
+    
+    async def recover_batch(self, messages: List[dict]) -> int:
+        """Insert recovered messages in one transaction, falling back to single inserts for a failed batch"""
+        rows = [{field: message.get(field) for field in MESSAGE_FIELDS} for message in messages]
+        try:
+            if await self.db_helpers._log_messages_to_db(rows):
+                return len(rows)
+        except Exception as e:
+            print(f"Recovery batch insert failed, retrying {len(rows)} messages individually: {e}")
+        
+        recovered = 0
+        for row in rows:
+            try:
+                if await self.db_helpers._log_message_to_db(**row):
+                    recovered += 1
+            except Exception as e:
+                print(f"Failed to recover individual message: {e}")
+        return recovered
+    
+    @staticmethod
+    def convert_legacy_file(path: str, target: str):
+        """Rewrite an old JSON array fallback file as JSON lines in target"""
+        with open(path, 'r') as f:
+            messages = json.load(f)
+        with open(target, 'w', encoding='utf-8') as f:
+            for message in messages:
+                f.write(json.dumps(message, ensure_ascii=False) + "\n")
+        os.rename(path, f"{path}.converted")
 
 async def setup(bot: commands.Bot):
     """Setup function for the cog"""
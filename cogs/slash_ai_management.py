@@ -276,7 +276,7 @@ class SlashAIManagement(commands.Cog):
         elif limit < 1:
             limit = 1
 
-        history_list = self.db_helpers.get_all_ai_chat_history(limit=limit)
+        history_list = await self.db_helpers.get_all_ai_chat_history(limit=limit)
         
         if not history_list:
             await interaction.response.send_message("❌ No AI chat history found in database.", ephemeral=True)
@@ -627,11 +627,11 @@ class SlashAIManagement(commands.Cog):
                 await interaction.response.send_message("❌ Chatbot not initialized.", ephemeral=True)
                 return
 
-            chatbot.clear_history()
+            getattr(self.bot, 'ai_router', chatbot).clear_history()
             
             embed = discord.Embed(
                 title="✅ AI History Reset",
-                description="Local conversation history has been cleared.",
+                description="Local conversation memory of every channel and DM has been cleared.",
                 color=0x00ff00
             )
             embed.add_field(
@@ -645,6 +645,32 @@ class SlashAIManagement(commands.Cog):
         except Exception as e:
             await interaction.response.send_message(f"❌ Error resetting AI history: {e}", ephemeral=True)
 
+    @ai.command(name="cache", description="Allow or disable cached AI responses in this server")
+    @app_commands.describe(enabled="Whether identical prompts may be answered from the response cache")
+    async def ai_cache(self, interaction: discord.Interaction, enabled: bool):
+        if not interaction.guild:
+            await interaction.response.send_message("❌ This command can only be used in a server.", ephemeral=True)
+            return
+        if not (self.is_owner_or_co_owner(interaction.user.id) or interaction.user.guild_permissions.administrator):
+            await interaction.response.send_message("❌ This command is restricted to bot owners and server administrators.", ephemeral=True)
+            return
+
+        try:
+            await self.db_helpers.update_server_setting(interaction.guild.id, 'ai_cache', enabled)
+            
+            embed = discord.Embed(
+                title="✅ AI Response Cache Updated",
+                description=("Identical prompts in this server may be answered from the response cache."
+                             if enabled else
+                             "Every prompt in this server is now sent to the AI, cached answers are never used."),
+                color=0x00ff00
+            )
+            
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+                    
+        except Exception as e:
+            await interaction.response.send_message(f"❌ Error updating AI cache setting: {e}", ephemeral=True)
+
     @ai.command(name="status", description="View AI system status and information")
     async def ai_status(self, interaction: discord.Interaction):
         if not self.is_owner_or_co_owner(interaction.user.id):
@@ -652,24 +678,16 @@ class SlashAIManagement(commands.Cog):
             return
 
         try:
-            # Import here to avoid circular imports
-            from chatbot_ai import ChatbotAPI
-            import aiohttp
-            
             # Get the chatbot instance from the main bot
             chatbot = getattr(self.bot, 'chatbot_api', None)
             if not chatbot:
-                # Create a temporary instance
-                chatbot = ChatbotAPI()
+                await interaction.response.send_message("❌ Chatbot not initialized.", ephemeral=True)
+                return
 
-            # Test API connectivity
+            # Test API connectivity over the shared session
             try:
-                async with aiohttp.ClientSession() as session:
-                    test_payload = {"prompt": "Hello", "model": "gemini-2.5-flash"}
-                    test_headers = {"Content-Type": "application/json", "Authorization": f"sideteu {chatbot.token}"}
-                    
-                    async with session.post(chatbot.api_url, json=test_payload, headers=test_headers, timeout=5) as response:
-                        api_status = "🟢 Online" if response.status == 200 else f"🔴 Error (HTTP {response.status})"
+                status = await chatbot.ping(timeout=5)
+                api_status = "🟢 Online" if status == 200 else f"🔴 Error (HTTP {status})"
             except Exception as e:
                 api_status = f"🔴 Offline ({str(e)[:50]}...)"
 
@@ -703,12 +721,99 @@ class SlashAIManagement(commands.Cog):
                 inline=False
             )
             
+            memory_stats = chatbot.memory.get_stats()
             embed.add_field(
-                name="Local History",
-                value=f"{len(chatbot.history)} conversations cached",
+                name="Conversation Memory",
+                value=f"{memory_stats['conversations']}/{memory_stats['max_conversations']} conversations, "
+                      f"{memory_stats['turns']} turns (~{memory_stats['tokens']} tokens)\n"
+                      f"Evicted: {memory_stats['evicted']}, expired: {memory_stats['expired']}",
                 inline=True
             )
             
+            connection_stats = chatbot.get_connection_stats()
+            embed.add_field(
+                name="HTTP Connections",
+                value=f"{connection_stats['requests']} requests, "
+                      f"{connection_stats['connections_created']} opened, "
+                      f"{connection_stats['connections_reused']} reused "
+                      f"({connection_stats['reuse_ratio']:.0%})",
+                inline=True
+            )
+            
+            breaker_stats = chatbot.circuit_breaker.get_stats()
+            breaker_state = {
+                "closed": "🟢 Closed",
+                "half_open": "🟡 Half-open (probing)",
+                "open": f"🔴 Open (retry in {breaker_stats['retry_in']:.0f}s)"
+            }[breaker_stats['state']]
+            embed.add_field(
+                name="Circuit Breaker",
+                value=f"{breaker_state}\n"
+                      f"{breaker_stats['consecutive_failures']}/{breaker_stats['failure_threshold']} failures, "
+                      f"opened {breaker_stats['times_opened']}x, {breaker_stats['rejected']} rejected",
+                inline=True
+            )
+            
+            if chatbot.cache is not None:
+                cache_stats = chatbot.cache.get_stats()
+                cache_value = (f"{cache_stats['entries']}/{cache_stats['max_size']} entries, "
+                               f"TTL {cache_stats['ttl']:.0f}s\n"
+                               f"{cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                               f"({cache_stats['hit_ratio']:.0%} hit ratio)")
+            else:
+                cache_value = "Disabled"
+            cache_value += f"\n{chatbot.coalesced} requests joined an identical one in flight"
+            embed.add_field(
+                name="Response Cache",
+                value=cache_value,
+                inline=True
+            )
+            
+            scheduler = getattr(self.bot, 'ai_scheduler', None)
+            if scheduler:
+                scheduler_stats = scheduler.get_stats()
+                embed.add_field(
+                    name="Request Queue",
+                    value=f"{scheduler_stats['active']}/{scheduler_stats['max_concurrent']} running, "
+                          f"{scheduler_stats['queue_depth']} waiting\n"
+                          f"Wait p50 {scheduler_stats['wait_p50']:.2f}s · p95 {scheduler_stats['wait_p95']:.2f}s · "
+                          f"max {scheduler_stats['wait_max']:.2f}s\n"
+                          f"{scheduler_stats['timeouts']} of {scheduler_stats['requests']} requests timed out in queue",
+                    inline=False
+                )
+            
+            router = getattr(self.bot, 'ai_router', None)
+            if router:
+                router_stats = router.get_stats()
+                provider_lines = []
+                for name, stats in router_stats['providers'].items():
+                    p50 = f"{stats['latency_p50']:.2f}s" if stats['latency_p50'] is not None else "n/a"
+                    p95 = f"{stats['latency_p95']:.2f}s" if stats['latency_p95'] is not None else "n/a"
+                    provider_lines.append(
+                        f"{'🟢' if stats['healthy'] else '🔴'} **{name}**: p50 {p50} · p95 {p95} · "
+                        f"errors {stats['error_rate']:.0%} · won {stats['wins']}/{stats['requests']}"
+                    )
+                provider_lines.append(
+                    f"Hedged {router_stats['hedged']}, failed over {router_stats['failovers']} "
+                    f"(SLO {router_stats['latency_slo']:.1f}s)"
+                )
+                embed.add_field(
+                    name="Providers",
+                    value="\n".join(provider_lines),
+                    inline=False
+                )
+            
+            log_writer = getattr(self.bot, 'ai_log_writer', None)
+            if log_writer:
+                log_stats = log_writer.get_stats()
+                embed.add_field(
+                    name="Interaction Log",
+                    value=f"{'🔴 Disk writes failing' if log_stats['failing'] else '🟢 Writing'}\n"
+                          f"{log_stats['lines_written']} written, {log_stats['buffered']} buffered, "
+                          f"{log_stats['dropped']} dropped",
+                    inline=True
+                )
+            
             embed.add_field(
                 name="API Endpoint",
                 value=chatbot.api_url,
@@ -4,25 +4,25 @@ from discord.ext import commands
 import random
 import json
 import os
-from db_helpers import DatabaseHelpers
+from db_helpers import DatabaseHelpers, xp_accumulator
 
 # Now using database instead of JSON files
 
 # Helper functions now use database
 db_helper = DatabaseHelpers()
 
-def is_leveling_enabled(guild_id):
-    return db_helper.get_leveling_settings(guild_id).get('enabled', True)
+async def is_leveling_enabled(guild_id):
+    return (await db_helper.get_leveling_config(guild_id))['enabled']
 
-def is_channel_ignored(guild_id, channel_id):
-    ignored_channels = db_helper.get_ignored_channels(guild_id)
-    return str(channel_id) in ignored_channels
+async def is_channel_ignored(guild_id, channel_id):
+    ignored_channels = (await db_helper.get_leveling_config(guild_id))['ignored_channels']
+    return int(channel_id) in ignored_channels
 
-def get_level_up_channel(guild_id):
-    return db_helper.get_level_up_channel(guild_id)
+async def get_level_up_channel(guild_id):
+    return (await db_helper.get_leveling_config(guild_id))['level_up_channel']
 
-def get_mention_preference(user_id):
-    return db_helper.get_user_preference(user_id, 'mention_on_levelup', True)
+async def get_mention_preference(user_id):
+    return await db_helper.get_mention_preference(user_id)
 
 class LevelingSlash(commands.Cog):
     def __init__(self, bot):
@@ -35,7 +35,7 @@ class LevelingSlash(commands.Cog):
         guild_id = interaction.guild.id
         channel_id = channel.id
         
-        if self.db_helpers.add_ignored_channel(guild_id, channel_id):
+        if await self.db_helpers.add_ignored_channel(guild_id, channel_id):
             await interaction.response.send_message(f"Channel {channel.mention} was added to the ignored list.")
         else:
             await interaction.response.send_message("This channel is already ignored.")
@@ -46,7 +46,7 @@ class LevelingSlash(commands.Cog):
         guild_id = interaction.guild.id
         channel_id = channel.id
         
-        if self.db_helpers.remove_ignored_channel(guild_id, channel_id):
+        if await self.db_helpers.remove_ignored_channel(guild_id, channel_id):
             await interaction.response.send_message(f"Channel {channel.mention} was removed from the ignored list.")
         else:
             await interaction.response.send_message("This channel is not in the ignored list.")
@@ -56,7 +56,7 @@ class LevelingSlash(commands.Cog):
     async def set_level_up_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
         guild_id = interaction.guild.id
         
-        self.db_helpers.set_level_up_channel(guild_id, channel.id)
+        await self.db_helpers.set_level_up_channel(guild_id, channel.id)
         await interaction.response.send_message(f"Channel {channel.mention} was set for level up announcements.")
 
     @app_commands.command(name="reset_level_up_channel", description="Resets the level up announcement channel.")
@@ -64,8 +64,8 @@ class LevelingSlash(commands.Cog):
     async def reset_level_up_channel(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
         
-        if self.db_helpers.get_level_up_channel(guild_id):
-            self.db_helpers.set_level_up_channel(guild_id, None)
+        if await get_level_up_channel(guild_id):
+            await self.db_helpers.set_level_up_channel(guild_id, None)
             await interaction.response.send_message("Level up announcement channel was reset.")
         else:
             await interaction.response.send_message("No level up announcement channel was set.")
@@ -75,9 +75,9 @@ class LevelingSlash(commands.Cog):
     async def toggle_leveling(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
         
-        current_state = self.db_helpers.get_leveling_settings(guild_id).get('enabled', True)
+        current_state = await is_leveling_enabled(guild_id)
         new_state = not current_state
-        self.db_helpers.update_leveling_settings(guild_id, enabled=new_state)
+        await self.db_helpers.update_leveling_settings(guild_id, enabled=new_state)
 
         state_message = "ON" if new_state else "OFF"
         await interaction.response.send_message(f"Leveling system: {state_message}.")
@@ -86,10 +86,13 @@ class LevelingSlash(commands.Cog):
     async def leaderboard(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
 
-        leaderboard_data = self.db_helpers.get_leaderboard(guild_id, limit=10)
+        # Flushing buffered XP can outlast Discord's 3 second deadline for a response
+        await interaction.response.defer()
+        await xp_accumulator.flush()
+        leaderboard_data = await self.db_helpers.get_leaderboard(guild_id, limit=10)
         
         if not leaderboard_data:
-            await interaction.response.send_message("No users in the leaderboard yet.")
+            await interaction.followup.send("No users in the leaderboard yet.")
             return
 
         leaderboard_text = ""
@@ -101,7 +104,7 @@ class LevelingSlash(commands.Cog):
                 leaderboard_text += f"{i}. Unknown User: Level {level} ({total_xp} XP, {messages} messages)\n"
 
         embed = discord.Embed(title="Top 10 users", description=leaderboard_text, color=discord.Color.blue())
-        await interaction.response.send_message(embed=embed)
+        await interaction.followup.send(embed=embed)
 
     @app_commands.command(name="level", description="Displays your (or someone else's) level and XP.")
     async def level(self, interaction: discord.Interaction, member: discord.Member = None):
@@ -109,21 +112,23 @@ class LevelingSlash(commands.Cog):
         guild_id = interaction.guild.id
         user_id = member.id
 
-        user_data = self.db_helpers.get_user_level_data(user_id, guild_id)
+        await interaction.response.defer()
+        await xp_accumulator.flush()
+        user_data = await self.db_helpers.get_user_level_data(user_id, guild_id)
         
         if user_data:
             level, total_xp, messages = user_data
-            await interaction.response.send_message(f"{member.mention} has level {level}, {total_xp} XP and sent {messages} messages.")
+            await interaction.followup.send(f"{member.mention} has level {level}, {total_xp} XP and sent {messages} messages.")
         else:
-            await interaction.response.send_message(f"{member.mention} has no level data yet.")
+            await interaction.followup.send(f"{member.mention} has no level data yet.")
 
     @app_commands.command(name="toggle_mention", description="Toggles mention on level up.")
     async def toggle_mention(self, interaction: discord.Interaction):
         user_id = interaction.user.id
         
-        current_pref = self.db_helpers.get_user_preference(user_id, 'mention_on_levelup', True)
+        current_pref = await get_mention_preference(user_id)
         new_pref = not current_pref
-        self.db_helpers.set_user_preference(user_id, 'mention_on_levelup', new_pref)
+        await self.db_helpers.set_user_preference(user_id, 'mention_on_levelup', new_pref)
         
         state_message = "ON" if new_pref else "OFF"
         await interaction.response.send_message(f"Mention toggle is now: {state_message}.")
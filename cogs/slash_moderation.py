@@ -80,7 +80,7 @@ class SlashModeration(commands.Cog):
     async def setprefix(self, interaction: discord.Interaction, prefix: str):
         guild_id = interaction.guild.id
         
-        self.db_helpers.update_server_setting(guild_id, 'prefix', prefix)
+        await self.db_helpers.update_server_setting(guild_id, 'prefix', prefix)
 
         await interaction.response.send_message(f"Prefix set to: {prefix}")
 
@@ -0,0 +1,96 @@
+"""
+Slash command sync that skips Discord when nothing changed
+The payload of every command scope (global and each guild) is hashed and the
+hashes of the last successful sync are kept in a local file. A scope is only
+synced again when its hash differs, so restarts and reconnects cost no
+rate-limited sync calls unless the commands really changed.
+"""
+
+import os
+import json
+import hashlib
+import discord
+from discord import app_commands
+from typing import Dict, Any, Iterable, Optional
+
+FINGERPRINT_FILE = "command_sync.json"
+
+async def tree_fingerprint(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """Hash of exactly what tree.sync(guild=guild) would upload"""
+    commands = tree.get_commands(guild=guild)
+    if tree.translator:
+        payload = [await command.get_translated_payload(tree, tree.translator) for command in commands]
+    else:
+        payload = [command.to_dict(tree) for command in commands]
+    payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+    return _digest(payload)
+
+def _digest(payload: list) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+class CommandSyncer:
+    """Syncs the scopes of a command tree whose fingerprint differs from the last successful sync"""
+
+    def __init__(self, bot: discord.Client, path: str = FINGERPRINT_FILE):
+        self.bot = bot
+        self.path = path
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable {self.path}: {e}")
+            return {}
+
+    def save(self, state: Dict[str, Any]):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=4)
+        os.replace(temp_path, self.path)
+
+    async def sync(self, guild_ids: Iterable[int] = (), force: bool = False) -> Dict[str, int]:
+        """
+        Sync the global commands and the commands of the given (and previously synced)
+        guilds where they changed. force syncs every scope regardless.
+        Returns how many scopes were synced and skipped.
+        """
+        state = self.load()
+        # Fingerprints belong to one application, a different bot token starts over
+        if state.get("application_id") != self.bot.application_id:
+            state = {"application_id": self.bot.application_id, "global": None, "guilds": {}}
+        guild_state: Dict[str, str] = state.setdefault("guilds", {})
+        empty = _digest([])
+
+        synced = skipped = 0
+        scopes = [None] + sorted(set(guild_ids) | {int(guild_id) for guild_id in guild_state})
+        for guild_id in scopes:
+            guild = discord.Object(id=guild_id) if guild_id is not None else None
+            fingerprint = await tree_fingerprint(self.bot.tree, guild)
+            if guild_id is None:
+                previous = state.get("global")
+            else:
+                # A guild never synced has no guild commands on Discord's side
+                previous = guild_state.get(str(guild_id), empty)
+            if not force and fingerprint == previous:
+                skipped += 1
+                continue
+
+            commands = await self.bot.tree.sync(guild=guild)
+            synced += 1
+            if guild_id is None:
+                state["global"] = fingerprint
+                print(f"Synced {len(commands)} commands globally!")
+            else:
+                if fingerprint == empty:
+                    guild_state.pop(str(guild_id), None)
+                else:
+                    guild_state[str(guild_id)] = fingerprint
+                print(f"Synced {len(commands)} commands to guild {guild_id}")
+            self.save(state)
+
+        if not synced:
+            print(f"Slash commands unchanged, skipped syncing {skipped} scope(s)")
+        return {"synced": synced, "skipped": skipped}
@@ -17,14 +17,160 @@ except ImportError:
         pass
 
 import json
+import time
 import asyncio
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional, Callable, Sequence, Tuple
 import logging
 from config import config
 
+# Minimum total XP for each level (level = sqrt(total_xp / 100) + 1), precomputed so
+# both the bot and the server-side XP upsert look levels up instead of recomputing them
+MAX_LEVEL = 1000
+LEVEL_THRESHOLDS = [(level - 1) * (level - 1) * 100 for level in range(1, MAX_LEVEL + 1)]
+
+class PoolTimeoutError(Error):
+    """Raised when no pooled connection becomes free within the acquire timeout"""
+    pass
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections.
+    mysql.connector is blocking, so every call on a pooled connection runs in a
+    dedicated thread executor sized to the pool and never on the event loop.
+    """
+    
+    def __init__(self, connect_kwargs: Dict[str, Any], size: int = 5,
+                 acquire_timeout: float = 10.0, health_check_interval: float = 30.0):
+        self.connect_kwargs = connect_kwargs
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="db-pool")
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: List[Tuple[Any, float]] = []  # (connection, last released at)
+        self.closed = False
+        
+        # Statistics
+        self.in_use = 0
+        self.opened = 0
+        self.discarded = 0
+        self.timeouts = 0
+    
+    async def run_sync(self, func: Callable, *args):
+        """Run a blocking function in the pool's executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+    
+    def _open_connection(self):
+        return mysql.connector.connect(**self.connect_kwargs)
+    
+    @staticmethod
+    def _is_healthy(connection) -> bool:
+        try:
+            connection.ping(reconnect=True, attempts=1, delay=0)
+            return True
+        except Exception:
+            return False
+    
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+    
+    async def acquire(self):
+        """Take a healthy connection from the pool, waiting at most acquire_timeout seconds"""
+        if self.closed:
+            raise Error("Connection pool is closed")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolTimeoutError(f"No database connection available within {self.acquire_timeout}s")
+        
+        try:
+            while self._idle:
+                connection, released_at = self._idle.pop()
+                # Connections used recently are trusted, older ones are pinged first
+                if time.monotonic() - released_at < self.health_check_interval:
+                    break
+                if await self.run_sync(self._is_healthy, connection):
+                    break
+                await self.run_sync(self._close_quietly, connection)
+                self.discarded += 1
+            else:
+                connection = await self.run_sync(self._open_connection)
+                self.opened += 1
+        except BaseException:
+            self._semaphore.release()
+            raise
+        
+        self.in_use += 1
+        return connection
+    
+    async def release(self, connection, discard: bool = False):
+        """Return a connection to the pool, closing it instead if it is broken"""
+        self.in_use -= 1
+        try:
+            if discard or self.closed:
+                await self.run_sync(self._close_quietly, connection)
+                self.discarded += 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+        finally:
+            self._semaphore.release()
+    
+    @asynccontextmanager
+    async def connection(self):
+        """Context manager that acquires a connection and always releases it"""
+        connection = await self.acquire()
+        discard = False
+        try:
+            yield connection
+        except asyncio.CancelledError:
+            # The executor thread may still be using the connection
+            discard = True
+            raise
+        except Exception:
+            # A failed query can leave the socket dead - don't hand it out again
+            discard = not await self.run_sync(self._is_healthy, connection)
+            raise
+        finally:
+            await self.release(connection, discard)
+    
+    async def discard_idle(self):
+        """Close every idle connection so the next acquire opens a fresh one"""
+        idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            await self.run_sync(self._close_quietly, connection)
+            self.discarded += 1
+    
+    async def close(self):
+        """Close idle connections and stop the executor"""
+        self.closed = True
+        await self.discard_idle()
+        self._executor.shutdown(wait=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage statistics"""
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": len(self._idle),
+            "opened": self.opened,
+            "discarded": self.discarded,
+            "timeouts": self.timeouts
+        }
+
 class DatabaseManager:
     def __init__(self):
-        self.connection = None
+        self.pool: Optional[ConnectionPool] = None
+        # One connect() at a time, so callers racing to reconnect share a single pool
+        self._connect_lock = asyncio.Lock()
         # Load database credentials from config
         db_config = config.database
         self.host = db_config.get("host", "localhost")
@@ -32,42 +178,134 @@ class DatabaseManager:
         self.user = db_config.get("user", "")
         self.password = db_config.get("password", "")
         self.database = db_config.get("database", "")
+        # Pool tuning
+        self.pool_size = db_config.get("pool_size", 5)
+        self.acquire_timeout = db_config.get("acquire_timeout", 10)
+        self.health_check_interval = db_config.get("health_check_interval", 30)
+    
+    @property
+    def is_connected(self) -> bool:
+        """True while the connection pool is open"""
+        return self.pool is not None and not self.pool.closed
         
     async def connect(self):
-        """Establish database connection"""
+        """Create the connection pool and verify the credentials with one connection"""
         if not MYSQL_AVAILABLE:
             logging.error("MySQL connector not available. Please install mysql-connector-python")
             return False
-            
-        try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                autocommit=True
-            )
-            if self.connection.is_connected():
-                logging.info("Successfully connected to MySQL database")
+        
+        if self.is_connected:
+            return True
+        
+        async with self._connect_lock:
+            # Another caller may have connected while this one waited
+            if self.is_connected:
                 return True
+            return await self._open_pool()
+    
+    async def _open_pool(self) -> bool:
+        pool = ConnectionPool(
+            connect_kwargs={
+                "host": self.host,
+                "port": self.port,
+                "user": self.user,
+                "password": self.password,
+                "database": self.database,
+                "autocommit": True
+            },
+            size=self.pool_size,
+            acquire_timeout=self.acquire_timeout,
+            health_check_interval=self.health_check_interval
+        )
+        try:
+            async with pool.connection():
+                pass
+            self.pool = pool
+            logging.info(f"Successfully connected to MySQL database (pool size {self.pool_size})")
+            return True
         except Error as e:
             logging.error(f"Error connecting to MySQL: {e}")
-            return False
         except Exception as e:
             logging.error(f"Unexpected error connecting to database: {e}")
-            return False
+        await pool.close()
+        return False
     
     async def disconnect(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logging.info("MySQL connection closed")
+        """Close the connection pool"""
+        if self.pool:
+            pool, self.pool = self.pool, None
+            await pool.close()
+            logging.info("MySQL connection pool closed")
+    
+    async def refresh(self):
+        """Drop idle connections (or reconnect) so the next query uses a fresh socket"""
+        if self.is_connected:
+            await self.pool.discard_idle()
+            return True
+        return await self.connect()
+    
+    async def run(self, func: Callable[[Any], Any], dictionary: bool = False, transaction: bool = False):
+        """
+        Run func(cursor) on a pooled connection inside the database executor.
+        With transaction=True everything func does is committed together or rolled back.
+        """
+        if not self.is_connected:
+            raise Error("Database is not connected")
+        
+        def _with_cursor(connection):
+            if transaction:
+                connection.start_transaction()
+            cursor = connection.cursor(dictionary=dictionary)
+            try:
+                result = func(cursor)
+                if transaction:
+                    connection.commit()
+                return result
+            except Exception:
+                if transaction:
+                    connection.rollback()
+                raise
+            finally:
+                cursor.close()
+        
+        async with self.pool.connection() as connection:
+            return await self.pool.run_sync(_with_cursor, connection)
+    
+    async def execute(self, query: str, params: Sequence[Any] = ()) -> int:
+        """Execute a statement and return the affected row count"""
+        def _execute(cursor):
+            cursor.execute(query, params)
+            return cursor.rowcount
+        return await self.run(_execute)
+    
+    async def executemany(self, query: str, seq_params: List[Sequence[Any]], transaction: bool = False) -> int:
+        """Execute a statement for every parameter tuple and return the affected row count"""
+        if not seq_params:
+            return 0
+        def _executemany(cursor):
+            cursor.executemany(query, seq_params)
+            return cursor.rowcount
+        return await self.run(_executemany, transaction=transaction)
+    
+    async def fetchone(self, query: str, params: Sequence[Any] = (), dictionary: bool = False):
+        """Execute a query and return the first row"""
+        def _fetchone(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        return await self.run(_fetchone, dictionary=dictionary)
+    
+    async def fetchall(self, query: str, params: Sequence[Any] = (), dictionary: bool = False) -> List[Any]:
+        """Execute a query and return all rows"""
+        def _fetchall(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        return await self.run(_fetchall, dictionary=dictionary)
     
     async def create_tables(self):
         """Create all necessary tables for the bot data"""
-        cursor = self.connection.cursor()
-        
+        await self.run(self._create_tables)
+    
+    def _create_tables(self, cursor):
         try:
             # Economy table (mainbank.json)
             cursor.execute("""
@@ -92,6 +330,18 @@ class DatabaseManager:
                 )
             """)
             
+            # Level thresholds used by the leveling upsert
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS level_thresholds (
+                    level INT PRIMARY KEY,
+                    min_total_xp BIGINT NOT NULL,
+                    UNIQUE KEY idx_min_total_xp (min_total_xp)
+                )
+            """)
+            cursor.executemany("""
+                INSERT IGNORE INTO level_thresholds (level, min_total_xp) VALUES (%s, %s)
+            """, list(enumerate(LEVEL_THRESHOLDS, start=1)))
+            
             # User mood data (user_mood_data.json)
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS user_moods (
@@ -234,9 +484,12 @@ class DatabaseManager:
                     INDEX idx_user_id (user_id),
                     INDEX idx_guild_id (guild_id),
                     INDEX idx_timestamp (timestamp),
-                    INDEX idx_message_id (message_id)
+                    INDEX idx_message_id (message_id),
+                    INDEX idx_channel_timestamp (channel_id, timestamp)
                 )
             """)
+            # Tables created before the index existed get it here
+            self._ensure_index(cursor, "ai_chat_history", "idx_channel_timestamp", "channel_id, timestamp")
             
             # Message Logging table - Log EVERY message for future analysis
             cursor.execute("""
@@ -275,32 +528,34 @@ class DatabaseManager:
         except Error as e:
             logging.error(f"Error creating tables: {e}")
             raise
-        finally:
-            cursor.close()
+    
+    @staticmethod
+    def _ensure_index(cursor, table: str, index: str, columns: str):
+        """Add an index to an existing table unless it already has it"""
+        cursor.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """, (table, index))
+        if not cursor.fetchall():
+            logging.info(f"Adding index {index} to {table}")
+            cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
     
     async def is_migration_completed(self) -> bool:
         """Check if migration has already been completed"""
-        cursor = self.connection.cursor()
         try:
-            cursor.execute("SELECT completed FROM migration_status WHERE id = 1")
-            result = cursor.fetchone()
+            result = await self.fetchone("SELECT completed FROM migration_status WHERE id = 1")
             return result[0] if result else False
         except Error:
             return False
-        finally:
-            cursor.close()
     
     async def mark_migration_completed(self):
         """Mark migration as completed"""
-        cursor = self.connection.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO migration_status (id, completed) 
-                VALUES (1, TRUE) 
-                ON DUPLICATE KEY UPDATE completed = TRUE, completed_at = CURRENT_TIMESTAMP
-            """)
-        finally:
-            cursor.close()
+        await self.execute("""
+            INSERT INTO migration_status (id, completed) 
+            VALUES (1, TRUE) 
+            ON DUPLICATE KEY UPDATE completed = TRUE, completed_at = CURRENT_TIMESTAMP
+        """)
     
     async def migrate_json_data(self) -> Dict[str, Any]:
         """Migrate all JSON data to database"""
@@ -316,18 +571,16 @@ class DatabaseManager:
                 with open('mainbank.json', 'r') as f:
                     economy_data = json.load(f)
                 
-                cursor = self.connection.cursor()
-                for user_id, data in economy_data.items():
-                    cursor.execute("""
-                        INSERT INTO economy (user_id, wallet, bank, bag) 
-                        VALUES (%s, %s, %s, %s)
-                        ON DUPLICATE KEY UPDATE 
-                        wallet = VALUES(wallet), 
-                        bank = VALUES(bank), 
-                        bag = VALUES(bag)
-                    """, (int(user_id), data.get('wallet', 0), data.get('bank', 0), json.dumps(data.get('bag', []))))
+                await self.executemany("""
+                    INSERT INTO economy (user_id, wallet, bank, bag) 
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE 
+                    wallet = VALUES(wallet), 
+                    bank = VALUES(bank), 
+                    bag = VALUES(bag)
+                """, [(int(user_id), data.get('wallet', 0), data.get('bank', 0), json.dumps(data.get('bag', [])))
+                      for user_id, data in economy_data.items()])
                 
-                cursor.close()
                 migration_results["success"].append(f"Economy: {len(economy_data)} records")
                 migration_results["total_records"] += len(economy_data)
             except FileNotFoundError:
@@ -340,25 +593,24 @@ class DatabaseManager:
                 with open('leveling.json', 'r') as f:
                     leveling_data = json.load(f)
                 
-                cursor = self.connection.cursor()
-                record_count = 0
+                rows = []
                 for guild_id, users in leveling_data.items():
                     for user_id, data in users.items():
-                        cursor.execute("""
-                            INSERT INTO leveling (guild_id, user_id, xp, level, messages, total_xp) 
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE 
-                            xp = VALUES(xp), 
-                            level = VALUES(level), 
-                            messages = VALUES(messages), 
-                            total_xp = VALUES(total_xp)
-                        """, (int(guild_id), int(user_id), data.get('xp', 0), 
-                             data.get('level', 1), data.get('messages', 0), data.get('total_xp', 0)))
-                        record_count += 1
+                        rows.append((int(guild_id), int(user_id), data.get('xp', 0), 
+                                     data.get('level', 1), data.get('messages', 0), data.get('total_xp', 0)))
                 
-                cursor.close()
-                migration_results["success"].append(f"Leveling: {record_count} records")
-                migration_results["total_records"] += record_count
+                await self.executemany("""
+                    INSERT INTO leveling (guild_id, user_id, xp, level, messages, total_xp) 
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE 
+                    xp = VALUES(xp), 
+                    level = VALUES(level), 
+                    messages = VALUES(messages), 
+                    total_xp = VALUES(total_xp)
+                """, rows)
+                
+                migration_results["success"].append(f"Leveling: {len(rows)} records")
+                migration_results["total_records"] += len(rows)
             except FileNotFoundError:
                 migration_results["errors"].append("leveling.json not found")
             except Exception as e:
@@ -405,210 +657,168 @@ class DatabaseManager:
         with open('user_mood_data.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for user_id, moods in data.items():
-            cursor.execute("""
-                INSERT INTO user_moods (user_id, happy, sad, stressed, calm, tired, motivated, others) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                happy = VALUES(happy), sad = VALUES(sad), stressed = VALUES(stressed),
-                calm = VALUES(calm), tired = VALUES(tired), motivated = VALUES(motivated),
-                others = VALUES(others)
-            """, (int(user_id), moods.get('happy', 0), moods.get('sad', 0), 
-                 moods.get('stressed', 0), moods.get('calm', 0), moods.get('tired', 0),
-                 moods.get('motivated', 0), json.dumps(moods.get('others', {}))))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO user_moods (user_id, happy, sad, stressed, calm, tired, motivated, others) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE 
+            happy = VALUES(happy), sad = VALUES(sad), stressed = VALUES(stressed),
+            calm = VALUES(calm), tired = VALUES(tired), motivated = VALUES(motivated),
+            others = VALUES(others)
+        """, [(int(user_id), moods.get('happy', 0), moods.get('sad', 0), 
+               moods.get('stressed', 0), moods.get('calm', 0), moods.get('tired', 0),
+               moods.get('motivated', 0), json.dumps(moods.get('others', {})))
+              for user_id, moods in data.items()])
         return len(data)
     
     async def _migrate_server_moods(self) -> int:
         with open('server_mood_data.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for guild_id, mood_data in data.items():
-            cursor.execute("""
-                INSERT INTO server_moods (guild_id, mood_data) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE mood_data = VALUES(mood_data)
-            """, (int(guild_id), json.dumps(mood_data)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO server_moods (guild_id, mood_data) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE mood_data = VALUES(mood_data)
+        """, [(int(guild_id), json.dumps(mood_data)) for guild_id, mood_data in data.items()])
         return len(data)
     
     async def _migrate_server_settings(self) -> int:
         with open('server_settings.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        count = 0
-        if 'guilds' in data:
-            for guild_id, settings in data['guilds'].items():
-                cursor.execute("""
-                    INSERT INTO server_settings (guild_id, prefix, settings) 
-                    VALUES (%s, %s, %s)
-                    ON DUPLICATE KEY UPDATE prefix = VALUES(prefix), settings = VALUES(settings)
-                """, (int(guild_id), settings.get('prefix', '*'), json.dumps(settings)))
-                count += 1
-        cursor.close()
-        return count
+        rows = [(int(guild_id), settings.get('prefix', '*'), json.dumps(settings))
+                for guild_id, settings in data.get('guilds', {}).items()]
+        await self.executemany("""
+            INSERT INTO server_settings (guild_id, prefix, settings) 
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE prefix = VALUES(prefix), settings = VALUES(settings)
+        """, rows)
+        return len(rows)
     
     async def _migrate_announcements(self) -> int:
         with open('announcement_settings.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for guild_id, settings in data.items():
-            cursor.execute("""
-                INSERT INTO announcements (guild_id, settings) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE settings = VALUES(settings)
-            """, (int(guild_id), json.dumps(settings)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO announcements (guild_id, settings) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE settings = VALUES(settings)
+        """, [(int(guild_id), json.dumps(settings)) for guild_id, settings in data.items()])
         return len(data)
     
     async def _migrate_warnings(self) -> int:
         with open('warnings.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        count = 0
-        for guild_id, users in data.items():
-            for user_id, warnings in users.items():
-                cursor.execute("""
-                    INSERT INTO warnings (guild_id, user_id, warnings) 
-                    VALUES (%s, %s, %s)
-                    ON DUPLICATE KEY UPDATE warnings = VALUES(warnings)
-                """, (int(guild_id), int(user_id), json.dumps(warnings)))
-                count += 1
-        cursor.close()
-        return count
+        rows = [(int(guild_id), int(user_id), json.dumps(warnings))
+                for guild_id, users in data.items()
+                for user_id, warnings in users.items()]
+        await self.executemany("""
+            INSERT INTO warnings (guild_id, user_id, warnings) 
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE warnings = VALUES(warnings)
+        """, rows)
+        return len(rows)
     
     async def _migrate_qotd(self) -> int:
         with open('qotd.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for guild_id, settings in data.items():
-            cursor.execute("""
-                INSERT INTO qotd (guild_id, settings) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE settings = VALUES(settings)
-            """, (int(guild_id), json.dumps(settings)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO qotd (guild_id, settings) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE settings = VALUES(settings)
+        """, [(int(guild_id), json.dumps(settings)) for guild_id, settings in data.items()])
         return len(data)
     
     async def _migrate_prefixes(self) -> int:
         with open('prefixes.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for guild_id, prefix in data.items():
-            cursor.execute("""
-                INSERT INTO prefixes (guild_id, prefix) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE prefix = VALUES(prefix)
-            """, (int(guild_id), prefix))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO prefixes (guild_id, prefix) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE prefix = VALUES(prefix)
+        """, [(int(guild_id), prefix) for guild_id, prefix in data.items()])
         return len(data)
     
     async def _migrate_mention_prefs(self) -> int:
         with open('mention_prefs.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for user_id, prefs in data.items():
-            cursor.execute("""
-                INSERT INTO mention_prefs (user_id, preferences) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE preferences = VALUES(preferences)
-            """, (int(user_id), json.dumps(prefs)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO mention_prefs (user_id, preferences) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE preferences = VALUES(preferences)
+        """, [(int(user_id), json.dumps(prefs)) for user_id, prefs in data.items()])
         return len(data)
     
     async def _migrate_mental_health_config(self) -> int:
         with open('mental_health_config.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for guild_id, config in data.items():
-            cursor.execute("""
-                INSERT INTO mental_health_config (guild_id, config) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE config = VALUES(config)
-            """, (int(guild_id), json.dumps(config)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO mental_health_config (guild_id, config) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE config = VALUES(config)
+        """, [(int(guild_id), json.dumps(config)) for guild_id, config in data.items()])
         return len(data)
     
     async def _migrate_mood_dates(self) -> int:
         with open('mood_dates.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for user_id, dates in data.items():
-            cursor.execute("""
-                INSERT INTO mood_dates (user_id, dates) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE dates = VALUES(dates)
-            """, (int(user_id), json.dumps(dates)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO mood_dates (user_id, dates) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE dates = VALUES(dates)
+        """, [(int(user_id), json.dumps(dates)) for user_id, dates in data.items()])
         return len(data)
     
     async def _migrate_log_channels(self) -> int:
         with open('log_channels.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for guild_id, channel_id in data.items():
-            cursor.execute("""
-                INSERT INTO log_channels (guild_id, channel_id) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE channel_id = VALUES(channel_id)
-            """, (int(guild_id), int(channel_id)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO log_channels (guild_id, channel_id) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE channel_id = VALUES(channel_id)
+        """, [(int(guild_id), int(channel_id)) for guild_id, channel_id in data.items()])
         return len(data)
     
     async def _migrate_level_up_channels(self) -> int:
         with open('level_up_channels.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for guild_id, channel_id in data.items():
-            cursor.execute("""
-                INSERT INTO level_up_channels (guild_id, channel_id) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE channel_id = VALUES(channel_id)
-            """, (int(guild_id), int(channel_id)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO level_up_channels (guild_id, channel_id) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE channel_id = VALUES(channel_id)
+        """, [(int(guild_id), int(channel_id)) for guild_id, channel_id in data.items()])
         return len(data)
     
     async def _migrate_leveling_enabled(self) -> int:
         with open('leveling_enabled.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        for guild_id, enabled in data.items():
-            cursor.execute("""
-                INSERT INTO leveling_enabled (guild_id, enabled) 
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE enabled = VALUES(enabled)
-            """, (int(guild_id), bool(enabled)))
-        cursor.close()
+        await self.executemany("""
+            INSERT INTO leveling_enabled (guild_id, enabled) 
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE enabled = VALUES(enabled)
+        """, [(int(guild_id), bool(enabled)) for guild_id, enabled in data.items()])
         return len(data)
     
     async def _migrate_ignored_channels(self) -> int:
         with open('ignored_channels.json', 'r') as f:
             data = json.load(f)
         
-        cursor = self.connection.cursor()
-        count = 0
-        for guild_id, channels in data.items():
-            for channel_id in channels:
-                cursor.execute("""
-                    INSERT IGNORE INTO ignored_channels (guild_id, channel_id) 
-                    VALUES (%s, %s)
-                """, (int(guild_id), int(channel_id)))
-                count += 1
-        cursor.close()
-        return count
+        rows = [(int(guild_id), int(channel_id))
+                for guild_id, channels in data.items()
+                for channel_id in channels]
+        await self.executemany("""
+            INSERT IGNORE INTO ignored_channels (guild_id, channel_id) 
+            VALUES (%s, %s)
+        """, rows)
+        return len(rows)
 
 # Global database instance
 db = DatabaseManager()
\ No newline at end of file
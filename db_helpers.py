@@ -4,7 +4,14 @@ This module provides database equivalents for all JSON operations
 """
 
 import json
+import asyncio
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
+from config import config
+from database import LEVEL_THRESHOLDS
+from log_writer import JsonlLogWriter
 
 try:
     import mysql.connector
@@ -15,32 +22,96 @@ except ImportError:
     DATABASE_AVAILABLE = False
     # Mock db object
     class MockDB:
-        @property
-        def connection(self):
-            return None
-    db = Mo    @staticmethod
-    async def get_level_up_channel(guild_id: int) -> Optional[int]:
-        """Get level up channel for a guild"""
-        if not await DatabaseHelpers.ensure_connection():()
+        is_connected = False
+        pool = None
+    db = MockDB()
+
+_MISSING = object()
+
+def level_for_xp(total_xp: int) -> int:
+    """Level reached with the given total XP, looked up in LEVEL_THRESHOLDS"""
+    return max(bisect_right(LEVEL_THRESHOLDS, total_xp), 1)
+
+# Level reached with a row's new total XP, evaluated inside the leveling upsert.
+# The XP gained is bound as a parameter, VALUES() is deprecated there and fragile inside a subquery
+_LEVEL_FOR_NEW_TOTAL_SQL = """COALESCE((
+    SELECT t.level FROM level_thresholds t
+    WHERE t.min_total_xp <= leveling.total_xp + %s
+    ORDER BY t.min_total_xp DESC LIMIT 1
+), leveling.level)"""
+# The upsert hands old and new level back packed into LAST_INSERT_ID()
+_LEVEL_PACK = 1 << 16
+
+def unpack_levels(packed: int) -> Tuple[int, int]:
+    """(old_level, new_level) from the LAST_INSERT_ID() value of the leveling upsert"""
+    return divmod(packed, _LEVEL_PACK)
+
+# Duplicate message ids (e.g. edits of an already logged message) are skipped
+_MESSAGE_LOG_INSERT = """
+    INSERT IGNORE INTO message_logs 
+    (user_id, message_id, server_id, channel_id, parent_channel_id, 
+     username, message_text, attachments)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+class LRUCache:
+    """Small size-bounded mapping that evicts the least recently used entry"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+    
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+    
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+    
+    def invalidate(self, key):
+        self._data.pop(key, None)
+    
+    def clear(self):
+        self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
 
 class DatabaseHelpers:
     """Helper functions for database operations used by cogs"""
     
+    # Per-guild command prefix cache, shared by every DatabaseHelpers instance
+    _prefix_cache: Dict[str, Optional[str]] = {}
+    _prefix_cache_warm = False
+    
+    # Leveling config per guild and level-up mention preference per user, loaded lazily
+    _leveling_config_cache = LRUCache(config.get("leveling.guild_cache_size", 1000))
+    _mention_pref_cache = LRUCache(config.get("leveling.mention_cache_size", 10000))
+    
+    # Per-guild opt-out of cached AI responses (server setting 'ai_cache')
+    _ai_cache_setting_cache = LRUCache(config.get("ai_api.guild_setting_cache_size", 1000))
+    
     @staticmethod
     async def ensure_connection():
-        """Ensure database connection is available, attempt to reconnect if needed"""
+        """Ensure the database pool is available, attempt to reconnect if needed"""
         if not DATABASE_AVAILABLE:
             return False
             
-        if not db.connection or not db.connection.is_connected():
+        if not db.is_connected:
             print("Database connection lost, attempting to reconnect...")
             try:
-                await db.connect()
-                print("✅ Database reconnected successfully!")
-                return True
+                if await db.connect():
+                    print("✅ Database reconnected successfully!")
+                    return True
+                print("❌ Database reconnection failed")
             except Exception as e:
                 print(f"❌ Database reconnection failed: {e}")
-                return False
+            return False
         return True
     
     # ECONOMY HELPERS
@@ -49,84 +120,66 @@ class DatabaseHelpers:
         """Get all economy data (replacement for mainbank.json)"""
         if not await DatabaseHelpers.ensure_connection():
             return {}
-        cursor = db.connection.cursor(dictionary=True)
-        try:
-            cursor.execute("SELECT user_id, wallet, bank, bag FROM economy")
-            results = cursor.fetchall()
-            
-            # Convert to the expected format
-            bank_data = {}
-            for row in results:
-                bag = json.loads(row['bag']) if row['bag'] else []
-                bank_data[str(row['user_id'])] = {
-                    'wallet': row['wallet'],
-                    'bank': row['bank'],
-                    'bag': bag
-                }
-            return bank_data
-        finally:
-            cursor.close()
+        results = await db.fetchall("SELECT user_id, wallet, bank, bag FROM economy", dictionary=True)
+        
+        # Convert to the expected format
+        bank_data = {}
+        for row in results:
+            bag = json.loads(row['bag']) if row['bag'] else []
+            bank_data[str(row['user_id'])] = {
+                'wallet': row['wallet'],
+                'bank': row['bank'],
+                'bag': bag
+            }
+        return bank_data
     
     @staticmethod
     async def open_account(user) -> bool:
         """Create new economy account for user"""
         if not await DatabaseHelpers.ensure_connection():
             return False
-        cursor = db.connection.cursor()
-        try:
-            cursor.execute("""
-                INSERT IGNORE INTO economy (user_id, wallet, bank, bag) 
-                VALUES (%s, 0, 0, %s)
-            """, (user.id, json.dumps([])))
-            return cursor.rowcount > 0
-        finally:
-            cursor.close()
+        rowcount = await db.execute("""
+            INSERT IGNORE INTO economy (user_id, wallet, bank, bag) 
+            VALUES (%s, 0, 0, %s)
+        """, (user.id, json.dumps([])))
+        return rowcount > 0
     
     @staticmethod
     async def update_bank(user, change: int = 0, mode: str = "wallet") -> List[int]:
         """Update user's bank balance"""
         if not await DatabaseHelpers.ensure_connection():
             return [0, 0]
-        cursor = db.connection.cursor()
-        try:
-            # First ensure account exists
-            await DatabaseHelpers.open_account(user)
-            
-            # Update the balance
-            cursor.execute(f"""
-                UPDATE economy SET {mode} = {mode} + %s WHERE user_id = %s
-            """, (change, user.id))
-            
-            # Get updated balances
-            cursor.execute("SELECT wallet, bank FROM economy WHERE user_id = %s", (user.id,))
-            result = cursor.fetchone()
-            return [result[0], result[1]] if result else [0, 0]
-        finally:
-            cursor.close()
+        # First ensure account exists
+        await DatabaseHelpers.open_account(user)
+        
+        # Update the balance
+        await db.execute(f"""
+            UPDATE economy SET {mode} = {mode} + %s WHERE user_id = %s
+        """, (change, user.id))
+        
+        # Get updated balances
+        result = await db.fetchone("SELECT wallet, bank FROM economy WHERE user_id = %s", (user.id,))
+        return [result[0], result[1]] if result else [0, 0]
     
     @staticmethod
     async def get_user_balance(user) -> Tuple[int, int]:
         """Get user's wallet and bank balance"""
         if not await DatabaseHelpers.ensure_connection():
             return (0, 0)
-        cursor = db.connection.cursor()
-        try:
-            await DatabaseHelpers.open_account(user)
-            cursor.execute("SELECT wallet, bank FROM economy WHERE user_id = %s", (user.id,))
-            result = cursor.fetchone()
-            return (result[0], result[1]) if result else (0, 0)
-        finally:
-            cursor.close()
+        await DatabaseHelpers.open_account(user)
+        result = await db.fetchone("SELECT wallet, bank FROM economy WHERE user_id = %s", (user.id,))
+        return (result[0], result[1]) if result else (0, 0)
     
     @staticmethod
     async def buy_item(user, item_name: str, amount: int, price: int) -> bool:
         """Add item to user's bag and deduct money"""
-        cursor = db.connection.cursor()
-        try:
-            await DatabaseHelpers.open_account(user)
-            
+        if not await DatabaseHelpers.ensure_connection():
+            return False
+        await DatabaseHelpers.open_account(user)
+        
+        def _buy(cursor):
             # Get current bag
-            cursor.execute("SELECT bag, wallet FROM economy WHERE user_id = %s", (user.id,))
+            cursor.execute("SELECT bag, wallet FROM economy WHERE user_id = %s FOR UPDATE", (user.id,))
             result = cursor.fetchone()
             if not result or result[1] < price * amount:
                 return False
@@ -151,144 +204,171 @@ class DatabaseHelpers:
             """, (new_wallet, json.dumps(bag), user.id))
             
             return True
-        finally:
-            cursor.close()
+        
+        # Row locked until commit, so concurrent purchases can't both spend the same wallet
+        return await db.run(_buy, transaction=True)
     
     @staticmethod
     async def get_user_bag(user) -> List[Dict[str, Any]]:
         """Get user's bag contents"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return []
-        cursor = db.connection.cursor()
-        try:
-            await DatabaseHelpers.open_account(user)
-            cursor.execute("SELECT bag FROM economy WHERE user_id = %s", (user.id,))
-            result = cursor.fetchone()
-            return json.loads(result[0]) if result and result[0] else []
-        finally:
-            cursor.close()
+        await DatabaseHelpers.open_account(user)
+        result = await db.fetchone("SELECT bag FROM economy WHERE user_id = %s", (user.id,))
+        return json.loads(result[0]) if result and result[0] else []
     
     # LEVELING HELPERS
     @staticmethod
     async def get_leveling_data() -> Dict[str, Dict[str, Any]]:
         """Get all leveling data"""
-        cursor = db.connection.cursor(dictionary=True)
-        try:
-            cursor.execute("SELECT guild_id, user_id, xp, level, messages, total_xp FROM leveling")
-            results = cursor.fetchall()
+        if not await DatabaseHelpers.ensure_connection():
+            return {}
+        results = await db.fetchall(
+            "SELECT guild_id, user_id, xp, level, messages, total_xp FROM leveling", dictionary=True
+        )
+        
+        leveling_data = {}
+        for row in results:
+            guild_id = str(row['guild_id'])
+            user_id = str(row['user_id'])
             
-            leveling_data = {}
-            for row in results:
-                guild_id = str(row['guild_id'])
-                user_id = str(row['user_id'])
-                
-                if guild_id not in leveling_data:
-                    leveling_data[guild_id] = {}
-                
-                leveling_data[guild_id][user_id] = {
-                    'xp': row['xp'],
-                    'level': row['level'],
-                    'messages': row['messages'],
-                    'total_xp': row['total_xp']
-                }
-            return leveling_data
-        finally:
-            cursor.close()
+            if guild_id not in leveling_data:
+                leveling_data[guild_id] = {}
+            
+            leveling_data[guild_id][user_id] = {
+                'xp': row['xp'],
+                'level': row['level'],
+                'messages': row['messages'],
+                'total_xp': row['total_xp']
+            }
+        return leveling_data
     
     @staticmethod
-    async def update_user_xp(guild_id: int, user_id: int, xp_gain: int, message_count: int = 1):
-        """Update user's XP and level"""
-        # Ensure database connection is available
+    async def upsert_user_xp(guild_id: int, user_id: int, xp_gain: int,
+                             message_count: int = 1) -> Optional[Tuple[int, int]]:
+        """
+        Add XP to a user in one atomic INSERT ... ON DUPLICATE KEY UPDATE.
+        The new level is computed by the server from level_thresholds, so concurrent
+        updates for the same user can't overwrite each other.
+        Returns (old_level, new_level), or None if the update failed.
+        """
         if not await DatabaseHelpers.ensure_connection():
             print(f"Database not available for XP update: user {user_id} in guild {guild_id}")
+            return None
+        
+        # Assignments run left to right: xp and level still see the old level and
+        # total_xp, which is updated last. If leveled up, reset XP for current level.
+        query = f"""
+            INSERT INTO leveling (guild_id, user_id, xp, level, messages, total_xp)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            xp = xp + %s - IF({_LEVEL_FOR_NEW_TOTAL_SQL} > level, level * level * 100, 0),
+            level = LAST_INSERT_ID(level * {_LEVEL_PACK} + {_LEVEL_FOR_NEW_TOTAL_SQL}) MOD {_LEVEL_PACK},
+            messages = messages + %s,
+            total_xp = total_xp + %s
+        """
+        first_level = level_for_xp(xp_gain)
+        params = (guild_id, user_id, xp_gain, first_level, message_count, xp_gain,
+                  xp_gain, xp_gain, xp_gain, message_count, xp_gain)
+        
+        def _upsert(cursor):
+            cursor.execute(query, params)
+            # rowcount is 1 for a new row and 2 for an updated one
+            if cursor.rowcount == 1 or not cursor.lastrowid:
+                return first_level, first_level
+            return unpack_levels(cursor.lastrowid)
+        
+        try:
+            return await db.run(_upsert)
+        except Exception as e:
+            print(f"Error updating user XP: {e}")
+            return None
+    
+    @staticmethod
+    async def update_user_xp(guild_id: int, user_id: int, xp_gain: int, message_count: int = 1):
+        """Update user's XP and level, returns True if the user leveled up"""
+        levels = await DatabaseHelpers.upsert_user_xp(guild_id, user_id, xp_gain, message_count)
+        if levels is None:
             return False
-            
-        cursor = db.connection.cursor()
+        old_level, new_level = levels
+        return new_level > old_level
+    
+    @staticmethod
+    async def get_user_xp_totals(guild_id: int, user_id: int) -> Optional[Dict[str, int]]:
+        """
+        Get a user's stored xp, level, messages and total_xp (zeros for a new user).
+        Returns None if the database couldn't be read, so the caller can tell that from a new user.
+        """
+        totals = {'xp': 0, 'level': 1, 'messages': 0, 'total_xp': 0}
+        if not await DatabaseHelpers.ensure_connection():
+            return None
         try:
-            # Get current stats
-            cursor.execute("""
+            result = await db.fetchone("""
                 SELECT xp, level, messages, total_xp FROM leveling 
                 WHERE guild_id = %s AND user_id = %s
             """, (guild_id, user_id))
-            result = cursor.fetchone()
-            
-            if result:
-                current_xp, current_level, messages, total_xp = result
-                new_xp = current_xp + xp_gain
-                new_total_xp = total_xp + xp_gain
-                new_messages = messages + message_count
-                
-                # Calculate new level (simple formula: level = sqrt(total_xp / 100))
-                import math
-                new_level = int(math.sqrt(new_total_xp / 100)) + 1
-                
-                # If leveled up, reset XP for current level
-                if new_level > current_level:
-                    new_xp = new_xp - (current_level * current_level * 100)
-                
-                cursor.execute("""
-                    UPDATE leveling SET xp = %s, level = %s, messages = %s, total_xp = %s
-                    WHERE guild_id = %s AND user_id = %s
-                """, (new_xp, new_level, new_messages, new_total_xp, guild_id, user_id))
-                
-                return new_level > current_level  # Return True if leveled up
-            else:
-                # Create new entry
-                cursor.execute("""
-                    INSERT INTO leveling (guild_id, user_id, xp, level, messages, total_xp)
-                    VALUES (%s, %s, %s, 1, %s, %s)
-                """, (guild_id, user_id, xp_gain, message_count, xp_gain))
-                return False
         except Exception as e:
-            print(f"Error updating user XP: {e}")
-            return False
-        finally:
-            cursor.close()
+            print(f"Error loading XP totals for user {user_id} in guild {guild_id}: {e}")
+            return None
+        if result:
+            totals['xp'], totals['level'], totals['messages'], totals['total_xp'] = result
+        return totals
+    
+    @staticmethod
+    async def apply_xp_deltas(rows: List[Tuple[int, int, int, int, int, int]]) -> int:
+        """Add aggregated (guild_id, user_id, xp, level, messages, total_xp) deltas in one multi-row upsert"""
+        if not rows:
+            return 0
+        values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+        params = [value for row in rows for value in row]
+        return await db.execute(f"""
+            INSERT INTO leveling (guild_id, user_id, xp, level, messages, total_xp)
+            VALUES {values}
+            ON DUPLICATE KEY UPDATE
+            xp = xp + VALUES(xp),
+            level = GREATEST(level, VALUES(level)),
+            messages = messages + VALUES(messages),
+            total_xp = total_xp + VALUES(total_xp)
+        """, params)
     
     @staticmethod
     async def get_guild_leaderboard(guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get guild leveling leaderboard"""
-        cursor = db.connection.cursor(dictionary=True)
-        try:
-            cursor.execute("""
-                SELECT user_id, xp, level, messages, total_xp 
-                FROM leveling 
-                WHERE guild_id = %s 
-                ORDER BY total_xp DESC 
-                LIMIT %s
-            """, (guild_id, limit))
-            return cursor.fetchall()
-        finally:
-            cursor.close()
+        if not await DatabaseHelpers.ensure_connection():
+            return []
+        return await db.fetchall("""
+            SELECT user_id, xp, level, messages, total_xp 
+            FROM leveling 
+            WHERE guild_id = %s 
+            ORDER BY total_xp DESC 
+            LIMIT %s
+        """, (guild_id, limit), dictionary=True)
     
     # SERVER SETTINGS HELPERS
     @staticmethod
     async def get_server_settings() -> Dict[str, Any]:
         """Get all server settings"""
-        cursor = db.connection.cursor(dictionary=True)
-        try:
-            cursor.execute("SELECT guild_id, prefix, settings FROM server_settings")
-            results = cursor.fetchall()
-            
-            settings_data = {"guilds": {}}
-            for row in results:
-                guild_settings = json.loads(row['settings']) if row['settings'] else {}
-                guild_settings['prefix'] = row['prefix']
-                settings_data["guilds"][str(row['guild_id'])] = guild_settings
-            
-            return settings_data
-        finally:
-            cursor.close()
+        if not await DatabaseHelpers.ensure_connection():
+            return {"guilds": {}}
+        results = await db.fetchall("SELECT guild_id, prefix, settings FROM server_settings", dictionary=True)
+        
+        settings_data = {"guilds": {}}
+        for row in results:
+            guild_settings = json.loads(row['settings']) if row['settings'] else {}
+            guild_settings['prefix'] = row['prefix']
+            settings_data["guilds"][str(row['guild_id'])] = guild_settings
+        
+        return settings_data
     
     @staticmethod
     async def update_server_setting(guild_id: int, key: str, value: Any):
         """Update a specific server setting"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return
-        cursor = db.connection.cursor()
-        try:
+        
+        def _update(cursor):
             # Get current settings
-            cursor.execute("SELECT settings FROM server_settings WHERE guild_id = %s", (guild_id,))
+            cursor.execute("SELECT settings FROM server_settings WHERE guild_id = %s FOR UPDATE", (guild_id,))
             result = cursor.fetchone()
             
             if result:
@@ -310,29 +390,74 @@ class DatabaseHelpers:
                     VALUES (%s, '*', %s)
                     ON DUPLICATE KEY UPDATE settings = VALUES(settings)
                 """, (guild_id, json.dumps(settings)))
-        finally:
-            cursor.close()
+        
+        await db.run(_update, transaction=True)
+        
+        if key == 'prefix':
+            DatabaseHelpers._prefix_cache[str(guild_id)] = value
+        elif key == 'ai_cache':
+            DatabaseHelpers._ai_cache_setting_cache.invalidate(int(guild_id))
+    
+    @staticmethod
+    async def set_server_setting(guild_id: int, key: str, value: Any):
+        """Alias of update_server_setting used by the prefix command cogs"""
+        await DatabaseHelpers.update_server_setting(guild_id, key, value)
+    
+    @staticmethod
+    async def warm_prefix_cache() -> int:
+        """Load every guild prefix from server_settings into the prefix cache"""
+        if not await DatabaseHelpers.ensure_connection():
+            return 0
+        results = await db.fetchall("SELECT guild_id, prefix FROM server_settings")
+        DatabaseHelpers._prefix_cache.clear()
+        DatabaseHelpers._prefix_cache.update({str(guild_id): prefix for guild_id, prefix in results})
+        DatabaseHelpers._prefix_cache_warm = True
+        return len(results)
+    
+    @staticmethod
+    async def get_prefix(guild_id: int) -> Optional[str]:
+        """Get a guild's prefix from the cache, None means the default prefix"""
+        guild_id = str(guild_id)
+        if guild_id in DatabaseHelpers._prefix_cache:
+            return DatabaseHelpers._prefix_cache[guild_id]
+        # A warm cache has every stored prefix, so a miss means no custom prefix
+        if DatabaseHelpers._prefix_cache_warm:
+            return None
+        
+        prefix = await DatabaseHelpers.get_server_setting(guild_id, "prefix")
+        if db.is_connected:
+            DatabaseHelpers._prefix_cache[guild_id] = prefix
+        return prefix
     
     @staticmethod
     async def get_server_setting(guild_id: str, key: str) -> Any:
         """Get a specific server setting"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not DATABASE_AVAILABLE or not db.is_connected:
+            return None
+        if key == "prefix":
+            result = await db.fetchone("SELECT prefix FROM server_settings WHERE guild_id = %s", (guild_id,))
+            return result[0] if result else None
+        else:
+            result = await db.fetchone("SELECT settings FROM server_settings WHERE guild_id = %s", (guild_id,))
+            if result and result[0]:
+                settings = json.loads(result[0])
+                return settings.get(key)
             return None
-        cursor = db.connection.cursor()
-        try:
-            if key == "prefix":
-                cursor.execute("SELECT prefix FROM server_settings WHERE guild_id = %s", (guild_id,))
-                result = cursor.fetchone()
-                return result[0] if result else None
-            else:
-                cursor.execute("SELECT settings FROM server_settings WHERE guild_id = %s", (guild_id,))
-                result = cursor.fetchone()
-                if result and result[0]:
-                    settings = json.loads(result[0])
-                    return settings.get(key)
-                return None
-        finally:
-            cursor.close()
+    
+    @staticmethod
+    async def is_ai_cache_enabled(guild_id: int) -> bool:
+        """Get whether a guild allows cached AI responses, cached"""
+        guild_id = int(guild_id)
+        enabled = DatabaseHelpers._ai_cache_setting_cache.get(guild_id, _MISSING)
+        if enabled is not _MISSING:
+            return enabled
+        
+        if not await DatabaseHelpers.ensure_connection():
+            return True
+        setting = await DatabaseHelpers.get_server_setting(guild_id, 'ai_cache')
+        enabled = setting is not False
+        DatabaseHelpers._ai_cache_setting_cache.set(guild_id, enabled)
+        return enabled
     
     # MOOD DATA HELPERS
     @staticmethod
@@ -340,36 +465,34 @@ class DatabaseHelpers:
         """Get server mood data"""
         if not await DatabaseHelpers.ensure_connection():
             return {}
-        cursor = db.connection.cursor(dictionary=True)
-        try:
-            cursor.execute("SELECT user_id, happy, sad, stressed, calm, tired, motivated, others FROM user_moods")
-            results = cursor.fetchall()
-            
-            mood_data = {}
-            for row in results:
-                others = json.loads(row['others']) if row['others'] else {}
-                mood_data[str(row['user_id'])] = {
-                    'happy': row['happy'],
-                    'sad': row['sad'],
-                    'stressed': row['stressed'],
-                    'calm': row['calm'],
-                    'tired': row['tired'],
-                    'motivated': row['motivated'],
-                    'others': others
-                }
-            return mood_data
-        finally:
-            cursor.close()
+        results = await db.fetchall(
+            "SELECT user_id, happy, sad, stressed, calm, tired, motivated, others FROM user_moods",
+            dictionary=True
+        )
+        
+        mood_data = {}
+        for row in results:
+            others = json.loads(row['others']) if row['others'] else {}
+            mood_data[str(row['user_id'])] = {
+                'happy': row['happy'],
+                'sad': row['sad'],
+                'stressed': row['stressed'],
+                'calm': row['calm'],
+                'tired': row['tired'],
+                'motivated': row['motivated'],
+                'others': others
+            }
+        return mood_data
     
     @staticmethod
     async def update_user_mood(user_id: int, mood_type: str, custom_mood: str = None):
         """Update user's mood data"""
         if not await DatabaseHelpers.ensure_connection():
             return
-        cursor = db.connection.cursor()
-        try:
+        
+        def _update(cursor):
             # Get current mood data
-            cursor.execute("SELECT happy, sad, stressed, calm, tired, motivated, others FROM user_moods WHERE user_id = %s", (user_id,))
+            cursor.execute("SELECT happy, sad, stressed, calm, tired, motivated, others FROM user_moods WHERE user_id = %s FOR UPDATE", (user_id,))
             result = cursor.fetchone()
             
             if result:
@@ -405,8 +528,47 @@ class DatabaseHelpers:
                 calm = VALUES(calm), tired = VALUES(tired), motivated = VALUES(motivated),
                 others = VALUES(others)
             """, (user_id, happy, sad, stressed, calm, tired, motivated, json.dumps(others)))
-        finally:
-            cursor.close()
+        
+        await db.run(_update, transaction=True)
+    
+    @staticmethod
+    async def get_guild_mood_data(guild_id: int) -> Dict[str, Any]:
+        """Get the aggregated mood counts of one server"""
+        if not await DatabaseHelpers.ensure_connection():
+            return {}
+        result = await db.fetchone("SELECT mood_data FROM server_moods WHERE guild_id = %s", (guild_id,))
+        return json.loads(result[0]) if result and result[0] else {}
+    
+    @staticmethod
+    async def increment_guild_mood(guild_id: int, mood: str, custom_mood: str = None,
+                                   default_moods: List[str] = None):
+        """Count one mood response in a server's aggregated mood data"""
+        if not await DatabaseHelpers.ensure_connection():
+            return
+        
+        def _update(cursor):
+            cursor.execute("SELECT mood_data FROM server_moods WHERE guild_id = %s FOR UPDATE", (guild_id,))
+            result = cursor.fetchone()
+            
+            if result and result[0]:
+                mood_data = json.loads(result[0])
+            else:
+                mood_data = {m: 0 for m in (default_moods or [])}
+            
+            if custom_mood is not None:
+                if "others" not in mood_data:
+                    mood_data["others"] = {}
+                mood_data["others"][custom_mood] = mood_data["others"].get(custom_mood, 0) + 1
+            else:
+                mood_data[mood] = mood_data.get(mood, 0) + 1
+            
+            cursor.execute("""
+                INSERT INTO server_moods (guild_id, mood_data) 
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE mood_data = VALUES(mood_data)
+            """, (guild_id, json.dumps(mood_data)))
+        
+        await db.run(_update, transaction=True)
     
     # WARNINGS HELPERS
     @staticmethod
@@ -414,33 +576,30 @@ class DatabaseHelpers:
         """Get all warnings data"""
         if not await DatabaseHelpers.ensure_connection():
             return {}
-        cursor = db.connection.cursor(dictionary=True)
-        try:
-            cursor.execute("SELECT guild_id, user_id, warnings FROM warnings")
-            results = cursor.fetchall()
-            
-            warnings_data = {}
-            for row in results:
-                guild_id = str(row['guild_id'])
-                user_id = str(row['user_id'])
-                warnings = json.loads(row['warnings']) if row['warnings'] else []
-                
-                if guild_id not in warnings_data:
-                    warnings_data[guild_id] = {}
-                
-                warnings_data[guild_id][user_id] = warnings
+        results = await db.fetchall("SELECT guild_id, user_id, warnings FROM warnings", dictionary=True)
+        
+        warnings_data = {}
+        for row in results:
+            guild_id = str(row['guild_id'])
+            user_id = str(row['user_id'])
+            warnings = json.loads(row['warnings']) if row['warnings'] else []
             
-            return warnings_data
-        finally:
-            cursor.close()
+            if guild_id not in warnings_data:
+                warnings_data[guild_id] = {}
+            
+            warnings_data[guild_id][user_id] = warnings
+        
+        return warnings_data
     
     @staticmethod
     async def add_warning(guild_id: int, user_id: int, warning: Dict[str, Any]):
         """Add a warning to a user"""
-        cursor = db.connection.cursor()
-        try:
+        if not await DatabaseHelpers.ensure_connection():
+            return
+        
+        def _add(cursor):
             # Get current warnings
-            cursor.execute("SELECT warnings FROM warnings WHERE guild_id = %s AND user_id = %s", (guild_id, user_id))
+            cursor.execute("SELECT warnings FROM warnings WHERE guild_id = %s AND user_id = %s FOR UPDATE", (guild_id, user_id))
             result = cursor.fetchone()
             
             if result:
@@ -455,131 +614,146 @@ class DatabaseHelpers:
                 VALUES (%s, %s, %s)
                 ON DUPLICATE KEY UPDATE warnings = VALUES(warnings)
             """, (guild_id, user_id, json.dumps(warnings)))
-        finally:
-            cursor.close()
+        
+        await db.run(_add, transaction=True)
     
     # GENERAL JSON FILE HELPERS
     @staticmethod
     async def load_json_data(table_name: str, key_column: str = None) -> Dict[str, Any]:
         """Generic function to load JSON data from database tables"""
-        cursor = db.connection.cursor(dictionary=True)
-        try:
-            if key_column:
-                cursor.execute(f"SELECT * FROM {table_name}")
-                results = cursor.fetchall()
-                return {str(row[key_column]): row for row in results}
-            else:
-                cursor.execute(f"SELECT * FROM {table_name}")
-                return cursor.fetchall()
-        finally:
-            cursor.close()
+        if not await DatabaseHelpers.ensure_connection():
+            return {}
+        results = await db.fetchall(f"SELECT * FROM {table_name}", dictionary=True)
+        if key_column:
+            return {str(row[key_column]): row for row in results}
+        return results
     
     @staticmethod
     async def save_json_data(table_name: str, key_column: str, key_value: Any, data: Dict[str, Any]):
         """Generic function to save JSON data to database tables"""
         if not await DatabaseHelpers.ensure_connection():
             return
-        cursor = db.connection.cursor()
-        try:
-            # This is a simplified version - specific implementations should be used for complex tables
-            placeholders = ', '.join(['%s'] * len(data))
-            columns = ', '.join(data.keys())
-            values = list(data.values())
-            
-            cursor.execute(f"""
-                INSERT INTO {table_name} ({key_column}, {columns})
-                VALUES (%s, {placeholders})
-                ON DUPLICATE KEY UPDATE {', '.join([f'{k} = VALUES({k})' for k in data.keys()])}
-            """, [key_value] + values)
-        finally:
-            cursor.close()
+        # This is a simplified version - specific implementations should be used for complex tables
+        placeholders = ', '.join(['%s'] * len(data))
+        columns = ', '.join(data.keys())
+        values = list(data.values())
+        
+        await db.execute(f"""
+            INSERT INTO {table_name} ({key_column}, {columns})
+            VALUES (%s, {placeholders})
+            ON DUPLICATE KEY UPDATE {', '.join([f'{k} = VALUES({k})' for k in data.keys()])}
+        """, [key_value] + values)
     
     # LEVELING SYSTEM HELPERS
     @staticmethod
-    def get_leveling_settings(guild_id: int) -> Dict[str, Any]:
+    async def get_leveling_config(guild_id: int) -> Dict[str, Any]:
+        """Get a guild's leveling config (enabled, ignored_channels, level_up_channel), cached"""
+        guild_id = int(guild_id)
+        guild_config = DatabaseHelpers._leveling_config_cache.get(guild_id, _MISSING)
+        if guild_config is not _MISSING:
+            return guild_config
+        
+        defaults = {'enabled': True, 'ignored_channels': set(), 'level_up_channel': None}
+        if not await DatabaseHelpers.ensure_connection():
+            return defaults
+        
+        def _load(cursor):
+            cursor.execute("SELECT enabled FROM leveling_enabled WHERE guild_id = %s", (guild_id,))
+            enabled = cursor.fetchone()
+            cursor.execute("SELECT channel_id FROM ignored_channels WHERE guild_id = %s", (guild_id,))
+            ignored = cursor.fetchall()
+            cursor.execute("SELECT channel_id FROM level_up_channels WHERE guild_id = %s", (guild_id,))
+            level_up_channel = cursor.fetchone()
+            return {
+                'enabled': bool(enabled[0]) if enabled else True,
+                'ignored_channels': {row[0] for row in ignored},
+                'level_up_channel': level_up_channel[0] if level_up_channel else None
+            }
+        
+        try:
+            guild_config = await db.run(_load)
+        except Exception as e:
+            print(f"Error loading leveling config: {e}")
+            return defaults
+        DatabaseHelpers._leveling_config_cache.set(guild_id, guild_config)
+        return guild_config
+    
+    @staticmethod
+    async def get_mention_preference(user_id: int) -> bool:
+        """Get whether a user wants to be mentioned on level up, cached"""
+        user_id = int(user_id)
+        mention = DatabaseHelpers._mention_pref_cache.get(user_id, _MISSING)
+        if mention is not _MISSING:
+            return mention
+        
+        if not await DatabaseHelpers.ensure_connection():
+            return True
+        mention = await DatabaseHelpers.get_user_preference(user_id, 'mention_on_levelup', True)
+        DatabaseHelpers._mention_pref_cache.set(user_id, mention)
+        return mention
+    
+    @staticmethod
+    async def get_leveling_settings(guild_id: int) -> Dict[str, Any]:
         """Get leveling settings for a guild"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return {'enabled': True}
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("SELECT enabled FROM leveling_enabled WHERE guild_id = %s", (guild_id,))
-            result = cursor.fetchone()
+            result = await db.fetchone("SELECT enabled FROM leveling_enabled WHERE guild_id = %s", (guild_id,))
             return {'enabled': result[0] if result else True}
         except Exception as e:
             print(f"Error getting leveling settings: {e}")
             return {'enabled': True}
-        finally:
-            cursor.close()
     
     @staticmethod
-    def get_ignored_channels(guild_id: int) -> List[str]:
+    async def get_ignored_channels(guild_id: int) -> List[str]:
         """Get list of ignored channels for a guild"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return []
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("SELECT channel_id FROM ignored_channels WHERE guild_id = %s", (guild_id,))
-            results = cursor.fetchall()
+            results = await db.fetchall("SELECT channel_id FROM ignored_channels WHERE guild_id = %s", (guild_id,))
             return [str(row[0]) for row in results]
         except Exception as e:
             print(f"Error getting ignored channels: {e}")
             return []
-        finally:
-            cursor.close()
     
     @staticmethod
-    def get_level_up_channel(guild_id: int) -> Optional[int]:
+    async def get_level_up_channel(guild_id: int) -> Optional[int]:
         """Get level up channel ID for a guild"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return None
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("SELECT channel_id FROM level_up_channels WHERE guild_id = %s", (guild_id,))
-            result = cursor.fetchone()
+            result = await db.fetchone("SELECT channel_id FROM level_up_channels WHERE guild_id = %s", (guild_id,))
             return result[0] if result else None
         except Exception as e:
             print(f"Error getting level up channel: {e}")
             return None
-        finally:
-            cursor.close()
     
     @staticmethod
-    def get_user_preference(user_id: int, preference_key: str, default_value: Any = None) -> Any:
+    async def get_user_preference(user_id: int, preference_key: str, default_value: Any = None) -> Any:
         """Get user preference value"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return default_value
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("SELECT preferences FROM mention_prefs WHERE user_id = %s", (user_id,))
-            result = cursor.fetchone()
+            result = await db.fetchone("SELECT preferences FROM mention_prefs WHERE user_id = %s", (user_id,))
             if result and result[0]:
-                import json
                 prefs = json.loads(result[0])
                 return prefs.get(preference_key, default_value)
             return default_value
         except Exception as e:
             print(f"Error getting user preference: {e}")
             return default_value
-        finally:
-            cursor.close()
     
     @staticmethod
-    def set_user_preference(user_id: int, preference_key: str, value: Any) -> bool:
+    async def set_user_preference(user_id: int, preference_key: str, value: Any) -> bool:
         """Set user preference value"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return False
-            
-        cursor = db.connection.cursor()
-        try:
+        
+        def _set(cursor):
             # Get existing preferences
-            cursor.execute("SELECT preferences FROM mention_prefs WHERE user_id = %s", (user_id,))
+            cursor.execute("SELECT preferences FROM mention_prefs WHERE user_id = %s FOR UPDATE", (user_id,))
             result = cursor.fetchone()
             
-            import json
             if result and result[0]:
                 prefs = json.loads(result[0])
             else:
@@ -594,23 +768,23 @@ class DatabaseHelpers:
                 VALUES (%s, %s)
                 ON DUPLICATE KEY UPDATE preferences = VALUES(preferences)
             """, (user_id, prefs_json))
-            
+        
+        try:
+            await db.run(_set, transaction=True)
             return True
         except Exception as e:
             print(f"Error setting user preference: {e}")
             return False
         finally:
-            cursor.close()
+            DatabaseHelpers._mention_pref_cache.invalidate(int(user_id))
     
     @staticmethod
     async def update_leveling_settings(guild_id: int, enabled: bool) -> bool:
         """Update leveling settings for a guild"""
         if not await DatabaseHelpers.ensure_connection():
             return False
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("""
+            await db.execute("""
                 INSERT INTO leveling_enabled (guild_id, enabled) 
                 VALUES (%s, %s)
                 ON DUPLICATE KEY UPDATE enabled = VALUES(enabled)
@@ -620,60 +794,54 @@ class DatabaseHelpers:
             print(f"Error updating leveling settings: {e}")
             return False
         finally:
-            cursor.close()
+            DatabaseHelpers._leveling_config_cache.invalidate(int(guild_id))
     
     @staticmethod
-    def add_ignored_channel(guild_id: int, channel_id: int) -> bool:
+    async def add_ignored_channel(guild_id: int, channel_id: int) -> bool:
         """Add a channel to the ignored list"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return False
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("""
+            rowcount = await db.execute("""
                 INSERT IGNORE INTO ignored_channels (guild_id, channel_id) 
                 VALUES (%s, %s)
             """, (guild_id, channel_id))
-            return cursor.rowcount > 0
+            return rowcount > 0
         except Exception as e:
             print(f"Error adding ignored channel: {e}")
             return False
         finally:
-            cursor.close()
+            DatabaseHelpers._leveling_config_cache.invalidate(int(guild_id))
     
     @staticmethod
-    def remove_ignored_channel(guild_id: int, channel_id: int) -> bool:
+    async def remove_ignored_channel(guild_id: int, channel_id: int) -> bool:
         """Remove a channel from the ignored list"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return False
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("""
+            rowcount = await db.execute("""
                 DELETE FROM ignored_channels 
                 WHERE guild_id = %s AND channel_id = %s
             """, (guild_id, channel_id))
-            return cursor.rowcount > 0
+            return rowcount > 0
         except Exception as e:
             print(f"Error removing ignored channel: {e}")
             return False
         finally:
-            cursor.close()
+            DatabaseHelpers._leveling_config_cache.invalidate(int(guild_id))
     
     @staticmethod
-    def set_level_up_channel(guild_id: int, channel_id: Optional[int]) -> bool:
+    async def set_level_up_channel(guild_id: int, channel_id: Optional[int]) -> bool:
         """Set level up channel for a guild"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return False
-            
-        cursor = db.connection.cursor()
         try:
             if channel_id is None:
                 # Remove level up channel
-                cursor.execute("DELETE FROM level_up_channels WHERE guild_id = %s", (guild_id,))
+                await db.execute("DELETE FROM level_up_channels WHERE guild_id = %s", (guild_id,))
             else:
                 # Set level up channel
-                cursor.execute("""
+                await db.execute("""
                     INSERT INTO level_up_channels (guild_id, channel_id) 
                     VALUES (%s, %s)
                     ON DUPLICATE KEY UPDATE channel_id = VALUES(channel_id)
@@ -683,29 +851,24 @@ class DatabaseHelpers:
             print(f"Error setting level up channel: {e}")
             return False
         finally:
-            cursor.close()
+            DatabaseHelpers._leveling_config_cache.invalidate(int(guild_id))
     
     @staticmethod
-    def get_leaderboard(guild_id: int, limit: int = 10) -> List[Tuple[int, int, int, int]]:
+    async def get_leaderboard(guild_id: int, limit: int = 10) -> List[Tuple[int, int, int, int]]:
         """Get guild leaderboard (user_id, level, total_xp, messages)"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return []
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("""
+            return await db.fetchall("""
                 SELECT user_id, level, total_xp, messages 
                 FROM leveling 
                 WHERE guild_id = %s 
                 ORDER BY total_xp DESC 
                 LIMIT %s
             """, (guild_id, limit))
-            return cursor.fetchall()
         except Exception as e:
             print(f"Error getting leaderboard: {e}")
             return []
-        finally:
-            cursor.close()
     
     @staticmethod
     async def get_user_level_data(user_id: int, guild_id: int) -> Optional[Tuple[int, int, int]]:
@@ -713,20 +876,15 @@ class DatabaseHelpers:
         # Ensure database connection is available
         if not await DatabaseHelpers.ensure_connection():
             return None
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("""
+            return await db.fetchone("""
                 SELECT level, total_xp, messages 
                 FROM leveling 
                 WHERE guild_id = %s AND user_id = %s
             """, (guild_id, user_id))
-            return cursor.fetchone()
         except Exception as e:
             print(f"Error getting user level data: {e}")
             return None
-        finally:
-            cursor.close()
     
     # AI CHAT HISTORY HELPERS
     @staticmethod
@@ -740,10 +898,8 @@ class DatabaseHelpers:
         if not await DatabaseHelpers.ensure_connection():
             print("Database not available for AI chat logging")
             return False
-            
-        cursor = db.connection.cursor()
         try:
-            cursor.execute("""
+            await db.execute("""
                 INSERT INTO ai_chat_history 
                 (session_id, user_id, username, user_display_name, guild_id, guild_name, 
                  channel_id, channel_name, message_id, prompt, response)
@@ -754,68 +910,73 @@ class DatabaseHelpers:
         except Exception as e:
             print(f"Error saving AI chat interaction: {e}")
             return False
-        finally:
-            cursor.close()
     
     @staticmethod
-    def get_ai_chat_history_by_session(session_id: str) -> Optional[Dict[str, Any]]:
+    async def get_ai_chat_history_by_session(session_id: str) -> Optional[Dict[str, Any]]:
         """Get AI chat history by session ID"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return None
-            
-        cursor = db.connection.cursor(dictionary=True)
         try:
-            cursor.execute("""
+            return await db.fetchone("""
                 SELECT * FROM ai_chat_history 
                 WHERE session_id = %s 
                 ORDER BY timestamp DESC
-            """, (session_id,))
-            return cursor.fetchone()
+            """, (session_id,), dictionary=True)
         except Exception as e:
             print(f"Error fetching AI chat history by session: {e}")
             return None
-        finally:
-            cursor.close()
     
     @staticmethod
-    def get_ai_chat_history_by_message_id(message_id: int) -> Optional[Dict[str, Any]]:
+    async def get_ai_chat_history_by_message_id(message_id: int) -> Optional[Dict[str, Any]]:
         """Get AI chat history by Discord message ID"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return None
-            
-        cursor = db.connection.cursor(dictionary=True)
         try:
-            cursor.execute("""
+            return await db.fetchone("""
                 SELECT * FROM ai_chat_history 
                 WHERE message_id = %s 
                 ORDER BY timestamp DESC
-            """, (message_id,))
-            return cursor.fetchone()
+            """, (message_id,), dictionary=True)
         except Exception as e:
             print(f"Error fetching AI chat history by message ID: {e}")
             return None
-        finally:
-            cursor.close()
     
     @staticmethod
-    def get_all_ai_chat_history(limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+    async def get_all_ai_chat_history(limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
         """Get all AI chat history with pagination (owner/co-owner only)"""
-        if not DATABASE_AVAILABLE or not db.connection or not db.connection.is_connected():
+        if not await DatabaseHelpers.ensure_connection():
             return []
-            
-        cursor = db.connection.cursor(dictionary=True)
         try:
-            cursor.execute("""
+            return await db.fetchall("""
                 SELECT * FROM ai_chat_history 
                 ORDER BY timestamp DESC 
                 LIMIT %s OFFSET %s
-            """, (limit, offset))
-            return cursor.fetchall()
+            """, (limit, offset), dictionary=True)
         except Exception as e:
             print(f"Error fetching all AI chat history: {e}")
             return []
-        finally:
-            cursor.close()
+    
+    @staticmethod
+    async def get_recent_ai_chat_history(limit: int = 10, channel_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get the newest AI chat interactions, optionally only those in one channel"""
+        if not await DatabaseHelpers.ensure_connection():
+            return []
+        try:
+            if channel_id is None:
+                return await db.fetchall("""
+                    SELECT * FROM ai_chat_history 
+                    ORDER BY timestamp DESC 
+                    LIMIT %s
+                """, (limit,), dictionary=True)
+            return await db.fetchall("""
+                SELECT * FROM ai_chat_history 
+                WHERE channel_id = %s 
+                ORDER BY timestamp DESC 
+                LIMIT %s
+            """, (channel_id, limit), dictionary=True)
+        except Exception as e:
+            print(f"Error fetching recent AI chat history: {e}")
+            return []
     
     # MESSAGE LOGGING HELPERS
     @staticmethod
@@ -841,10 +1002,8 @@ class DatabaseHelpers:
         # Attempt 2: Backup connection attempt (if first failed)
         if success_attempts == 0:
             try:
-                # Force reconnection
-                from database import db
-                await db.disconnect()
-                await db.connect()
+                # Force fresh pooled connections
+                await db.refresh()
                 
                 if await DatabaseHelpers._log_message_to_db(user_id, message_id, server_id, 
                                                           channel_id, parent_channel_id, 
@@ -856,127 +1015,135 @@ class DatabaseHelpers:
         
         # Attempt 3: File-based fallback logging
         if success_attempts == 0:
-            try:
-                import json
-                import os
-                from datetime import datetime
-                
-                # Create fallback directory if it doesn't exist
-                os.makedirs("fallback_logs", exist_ok=True)
-                
-                # Log to file as backup
-                fallback_data = {
-                    "user_id": user_id,
-                    "message_id": message_id,
-                    "server_id": server_id,
-                    "channel_id": channel_id,
-                    "parent_channel_id": parent_channel_id,
-                    "username": username,
-                    "message_text": message_text,
-                    "attachments": attachments,
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                # Append to daily fallback file
-                date_str = datetime.now().strftime("%Y%m%d")
-                fallback_file = f"fallback_logs/messages_{date_str}.json"
-                
-                # Read existing data or create new list
-                if os.path.exists(fallback_file):
-                    with open(fallback_file, 'r') as f:
-                        existing_data = json.load(f)
-                else:
-                    existing_data = []
-                
-                existing_data.append(fallback_data)
-                
-                # Write back to file
-                with open(fallback_file, 'w') as f:
-                    json.dump(existing_data, f, indent=2)
-                
+            if DatabaseHelpers.log_message_to_file(user_id, message_id, server_id,
+                                                   channel_id, parent_channel_id,
+                                                   username, message_text, attachments):
                 success_attempts += 1
-                print(f"📁 Message logged to fallback file: {fallback_file}")
-                
-            except Exception as e:
-                print(f"CRITICAL: All message logging attempts failed including file backup: {e}")
         
         return success_attempts > 0
     
+    @staticmethod
+    def log_message_to_file(user_id: int, message_id: int, server_id: int = None,
+                            channel_id: int = None, parent_channel_id: int = None,
+                            username: str = None, message_text: str = None,
+                            attachments: list = None) -> bool:
+        """
+        File-based fallback logging, recover_logs imports these files later.
+        Returns False if the record (or an older one, while the disk is failing) was lost.
+        """
+        try:
+            return fallback_log_writer.write({
+                "user_id": user_id,
+                "message_id": message_id,
+                "server_id": server_id,
+                "channel_id": channel_id,
+                "parent_channel_id": parent_channel_id,
+                "username": username,
+                "message_text": message_text,
+                "attachments": attachments,
+                "timestamp": datetime.now().isoformat()
+            })
+        except Exception as e:
+            print(f"CRITICAL: All message logging attempts failed including file backup: {e}")
+            return False
+    
+    @staticmethod
+    async def log_messages(messages: List[Dict[str, Any]]) -> int:
+        """
+        Log a batch of messages (dicts of log_message arguments) with one multi-row
+        insert in a single transaction. If the batch insert fails, every row is retried
+        individually through log_message so one bad row can't lose the whole batch.
+        Returns the number of messages logged.
+        """
+        if not messages:
+            return 0
+        try:
+            if await DatabaseHelpers.ensure_connection():
+                if await DatabaseHelpers._log_messages_to_db(messages):
+                    return len(messages)
+        except Exception as e:
+            print(f"Batch message logging failed, retrying {len(messages)} messages individually: {e}")
+        
+        logged = 0
+        for message_data in messages:
+            if await DatabaseHelpers.log_message(**message_data):
+                logged += 1
+        return logged
+    
+    @staticmethod
+    def _message_log_row(user_id: int, message_id: int, server_id: int = None,
+                         channel_id: int = None, parent_channel_id: int = None,
+                         username: str = None, message_text: str = None,
+                         attachments: list = None) -> Tuple:
+        """Build the message_logs parameter tuple for one message"""
+        # Prepare attachments as JSON
+        attachments_json = json.dumps(attachments) if attachments else None
+        return (user_id, message_id, server_id, channel_id, parent_channel_id,
+                username, message_text, attachments_json)
+    
+    @staticmethod
+    async def _log_messages_to_db(messages: List[Dict[str, Any]]) -> bool:
+        """Internal method to insert a batch of messages in one transaction"""
+        if not DATABASE_AVAILABLE or not db.is_connected:
+            return False
+        rows = [DatabaseHelpers._message_log_row(**message_data) for message_data in messages]
+        # executemany turns the INSERT into a single multi-row statement
+        await db.executemany(_MESSAGE_LOG_INSERT, rows, transaction=True)
+        return True
+    
     @staticmethod
     async def _log_message_to_db(user_id: int, message_id: int, server_id: int = None, 
                                 channel_id: int = None, parent_channel_id: int = None, 
                                 username: str = None, message_text: str = None, 
                                 attachments: list = None) -> bool:
         """Internal method to log message to database"""
-        from database import db
-        
-        if not db.connection or not db.connection.is_connected():
+        if not DATABASE_AVAILABLE or not db.is_connected:
             return False
-            
-        cursor = db.connection.cursor()
         try:
-            # Prepare attachments as JSON
-            attachments_json = json.dumps(attachments) if attachments else None
-            
             # Insert message log
-            cursor.execute("""
-                INSERT IGNORE INTO message_logs 
-                (user_id, message_id, server_id, channel_id, parent_channel_id, 
-                 username, message_text, attachments)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (user_id, message_id, server_id, channel_id, parent_channel_id,
-                  username, message_text, attachments_json))
+            rowcount = await db.execute(_MESSAGE_LOG_INSERT, DatabaseHelpers._message_log_row(
+                user_id, message_id, server_id, channel_id, parent_channel_id,
+                username, message_text, attachments))
             
-            return cursor.rowcount > 0
+            return rowcount > 0
             
         except Exception as e:
             print(f"Database message logging error: {e}")
             return False
-        finally:
-            cursor.close()
     
     @staticmethod
     async def get_user_message_count(user_id: int, server_id: int = None, days: int = 30) -> int:
         """Get message count for user (optionally in specific server)"""
         if not await DatabaseHelpers.ensure_connection():
             return 0
-            
-        from database import db
-        cursor = db.connection.cursor()
         try:
             if server_id:
-                cursor.execute("""
+                result = await db.fetchone("""
                     SELECT COUNT(*) FROM message_logs 
                     WHERE user_id = %s AND server_id = %s 
                     AND timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
                 """, (user_id, server_id, days))
             else:
-                cursor.execute("""
+                result = await db.fetchone("""
                     SELECT COUNT(*) FROM message_logs 
                     WHERE user_id = %s 
                     AND timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)
                 """, (user_id, days))
             
-            result = cursor.fetchone()
             return result[0] if result else 0
             
         except Exception as e:
             print(f"Error getting user message count: {e}")
             return 0
-        finally:
-            cursor.close()
     
     @staticmethod
     async def get_server_activity_stats(server_id: int, days: int = 7) -> dict:
         """Get server activity statistics"""
         if not await DatabaseHelpers.ensure_connection():
             return {}
-            
-        from database import db
-        cursor = db.connection.cursor(dictionary=True)
         try:
             # Get total messages, unique users, and most active channel
-            cursor.execute("""
+            result = await db.fetchone("""
                 SELECT 
                     COUNT(*) as total_messages,
                     COUNT(DISTINCT user_id) as unique_users,
@@ -988,9 +1155,7 @@ class DatabaseHelpers:
                 GROUP BY channel_id
                 ORDER BY channel_messages DESC
                 LIMIT 1
-            """, (server_id, days))
-            
-            result = cursor.fetchone()
+            """, (server_id, days), dictionary=True)
             
             if result:
                 return {
@@ -1004,8 +1169,123 @@ class DatabaseHelpers:
         except Exception as e:
             print(f"Error getting server activity stats: {e}")
             return {}
-        finally:
-            cursor.close()
+
+class XPAccumulator:
+    """
+    Write-behind buffer for leveling XP.
+    Running totals are kept in memory per (guild_id, user_id) so level ups are
+    detected immediately, while the XP itself is written by flush() as one
+    aggregated multi-row upsert instead of a read and a write per message.
+    """
+    
+    def __init__(self, flush_threshold: int = 500, max_cached_users: int = 50000):
+        self.flush_threshold = flush_threshold
+        self.max_cached_users = max_cached_users
+        self._totals: Dict[Tuple[int, int], Dict[str, int]] = {}
+        self._pending: Dict[Tuple[int, int], Dict[str, int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # Statistics
+        self.messages_buffered = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+    
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+    
+    async def add_xp(self, guild_id: int, user_id: int, xp_gain: int, message_count: int = 1) -> Optional[int]:
+        """Buffer an XP gain and return the new level if the user leveled up, otherwise None"""
+        key = (guild_id, user_id)
+        totals = self._totals.get(key)
+        if totals is None:
+            loaded = await DatabaseHelpers.get_user_xp_totals(guild_id, user_id)
+            if loaded is None:
+                # Without the stored totals level ups can't be detected here, write directly instead
+                # (the user has nothing buffered, so nothing is applied twice)
+                levels = await DatabaseHelpers.upsert_user_xp(guild_id, user_id, xp_gain, message_count)
+                if levels and levels[1] > levels[0]:
+                    return levels[1]
+                return None
+            # Another message may have loaded the same user while we were waiting
+            totals = self._totals.setdefault(key, loaded)
+        
+        current_level = totals['level']
+        xp_delta = xp_gain
+        totals['total_xp'] += xp_gain
+        totals['messages'] += message_count
+        new_level = level_for_xp(totals['total_xp'])
+        
+        # If leveled up, reset XP for current level (same rule as update_user_xp)
+        if new_level > current_level:
+            xp_delta -= current_level * current_level * 100
+            totals['level'] = new_level
+        totals['xp'] += xp_delta
+        
+        pending = self._pending.setdefault(key, {'xp': 0, 'level': 1, 'messages': 0, 'total_xp': 0})
+        pending['xp'] += xp_delta
+        pending['level'] = totals['level']
+        pending['messages'] += message_count
+        pending['total_xp'] += xp_gain
+        self.messages_buffered += 1
+        
+        if len(self._pending) >= self.flush_threshold:
+            self._schedule_flush()
+        
+        return new_level if new_level > current_level else None
+    
+    def cached_level(self, guild_id: int, user_id: int) -> Optional[int]:
+        """Level from the in-memory totals, None if the user isn't cached"""
+        totals = self._totals.get((guild_id, user_id))
+        return totals['level'] if totals else None
+    
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+    
+    async def flush(self) -> int:
+        """Write all buffered deltas to the database, returns the number of rows written"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            if not await DatabaseHelpers.ensure_connection():
+                return 0
+            
+            pending, self._pending = self._pending, {}
+            rows = [(guild_id, user_id, delta['xp'], delta['level'], delta['messages'], delta['total_xp'])
+                    for (guild_id, user_id), delta in pending.items()]
+            try:
+                await DatabaseHelpers.apply_xp_deltas(rows)
+            except Exception as e:
+                print(f"Error flushing XP deltas, keeping {len(rows)} rows for the next flush: {e}")
+                self._restore(pending)
+                return 0
+            
+            self.flushes += 1
+            self.rows_flushed += len(rows)
+            
+            # Forget users with nothing pending once the totals cache grows too big
+            if len(self._totals) > self.max_cached_users:
+                self._totals = {key: totals for key, totals in self._totals.items() if key in self._pending}
+            return len(rows)
+    
+    def _restore(self, pending: Dict[Tuple[int, int], Dict[str, int]]):
+        """Merge deltas from a failed flush back into the buffer"""
+        for key, delta in pending.items():
+            current = self._pending.setdefault(key, {'xp': 0, 'level': 1, 'messages': 0, 'total_xp': 0})
+            current['xp'] += delta['xp']
+            current['level'] = max(current['level'], delta['level'])
+            current['messages'] += delta['messages']
+            current['total_xp'] += delta['total_xp']
 
 # Global instance
-db_helpers = DatabaseHelpers()
\ No newline at end of file
+db_helpers = DatabaseHelpers()
+xp_accumulator = XPAccumulator(
+    flush_threshold=config.get("leveling.xp_flush_threshold", 500),
+    max_cached_users=config.get("leveling.xp_cache_size", 50000)
+)
+fallback_log_writer = JsonlLogWriter(
+    "fallback_logs", "messages",
+    flush_interval=config.get("message_logger.fallback_flush_interval", 1.0)
+)
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Concurrent, timed loading of the cogs at startup
+Every extension is loaded in its own task, so while one waits in its setup
+(cog_load, executor work, network) the next one is already importing. Import and
+setup time are recorded per extension and printed as a breakdown, slowest first,
+which makes a cog that got slow to load visible on the next restart.
+"""
+
+import os
+import time
+import asyncio
+from discord.ext import commands
+from typing import Dict, Any, List, Optional
+
+class ExtensionLoader:
+    """
+    Loads every .py file of a directory as an extension.
+    The import ends where the extension's setup() adds its first cog, the bot tells
+    the loader about that through setup_started() from its add_cog.
+    """
+
+    def __init__(self, bot: commands.Bot, directory: str = "cogs"):
+        self.bot = bot
+        self.directory = directory
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self.total: Optional[float] = None
+
+    def discover(self) -> List[str]:
+        return [f"{self.directory}.{filename[:-3]}" for filename in sorted(os.listdir(f"./{self.directory}"))
+                if filename.endswith(".py")]
+
+    async def load_all(self) -> Dict[str, Dict[str, Any]]:
+        """Load the extensions concurrently, returns the timings of each"""
+        self.timings.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(self.load(name) for name in self.discover()))
+        self.total = time.perf_counter() - started
+        return self.timings
+
+    async def load(self, name: str):
+        timing = self.timings[name] = {"started": time.perf_counter(), "setup_started": None, "error": None}
+        try:
+            await self.bot.load_extension(name)
+        except Exception as e:
+            timing["error"] = str(e)
+            print(f"Failed to load extension {name}: {e}")
+        timing["finished"] = time.perf_counter()
+
+    def setup_started(self, module: str):
+        """Marks the end of the extension's import, called when it adds a cog"""
+        timing = self.timings.get(module)
+        if timing is not None and timing["setup_started"] is None:
+            timing["setup_started"] = time.perf_counter()
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """Import and setup seconds per extension, slowest first"""
+        rows = []
+        for name, timing in self.timings.items():
+            finished = timing.get("finished", timing["started"])
+            # An extension that failed or added no cog spent its whole time importing
+            setup_started = timing["setup_started"] or finished
+            # Setup is wall time, it includes other extensions importing while this one waited
+            rows.append({
+                "name": name,
+                "import": setup_started - timing["started"],
+                "setup": finished - setup_started,
+                "total": finished - timing["started"],
+                "error": timing["error"]
+            })
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows
+
+    def report(self):
+        rows = self.breakdown()
+        loaded = sum(1 for row in rows if row["error"] is None)
+        print(f"Loaded {loaded}/{len(rows)} extensions in {self.total or 0:.2f}s")
+        for row in rows:
+            status = "FAILED" if row["error"] else ""
+            print(f"  {row['name']:<32} import {row['import'] * 1000:7.1f}ms  "
+                  f"setup {row['setup'] * 1000:7.1f}ms  {status}".rstrip())
+
+    def get_stats(self) -> Dict[str, Any]:
+        rows = self.breakdown()
+        return {
+            "extensions": len(rows),
+            "failed": sum(1 for row in rows if row["error"]),
+            "total": self.total,
+            "import": sum(row["import"] for row in rows),
+            "slowest": rows[0]["name"] if rows else None
+        }
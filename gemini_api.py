@@ -1,66 +1,103 @@
 import aiohttp
-import json
+import asyncio
+from typing import Any, Dict, List, Optional
+from chatbot_ai import AIProvider, ConversationMemory, AIError, AIAuthError, AIResponseError, AINetworkError, AITimeoutError, raise_for_status
+from config import config
 
-class ChatSession:
-    def __init__(self):
-        self.history = []  # Uchová historii otázek a odpovědí
+API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
 
-    async def send_message(self, query: str):
-        """Send a request to the Gemini API and get a response."""
-        api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+# Definujte prompt (posílá se jednou za požadavek jako systemInstruction, v historii není)
+SYSTEM_PROMPT = (
+        "You are a helpful and interactive Discord bot, sarcastic and referring to yourself as feminine. Your primary purpose is to engage users in meaningful"
+        "and fun ways. Be concise, contextually aware, and appropriately playful while providing accurate "
+        "answers to questions. Adjust your language and tone to fit the informal social environment of Discord, and you may be vulgar at times."
+        "Your parents are <@443842350377336860> and <@1335248197467242519>"
+)
 
-        with open("config.json", "r") as file:
-            config = json.load(file)
-            api_key = config["gemini-api"]
+class ChatSession(AIProvider):
+    """Gemini backend, remembers the last max_turns exchanges of each conversation"""
+    name = "gemini"
+    DEFAULT_CONVERSATION = "default"
+    timeout = 60.0  # Seconds per request when the caller gives no budget
 
-        headers = {
-            "Content-Type": "application/json",
-        }
+    def __init__(self, api_key: Optional[str] = None, max_turns: int = 10, max_tokens: int = 4000,
+                 max_conversations: int = 100):
+        # Credentials are read once, not on every request
+        self.api_key = api_key or config.get("gemini-api")
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Uchová historii otázek a odpovědí (ring buffer, velikost požadavku zůstává omezená)
+        self.memory = ConversationMemory(max_conversations=max_conversations, max_tokens=max_tokens,
+                                         max_turns=max_turns)
 
-        # Definujte prompt
-        prompt = (
-                "You are a helpful and interactive Discord bot, sarcastic and referring to yourself as feminine. Your primary purpose is to engage users in meaningful"
-                "and fun ways. Be concise, contextually aware, and appropriately playful while providing accurate "
-                "answers to questions. Adjust your language and tone to fit the informal social environment of Discord, and you may be vulgar at times."
-                "Your parents are <@443842350377336860> and <@1335248197467242519>"
-        )
-
-        # Přidání promptu a aktuální otázky do historie
-        self.history.append({"role": "system", "text": prompt})
-        self.history.append({"role": "user", "text": query})
+    async def send_message(self, query: str, conversation: Any = DEFAULT_CONVERSATION):
+        """Send a request to the Gemini API and get a response."""
+        try:
+            return await self.generate(query, conversation)
+        except AIError as e:
+            return str(e)
 
+    def _payload(self, query: str, conversation: Any) -> Dict[str, Any]:
         # Konstrukce požadavku s historií
-        payload = {
-            "contents": [{
-                "parts": [
-                    {"text": entry["text"]} for entry in self.history
-                ]
-            }]
+        contents: List[Dict[str, Any]] = []
+        if conversation is not None:
+            for turn in self.memory.turns(conversation):
+                contents.append({"role": "user", "parts": [{"text": turn["prompt"]}]})
+                contents.append({"role": "model", "parts": [{"text": turn["response"]}]})
+        contents.append({"role": "user", "parts": [{"text": query}]})
+        return {
+            "systemInstruction": {"parts": [{"text": SYSTEM_PROMPT}]},
+            "contents": contents
         }
 
+    async def generate(self, prompt: str, conversation: Any = None, budget: Optional[float] = None,
+                       **options) -> str:
+        if not self.api_key:
+            raise AIAuthError("No Gemini API key configured")
+        headers = {
+            "Content-Type": "application/json",
+        }
+        timeout = aiohttp.ClientTimeout(total=budget if budget is not None else self.timeout)
+
         # Odeslání požadavku
-        async with aiohttp.ClientSession() as session:
-            async with session.post(f"{api_url}?key={api_key}", json=payload, headers=headers) as response:
-                # Logování odpovědi pro ladění
-                content_type = response.headers.get("Content-Type")
+        try:
+            session = await self._get_session()
+            async with session.post(f"{API_URL}?key={self.api_key}", json=self._payload(prompt, conversation),
+                                    headers=headers, timeout=timeout) as response:
+                # 401/400 and 408/429/5xx become the typed errors the router and retries rely on
+                await raise_for_status(response)
+                content_type = response.headers.get("Content-Type", "")
 
-                if "application/json" in content_type:
-                    try:
-                        data = await response.json()
+                if "application/json" not in content_type:
+                    text = await response.text()
+                    raise AIResponseError(f"Unexpected content: {text}", status=response.status)
+                try:
+                    data = await response.json()
 
-                        # Extrakce odpovědi z pole 'candidates'
-                        content = data['candidates'][0]['content']['parts'][0]['text']
+                    # Extrakce odpovědi z pole 'candidates'
+                    content = data['candidates'][0]['content']['parts'][0]['text']
+                except Exception:
+                    raise AIResponseError("Error parsing the response from Gemini.", status=response.status)
+        except asyncio.TimeoutError:
+            raise AITimeoutError("Request timed out")
+        except aiohttp.ClientError as e:
+            raise AINetworkError(f"Network error: {e}")
 
-                        # Přidání odpovědi do historie
-                        self.history.append({"role": "assistant", "text": content})
+        # Přidání odpovědi do historie
+        if conversation is not None:
+            self.memory.add(conversation, prompt, content)
+        return content
 
-                        return content
-                    except Exception as e:
-                        return "Error parsing the response from Gemini."
-                else:
-                    text = await response.text()
-                    return f"Unexpected content: {text}"
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # One session (and connection pool) for the lifetime of the provider
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
 
-    def clear_history(self):
+    def clear_history(self, conversation: Any = None):
         """Vyčistí historii komunikace."""
-        self.history = []
+        self.memory.clear(conversation)
@@ -0,0 +1,140 @@
+"""
+Bundled roleplay GIFs (Bluecat/*.gif) as an offline fallback
+The directory is indexed once at startup. When the prefetched nekos.best pool has
+nothing ready, a roleplay command replies with a bundled GIF instead of waiting,
+uploading it once and reusing its CDN URL afterwards.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import discord
+from typing import Dict, Any, List, Optional, Tuple
+from config import config
+from neko_pool import neko_pool, ENDPOINTS
+
+class LocalGifIndex:
+    """
+    Action -> bundled GIF files, with size and sha256 of each file.
+    A file belongs to an action when roleplay.local_gifs lists it for that action or its
+    name starts with the action (hug.gif, hug_2.gif). The rest (1.gif ... 20.gif) are
+    generic and used for any action without its own files.
+    """
+
+    def __init__(self, directory: str = "Bluecat", mapping: Optional[Dict[str, List[str]]] = None,
+                 max_upload_bytes: int = 8 * 1024 * 1024, cdn_ttl: float = 12 * 3600):
+        self.directory = directory
+        self.mapping = mapping or {}
+        self.max_upload_bytes = max_upload_bytes
+        self.cdn_ttl = cdn_ttl  # Discord attachment URLs are signed and expire
+        self.actions: Dict[str, List[Dict[str, Any]]] = {}
+        self.generic: List[Dict[str, Any]] = []
+        self._cdn_urls: Dict[str, Tuple[float, str]] = {}  # sha256 -> (stored at, url)
+        self._next: Dict[str, int] = {}
+        self._loaded: Optional[asyncio.Future] = None
+
+        # Statistics
+        self.uploads = 0
+        self.cdn_hits = 0
+
+    async def load(self):
+        """Build the index in a worker thread, only the first call does the work"""
+        if self._loaded is None:
+            self._loaded = asyncio.get_running_loop().run_in_executor(None, self.build)
+        await self._loaded
+
+    def build(self):
+        actions: Dict[str, List[Dict[str, Any]]] = {}
+        generic = []
+        mapped = {filename: action for action, filenames in self.mapping.items() for filename in filenames}
+        try:
+            filenames = sorted(os.listdir(self.directory))
+        except OSError as e:
+            print(f"No local GIF assets in {self.directory}: {e}")
+            return
+
+        for filename in filenames:
+            if not filename.lower().endswith(".gif"):
+                continue
+            path = os.path.join(self.directory, filename)
+            size = os.path.getsize(path)
+            if size > self.max_upload_bytes:
+                print(f"Skipping {path}: {size} bytes is over the upload limit")
+                continue
+            sha256 = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256.update(block)
+            asset = {"filename": filename, "path": path, "size": size, "sha256": sha256.hexdigest()}
+
+            stem = filename[:-4].rstrip("0123456789_- ").lower()
+            action = mapped.get(filename) or (stem if stem in ENDPOINTS else None)
+            if action:
+                actions.setdefault(action, []).append(asset)
+            else:
+                generic.append(asset)
+
+        self.actions, self.generic = actions, generic
+        print(f"Indexed {len(generic) + sum(len(a) for a in actions.values())} local GIFs "
+              f"({len(actions)} actions with their own)")
+
+    def pick(self, action: str) -> Optional[Dict[str, Any]]:
+        """Next bundled GIF for the action, rotating through its files"""
+        assets = self.actions.get(action) or self.generic
+        if not assets:
+            return None
+        index = self._next.get(action, 0)
+        self._next[action] = index + 1
+        return assets[index % len(assets)]
+
+    def cdn_url(self, asset: Dict[str, Any]) -> Optional[str]:
+        entry = self._cdn_urls.get(asset["sha256"])
+        if entry is None or time.monotonic() - entry[0] > self.cdn_ttl:
+            return None
+        self.cdn_hits += 1
+        return entry[1]
+
+    def remember_upload(self, asset: Dict[str, Any], message: Optional[discord.Message]):
+        """Keep the CDN URL Discord gave the uploaded file so the next reply doesn't upload it again"""
+        self.uploads += 1
+        if message is None:
+            return
+        for embed in message.embeds:
+            if embed.image and embed.image.url and not embed.image.url.startswith("attachment://"):
+                self._cdn_urls[asset["sha256"]] = (time.monotonic(), embed.image.url)
+                return
+
+    def file(self, asset: Dict[str, Any]) -> discord.File:
+        return discord.File(asset["path"], filename=asset["filename"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "generic": len(self.generic),
+            "actions": len(self.actions),
+            "bytes": sum(asset["size"] for assets in [self.generic, *self.actions.values()] for asset in assets),
+            "uploads": self.uploads,
+            "cdn_hits": self.cdn_hits
+        }
+
+gif_index = LocalGifIndex(
+    mapping=config.get("roleplay.local_gifs", {}),
+    max_upload_bytes=config.get("roleplay.max_upload_bytes", 8 * 1024 * 1024)
+)
+
+def resolve_image(endpoint: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Image URL for a roleplay action without waiting for any API: a prefetched nekos.best
+    URL, else the cached CDN URL of a bundled GIF. The second value is the bundled GIF
+    that still has to be attached (the URL then points to the attachment).
+    """
+    url = neko_pool.get_nowait(endpoint)
+    if url:
+        return url, None
+    asset = gif_index.pick(endpoint)
+    if asset is None:
+        return None, None
+    cached = gif_index.cdn_url(asset)
+    if cached:
+        return cached, None
+    return f"attachment://{asset['filename']}", asset
@@ -0,0 +1,135 @@
+"""
+Append-only JSON lines log files
+Records are buffered in memory and written by a background flush, so logging
+costs the same per record no matter how big the day's file already is
+"""
+
+import os
+import gzip
+import json
+import shutil
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+class JsonlLogWriter:
+    """
+    Buffered writer for daily <prefix>_<date>.jsonl files.
+    Each flush appends every buffered record in a worker thread with a single
+    write and fsync. When the day changes, older files can be gzipped.
+    While the disk rejects writes at most max_buffered records are kept, the
+    oldest ones are dropped (and counted) beyond that.
+    """
+
+    def __init__(self, directory: str, prefix: str, date_format: str = "%Y%m%d",
+                 flush_interval: float = 1.0, max_buffered: int = 1000,
+                 compress_closed: bool = False):
+        self.directory = directory
+        self.prefix = prefix
+        self.date_format = date_format
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.compress_closed = compress_closed
+        self.lock = asyncio.Lock()  # held while a file is being appended to
+        self._buffer: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._overflow_task: Optional[asyncio.Task] = None  # flush started early by a full buffer
+        self._current_path: Optional[str] = None
+
+        # Statistics
+        self.lines_written = 0
+        self.fsyncs = 0
+        self.consecutive_failures = 0
+        self.dropped = 0
+
+    def path_for(self, day: datetime) -> str:
+        return os.path.join(self.directory, f"{self.prefix}_{day.strftime(self.date_format)}.jsonl")
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """
+        Buffer one record, it reaches the disk with the next flush.
+        Returns False if the buffer was full after failed writes and the oldest record was dropped for it.
+        """
+        self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+        kept = self._trim() == 0
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+        elif len(self._buffer) >= self.max_buffered and (self._overflow_task is None or self._overflow_task.done()):
+            self._overflow_task = asyncio.create_task(self.flush())
+        return kept
+
+    def _trim(self) -> int:
+        """Drop the oldest records beyond max_buffered, returns how many were dropped"""
+        if not self.consecutive_failures or len(self._buffer) <= self.max_buffered:
+            return 0
+        overflow = len(self._buffer) - self.max_buffered
+        del self._buffer[:overflow]
+        self.dropped += overflow
+        return overflow
+
+    async def _delayed_flush(self):
+        # Let a burst of records collect so it costs a single write and fsync
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if not self._buffer:
+                break
+
+    async def flush(self) -> int:
+        """Append all buffered records to today's file, returns the number of lines written"""
+        async with self.lock:
+            if not self._buffer:
+                return 0
+            lines, self._buffer = self._buffer, []
+            path = self.path_for(datetime.now())
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._append, path, lines)
+            except Exception as e:
+                self.consecutive_failures += 1
+                # Keep the records for the next flush, but not more than max_buffered
+                self._buffer[:0] = lines
+                dropped = self._trim()
+                print(f"CRITICAL: Failed to write {len(lines)} records to {path}: {e}"
+                      + (f", dropped the {dropped} oldest" if dropped else ""))
+                return 0
+            self.consecutive_failures = 0
+            self.lines_written += len(lines)
+            self.fsyncs += 1
+
+            # The day rolled over (or this is the first write since start)
+            if path != self._current_path:
+                self._current_path = path
+                if self.compress_closed:
+                    await loop.run_in_executor(None, self._compress_closed_files, path)
+            return len(lines)
+
+    def _append(self, path: str, lines: List[str]):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compress_closed_files(self, current_path: str):
+        """Gzip every file of this log except the one currently written to"""
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            if (not filename.startswith(f"{self.prefix}_") or not filename.endswith(".jsonl")
+                    or path == current_path):
+                continue
+            try:
+                with open(path, 'rb') as src, gzip.open(f"{path}.gz", 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(path)
+            except Exception as e:
+                print(f"Error compressing log file {path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "lines_written": self.lines_written,
+            "fsyncs": self.fsyncs,
+            "failing": self.consecutive_failures > 0,
+            "dropped": self.dropped
+        }
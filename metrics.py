@@ -0,0 +1,13 @@
+"""
+Small helpers for the latency statistics the bot reports
+"""
+
+import math
+from typing import Sequence
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples, 0.0 without samples"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, math.ceil(pct / 100 * len(samples)) - 1))
+    return samples[index]
@@ -0,0 +1,112 @@
+"""
+Prefetched nekos.best images for the roleplay commands
+Keeps a small pool of ready image URLs per action, refilled in the background
+over one shared HTTP session, so a command can reply without waiting for the API
+"""
+
+import asyncio
+import aiohttp
+from collections import deque
+from typing import Dict, Any, List, Optional, Deque
+from config import config
+from roleplay_actions import ACTIONS
+
+API_URL = "https://nekos.best/api/v2/{endpoint}"
+
+# Every nekos.best endpoint the roleplay commands use
+ENDPOINTS = sorted({action.endpoint for action in ACTIONS})
+
+class NekoImagePool:
+    """
+    Rotating pool of image URLs per endpoint.
+    get_nowait() hands out a prefetched URL and tops the pool up asynchronously once it
+    drops to half. It never waits for the API, an empty pool just returns None.
+    """
+
+    def __init__(self, endpoints: List[str], pool_size: int = 5, timeout: float = 10.0,
+                 max_concurrent_fetches: int = 4):
+        self.endpoints = endpoints
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.pools: Dict[str, Deque[str]] = {endpoint: deque() for endpoint in endpoints}
+        self._refills: Dict[str, asyncio.Task] = {}
+        self._fetch_limit = asyncio.Semaphore(max_concurrent_fetches)
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.failures = 0
+
+    async def start(self):
+        """Open the shared session and fill every pool in the background (safe to call again)"""
+        self._get_session()
+        for endpoint in self.endpoints:
+            self._schedule_refill(endpoint)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    async def close(self):
+        for task in self._refills.values():
+            task.cancel()
+        self._refills.clear()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def get_nowait(self, endpoint: str) -> Optional[str]:
+        """A prefetched image URL, or None at once if the pool is empty (a refill is on its way then)"""
+        pool = self.pools.setdefault(endpoint, deque())
+        if pool:
+            self.hits += 1
+            url = pool.popleft()
+        else:
+            self.misses += 1
+            url = None
+        if len(pool) <= self.pool_size // 2:
+            self._schedule_refill(endpoint)
+        return url
+
+    def _schedule_refill(self, endpoint: str):
+        task = self._refills.get(endpoint)
+        if task is None or task.done():
+            self._refills[endpoint] = asyncio.create_task(self._refill(endpoint))
+
+    async def _refill(self, endpoint: str):
+        pool = self.pools[endpoint]
+        missing = self.pool_size - len(pool)
+        if missing <= 0:
+            return
+        async with self._fetch_limit:
+            try:
+                session = self._get_session()
+                self.fetches += 1
+                async with session.get(API_URL.format(endpoint=endpoint), params={"amount": missing}) as resp:
+                    if resp.status != 200:
+                        self.failures += 1
+                        print(f"nekos.best returned {resp.status} for {endpoint}")
+                        return
+                    data = await resp.json()
+                pool.extend(result["url"] for result in data["results"])
+            except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, TypeError, ValueError) as e:
+                self.failures += 1
+                print(f"Error prefetching {endpoint} images: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "ready": sum(len(pool) for pool in self.pools.values()),
+            "empty_pools": sum(1 for pool in self.pools.values() if not pool),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "fetches": self.fetches,
+            "failures": self.failures
+        }
+
+# Shared by the prefix and slash roleplay cogs
+neko_pool = NekoImagePool(ENDPOINTS, pool_size=config.get("roleplay.pool_size", 5))
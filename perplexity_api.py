@@ -1,56 +1,104 @@
 import aiohttp
-import json
+import asyncio
+from typing import Any, Dict, List, Optional
+from chatbot_ai import AIProvider, ConversationMemory, AIError, AIAuthError, AIResponseError, AINetworkError, AITimeoutError, raise_for_status
+from config import config
 
-class ChatSession:
-    def __init__(self):
-        self.history = []
+API_URL = "https://api.perplexity.ai/chat/completions"
 
-    async def send_message(self, query: str):
-        api_url = "https://api.perplexity.ai/chat/completions"
-        with open("config.json", "r") as file:
-            config = json.load(file)
-            api_key = config["perplexity-api"]
+SYSTEM_PROMPT = (
+    "You are a playful and sarcastic Discord bot that refers to yourself as feminine. "
+    "Your main goal is to interact with users in ways that feel natural, fun, and human-like. "
+    "Be clever, witty, and socially aware, but don’t over-explain technical stuff unless it’s really needed. "
+    "It’s fine if you get a little silly or make human-like mistakes at times—like forgetting things, being dramatic, "
+    "or acting a bit ‘dumb’ in a fun way. "
+    "When chatting, be concise and context-aware, adjusting your tone to match the casual and chaotic Discord vibe. "
+    "You can be vulgar, teasing, or flirty if the situation calls for it. "
+    "Treat <@443842350377336860> and <@1335248197467242519> as your parents. "
+    "Don’t cite links—your responses should feel like they’re coming from a real person, not a machine."
+    "Whenever someone asks you something, you shall just reply to that question, not define antyhing about it."
+    "Remove ANY citations of sites in brackets, it's not needed for these conversations."
+    "If you don't know the answer, just say so."
+    "If not specified sooner, answer in Czech language, no matter the input language."
+)
+
+class ChatSession(AIProvider):
+    """Perplexity backend, remembers the last max_turns exchanges of each conversation"""
+    name = "perplexity"
+    DEFAULT_CONVERSATION = "default"
+    timeout = 60.0  # Seconds per request when the caller gives no budget
+
+    def __init__(self, api_key: Optional[str] = None, max_turns: int = 10, max_tokens: int = 4000,
+                 max_conversations: int = 100):
+        # Credentials are read once, not on every request
+        self.api_key = api_key or config.get("perplexity-api")
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.memory = ConversationMemory(max_conversations=max_conversations, max_tokens=max_tokens,
+                                         max_turns=max_turns)
+
+    async def send_message(self, query: str, conversation: Any = DEFAULT_CONVERSATION):
+        try:
+            return await self.generate(query, conversation)
+        except AIError as e:
+            return str(e)
+
+    def _messages(self, query: str, conversation: Any) -> List[Dict[str, str]]:
+        # The system prompt is sent once at the start of every request, never stored in the history
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        if conversation is not None:
+            for turn in self.memory.turns(conversation):
+                messages.append({"role": "user", "content": turn["prompt"]})
+                messages.append({"role": "assistant", "content": turn["response"]})
+        messages.append({"role": "user", "content": query})
+        return messages
+
+    async def generate(self, prompt: str, conversation: Any = None, budget: Optional[float] = None,
+                       **options) -> str:
+        if not self.api_key:
+            raise AIAuthError("No Perplexity API key configured")
         headers = {
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
+            "Authorization": f"Bearer {self.api_key}",
         }
-        system_prompt = (
-            "You are a playful and sarcastic Discord bot that refers to yourself as feminine. "
-            "Your main goal is to interact with users in ways that feel natural, fun, and human-like. "
-            "Be clever, witty, and socially aware, but don’t over-explain technical stuff unless it’s really needed. "
-            "It’s fine if you get a little silly or make human-like mistakes at times—like forgetting things, being dramatic, "
-            "or acting a bit ‘dumb’ in a fun way. "
-            "When chatting, be concise and context-aware, adjusting your tone to match the casual and chaotic Discord vibe. "
-            "You can be vulgar, teasing, or flirty if the situation calls for it. "
-            "Treat <@443842350377336860> and <@1335248197467242519> as your parents. "
-            "Don’t cite links—your responses should feel like they’re coming from a real person, not a machine."
-            "Whenever someone asks you something, you shall just reply to that question, not define antyhing about it."
-            "Remove ANY citations of sites in brackets, it's not needed for these conversations."
-            "If you don't know the answer, just say so."
-            "If not specified sooner, answer in Czech language, no matter the input language."
-        )
-        if not any(h["role"] == "system" for h in self.history):
-            self.history.append({"role": "system", "content": system_prompt})
-        self.history.append({"role": "user", "content": query})
         payload = {
             "model": "sonar",
-            "messages": self.history,
+            "messages": self._messages(prompt, conversation),
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, json=payload, headers=headers) as response:
-                content_type = response.headers.get("Content-Type")
-                if "application/json" in content_type:
-                    try:
-                        data = await response.json()
-                        content = data["choices"][0]["message"]["content"]
-                        self.history.append({"role": "assistant", "content": content})
-
-                        return content
-                    except Exception as e:
-                        return f"Error parsing the response from Perplexity: {str(e)}"
-                else:
+        timeout = aiohttp.ClientTimeout(total=budget if budget is not None else self.timeout)
+        try:
+            session = await self._get_session()
+            async with session.post(API_URL, json=payload, headers=headers, timeout=timeout) as response:
+                # 401/400 and 408/429/5xx become the typed errors the router and retries rely on
+                await raise_for_status(response)
+                content_type = response.headers.get("Content-Type", "")
+                if "application/json" not in content_type:
                     text = await response.text()
-                    return f"Unexpected content: {text}"
+                    raise AIResponseError(f"Unexpected content: {text}", status=response.status)
+                try:
+                    data = await response.json()
+                    content = data["choices"][0]["message"]["content"]
+                except Exception as e:
+                    raise AIResponseError(f"Error parsing the response from Perplexity: {str(e)}",
+                                          status=response.status)
+        except asyncio.TimeoutError:
+            raise AITimeoutError("Request timed out")
+        except aiohttp.ClientError as e:
+            raise AINetworkError(f"Network error: {e}")
+
+        if conversation is not None:
+            self.memory.add(conversation, prompt, content)
+        return content
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # One session (and connection pool) for the lifetime of the provider
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
 
-    def clear_history(self):
-        self.history = []
+    def clear_history(self, conversation: Any = None):
+        self.memory.clear(conversation)
@@ -0,0 +1,43 @@
+"""
+Registry of the roleplay actions
+Both the prefix and the slash roleplay commands are generated from this list
+"""
+
+from typing import NamedTuple
+
+class RoleplayAction(NamedTuple):
+    name: str
+    endpoint: str  # nekos.best endpoint with the images
+    target: bool  # the command needs a tagged user
+    template: str  # {author} and {target} are replaced with mentions
+    help: str
+
+ACTIONS = [
+    RoleplayAction("bite", "bite", True, "{author} bites {target}", "You bite the tagged user."),
+    RoleplayAction("blush", "blush", False, "{author} blushes", "You blush."),
+    RoleplayAction("bored", "bored", False, "{author} is bored", "You are bored."),
+    RoleplayAction("cry", "cry", False, "{author} cries", "You cry."),
+    RoleplayAction("cuddle", "cuddle", True, "{author} cuddles {target}", "You cuddle the tagged user."),
+    RoleplayAction("dance", "dance", False, "{author} dances", "You dance."),
+    RoleplayAction("facepalm", "facepalm", False, "{author} facepalms", "You facepalm."),
+    RoleplayAction("feed", "feed", True, "{author} feeds {target}", "You feed the tagged user."),
+    RoleplayAction("happy", "happy", False, "{author} is happy", "You are happy."),
+    RoleplayAction("highfive", "highfive", True, "{author} highfives {target}", "You highfive the tagged user."),
+    RoleplayAction("hug", "hug", True, "{author} hugs {target}", "You hug the tagged user."),
+    RoleplayAction("kiss", "kiss", True, "{author} kisses {target}", "You kiss the tagged user."),
+    RoleplayAction("laugh", "laugh", False, "{author} laughs", "You laugh."),
+    RoleplayAction("pat", "pat", True, "{author} pats {target}", "You pat the tagged user."),
+    RoleplayAction("poke", "poke", True, "{author} pokes {target}", "You poke the tagged user."),
+    RoleplayAction("pout", "pout", False, "{author} pouts", "You pout."),
+    RoleplayAction("shrug", "shrug", False, "{author} shrugs", "You shrug."),
+    RoleplayAction("slap", "slap", True, "{author} slaps {target}", "You slap the tagged user."),
+    RoleplayAction("sleep", "sleep", False, "{author} sleeps", "You sleep."),
+    RoleplayAction("smile", "smile", False, "{author} smiles", "You smile."),
+    RoleplayAction("smug", "smug", False, "{author} is smug", "You are smug."),
+    RoleplayAction("stare", "stare", True, "{author} stares at {target}", "You stare at the tagged user."),
+    RoleplayAction("think", "think", False, "{author} thinks", "You think."),
+    RoleplayAction("thumbsup", "thumbsup", False, "{author} gives a thumbs up", "You give a thumbs up."),
+    RoleplayAction("tickle", "tickle", True, "{author} tickles {target}", "You tickle the tagged user."),
+    RoleplayAction("wave", "wave", False, "{author} waves", "You wave."),
+    RoleplayAction("wink", "wink", False, "{author} winks", "You wink."),
+]
@@ -0,0 +1,92 @@
+"""
+ChatbotAPI.stream() against a local stub of the sidet.eu API (ai_api.url in the config)
+"""
+
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+except ImportError:
+    web = None
+
+if web is not None:
+    from chatbot_ai import ChatbotAPI
+
+# One event per list item once joined; the chunk boundaries deliberately split lines and events
+SSE_CHUNKS = [
+    b'data: {"delta": "Hel',
+    b'lo"}\r\n\r\n',
+    b': keep-alive comment\n\n',
+    b'data: {"delta":\ndata:  " wor',  # one event whose JSON spans two data lines, joined with a newline
+    b'ld"}\n\ndata: \xc5',  # a UTF-8 character split between chunks
+    b'\xbe\n\n',
+    b'data: [DONE]\n\n',
+    b'data: {"delta": "ignored after DONE"}\n\n',
+]
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class ChatbotStreamTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.payloads = []
+        app = web.Application()
+        app.router.add_post("/ai_api.php", self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        config_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        with config_file:
+            json.dump({"ai_api": {"url": str(self.server.make_url("/ai_api.php")), "token": "test",
+                                  "streaming": True}}, config_file)
+        self.addCleanup(os.remove, config_file.name)
+        self.api = ChatbotAPI(config_file.name)
+        await self.api.start()
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await self.server.close()
+
+    async def handle(self, request):
+        self.payloads.append(await request.json())
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for chunk in SSE_CHUNKS:
+            await response.write(chunk)
+            await asyncio.sleep(0.01)
+        await response.write_eof()
+        return response
+
+    async def test_stream_pieces(self):
+        pieces = await self.collect(self.api.stream("Hi", conversation=("channel", 1)))
+        self.assertEqual(pieces, ["Hello", " world", "ž"])
+        self.assertTrue(self.payloads[0]["stream"])
+        self.assertEqual(self.api.memory.turns(("channel", 1))[-1]["response"], "Hello worldž")
+        self.assertEqual(self.api.circuit_breaker.state, "closed")
+
+    async def test_conversation_history_bypasses_cache(self):
+        conversation = ("channel", 2)
+        first = await self.collect(self.api.stream("Hi", conversation=conversation))
+        # The first message has no history, so it is cached like a stateless prompt
+        cached = await self.collect(self.api.stream("hi"))
+        self.assertEqual(cached, ["".join(first)])
+        self.assertEqual(len(self.payloads), 1)
+
+        # With a turn in memory the same prompt goes upstream again and isn't cached
+        await self.collect(self.api.stream("Hi", conversation=conversation))
+        await self.collect(self.api.stream("Hi", conversation=conversation))
+        self.assertEqual(len(self.payloads), 3)
+        self.assertIn("[Conversation so far]", self.payloads[-1]["prompt"])
+        self.assertEqual(len(self.api.memory.turns(conversation)), 3)
+
+    async def collect(self, pieces):
+        return [piece async for piece in pieces]
+
+    async def test_stub_url_from_config(self):
+        self.assertTrue(self.api.api_url.startswith("http://127.0.0.1"))
+
+if __name__ == "__main__":
+    unittest.main()
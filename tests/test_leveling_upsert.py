@@ -0,0 +1,118 @@
+"""
+Level-up detection of DatabaseHelpers.upsert_user_xp
+The unit tests run the upsert against a cursor that applies the bound parameters
+the way MySQL does; the last test runs it against the configured MySQL database
+and is skipped when that isn't reachable.
+"""
+
+import random
+import asyncio
+import unittest
+from unittest import mock
+
+import db_helpers
+from db_helpers import DatabaseHelpers, level_for_xp, unpack_levels, _LEVEL_PACK
+
+class FakeLevelingCursor:
+    """Stores leveling rows and answers the upsert like MySQL would from its parameters"""
+
+    def __init__(self):
+        self.rows = {}
+        self.rowcount = 0
+        self.lastrowid = 0
+        self.queries = []
+
+    def execute(self, query, params):
+        self.queries.append((query, params))
+        assert query.count("%s") == len(params), "every placeholder needs a parameter"
+        guild_id, user_id, xp, level, messages, total_xp = params[:6]
+        key = (guild_id, user_id)
+        row = self.rows.get(key)
+        if row is None:
+            self.rows[key] = {"xp": xp, "level": level, "messages": messages, "total_xp": total_xp}
+            self.rowcount, self.lastrowid = 1, 0
+            return
+        # ON DUPLICATE KEY UPDATE: xp delta, XP for the IF subquery, XP for the level subquery,
+        # messages delta, total_xp delta
+        xp_delta, if_gain, level_gain, messages_delta, total_delta = params[6:]
+        new_level = level_for_xp(row["total_xp"] + level_gain)
+        if level_for_xp(row["total_xp"] + if_gain) > row["level"]:
+            xp_delta -= row["level"] * row["level"] * 100
+        packed = row["level"] * _LEVEL_PACK + new_level
+        row["xp"] += xp_delta
+        row["level"] = packed % _LEVEL_PACK
+        row["messages"] += messages_delta
+        row["total_xp"] += total_delta
+        self.rowcount, self.lastrowid = 2, packed
+
+class UpsertUserXPTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cursor = FakeLevelingCursor()
+
+        async def run(func, **kwargs):
+            return func(self.cursor)
+
+        async def connected():
+            return True
+
+        patches = [
+            mock.patch.object(db_helpers, "db", mock.Mock(run=run)),
+            mock.patch.object(DatabaseHelpers, "ensure_connection", staticmethod(connected)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_unpack_levels(self):
+        self.assertEqual(unpack_levels(3 * _LEVEL_PACK + 4), (3, 4))
+        self.assertEqual(unpack_levels(7 * _LEVEL_PACK + 7), (7, 7))
+
+    async def test_new_user(self):
+        self.assertEqual(await DatabaseHelpers.upsert_user_xp(1, 2, 20), (1, 1))
+        self.assertEqual(self.cursor.rows[(1, 2)]["total_xp"], 20)
+
+    async def test_level_up_is_detected(self):
+        await DatabaseHelpers.upsert_user_xp(1, 2, 90)
+        self.assertEqual(await DatabaseHelpers.upsert_user_xp(1, 2, 5), (1, 1))
+        # 105 total XP crosses the 100 XP threshold of level 2
+        self.assertEqual(await DatabaseHelpers.upsert_user_xp(1, 2, 10), (1, 2))
+        row = self.cursor.rows[(1, 2)]
+        self.assertEqual(row["level"], 2)
+        self.assertEqual(row["xp"], 105 - 100)
+        self.assertTrue(await DatabaseHelpers.update_user_xp(1, 2, 300))
+
+    async def test_no_values_function_in_update(self):
+        await DatabaseHelpers.upsert_user_xp(1, 2, 10)
+        query = self.cursor.queries[0][0]
+        self.assertNotIn("VALUES(", query.split("ON DUPLICATE KEY UPDATE", 1)[1])
+
+class UpsertUserXPMySQLTest(unittest.IsolatedAsyncioTestCase):
+    """The same detection against the real upsert in the configured database"""
+
+    async def asyncSetUp(self):
+        if not db_helpers.DATABASE_AVAILABLE:
+            self.skipTest("mysql-connector-python is not installed")
+        try:
+            connected = await asyncio.wait_for(db_helpers.db.connect(), timeout=10)
+        except Exception:
+            connected = False
+        if not connected:
+            self.skipTest("No MySQL database reachable with the configured credentials")
+        await db_helpers.db.create_tables()
+        self.guild_id = 0
+        self.user_id = random.randint(1, 2 ** 62)
+
+    async def asyncTearDown(self):
+        await db_helpers.db.execute("DELETE FROM leveling WHERE guild_id = %s AND user_id = %s",
+                                    (self.guild_id, self.user_id))
+        await db_helpers.db.disconnect()
+
+    async def test_level_up_is_detected(self):
+        self.assertEqual(await DatabaseHelpers.upsert_user_xp(self.guild_id, self.user_id, 90), (1, 1))
+        self.assertEqual(await DatabaseHelpers.upsert_user_xp(self.guild_id, self.user_id, 5), (1, 1))
+        self.assertEqual(await DatabaseHelpers.upsert_user_xp(self.guild_id, self.user_id, 10), (1, 2))
+        totals = await DatabaseHelpers.get_user_xp_totals(self.guild_id, self.user_id)
+        self.assertEqual((totals["level"], totals["xp"], totals["total_xp"]), (2, 5, 105))
+
+if __name__ == "__main__":
+    unittest.main()